@@ -82,6 +82,16 @@ def create_app():
     # Create database tables (new tables/columns added automatically)
     with app.app_context():
         db.create_all()
+        
+        # Jobs a previous run left queued or running will never finish
+        from services.scan_jobs import fail_stale_scan_jobs
+        from services.batch_upload import fail_stale_upload_batches
+        try:
+            fail_stale_scan_jobs()
+            fail_stale_upload_batches()
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠️ Could not check for interrupted jobs (run migrate_db.py?): {str(e)}")
     
     @app.route('/')
     def index():
@@ -0,0 +1,22 @@
+"""
+Fill AnswerSheet.total_awarded, total_max and marks_count from the Mark
+table for existing data.
+
+Works on SQLite and PostgreSQL through SQLAlchemy, against the database
+configured in DATABASE_URL. Safe to run repeatedly: every sheet's totals
+are recomputed from its marks in one UPDATE. Marks saved through the API
+keep the totals current, and migrate_db.py / migrate_columns.py run this
+when they add the columns, so it is only needed after editing marks by hand.
+
+Usage:
+    python backfill_sheet_totals.py
+"""
+
+from app import create_app
+from services.mark_store import backfill_sheet_totals
+
+if __name__ == "__main__":
+    app = create_app()
+    with app.app_context():
+        updated = backfill_sheet_totals()
+        print(f"✅ Recomputed totals for {updated} answer sheets")
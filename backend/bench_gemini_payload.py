@@ -0,0 +1,108 @@
+"""
+Benchmark: request size vs fidelity for the images sent to Gemini.
+
+Compares the SDK default (full-size RGB, lossless WebP) against
+preprocess_image variants across max sides, formats and qualities.
+Fidelity is measured offline as the mean absolute grayscale error after
+scaling each variant back up to the original size; with --gemini each
+variant is also transcribed and compared to the baseline transcription.
+
+Usage:
+    python bench_gemini_payload.py [path/to/sheet.pdf] [page] [--gemini]
+
+Without a PDF argument a synthetic A4 page with text and vector drawings
+is generated in a temp directory and overlaid with paper grain, since real
+answer sheets are scans: on clean vector renders lossless WebP is already
+small and the lossy variants mainly win on tokens, not bytes.
+"""
+
+import difflib
+import io
+import os
+import sys
+import tempfile
+import time
+
+from PIL import Image, ImageChops, ImageStat
+
+from bench_pdf_render import make_sample_pdf
+from services.image_preprocess import preprocess_image
+from services.pdf_processor import PDFProcessor
+from services.rate_limiter import estimate_tokens
+
+PROMPT = "Transcribe all text on this page exactly as written. Return only the text."
+
+
+def baseline(image):
+    """What the SDK uploads for a PIL image"""
+    buffer = io.BytesIO()
+    image.convert('RGB').save(buffer, format='WEBP', lossless=True)
+    return {'mime_type': 'image/webp', 'data': buffer.getvalue()}, None
+
+
+def simulate_scan(image):
+    """Multiply in sensor/paper noise so the synthetic page compresses like a scan"""
+    grain = Image.effect_noise(image.size, 12).point(lambda v: 200 + v // 5)
+    return ImageChops.multiply(image, Image.merge('RGB', [grain] * 3))
+
+
+def fidelity_error(image, part, crop_box):
+    """Mean absolute grayscale error (0-255) of a variant against the original"""
+    original = image.convert('L')
+    if crop_box:
+        original = original.crop(crop_box)
+    decoded = Image.open(io.BytesIO(part['data'])).convert('L').resize(original.size, Image.BICUBIC)
+    return ImageStat.Stat(ImageChops.difference(original, decoded)).mean[0]
+
+
+def transcribe(model, part):
+    response = model.generate_content([PROMPT, part])
+    return response.text.strip()
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    use_gemini = '--gemini' in sys.argv
+    pdf_path = args[0] if args else make_sample_pdf(os.path.join(tempfile.mkdtemp(), 'sample.pdf'))
+    page = int(args[1]) if len(args) > 1 else 0
+
+    image = PDFProcessor.pdf_page_to_image(pdf_path, page, zoom=2.0)
+    if not args:
+        image = simulate_scan(image)
+
+    variants = [('lossless webp (sdk)', baseline)]
+    for max_side in (1024, 1280, 1536, 2048):
+        for fmt, quality in (('JPEG', 75), ('JPEG', 85), ('WEBP', 80)):
+            variants.append((
+                f"{fmt.lower()} q{quality} {max_side}px",
+                lambda img, m=max_side, f=fmt, q=quality: preprocess_image(img, max_side=m, fmt=f, quality=q)
+            ))
+
+    model = None
+    if use_gemini:
+        import google.generativeai as genai
+        from config import Config
+        genai.configure(api_key=Config.GEMINI_API_KEY)
+        model = genai.GenerativeModel('gemini-2.0-flash')
+
+    print(f"📄 {pdf_path} page {page}, rendered {image.size[0]}x{image.size[1]}")
+    header = f"{'variant':<22} {'size':>11} {'bytes':>9} {'tokens':>7} {'encode ms':>10} {'mae':>6}"
+    print(header + (f" {'text sim':>9}" if use_gemini else ""))
+
+    reference = None
+    for label, prepare in variants:
+        start = time.perf_counter()
+        part, crop_box = prepare(image)
+        elapsed = time.perf_counter() - start
+
+        size = Image.open(io.BytesIO(part['data'])).size
+        line = (
+            f"{label:<22} {f'{size[0]}x{size[1]}':>11} {len(part['data']):>9,} "
+            f"{estimate_tokens([part]):>7} {elapsed * 1000:>10.1f} {fidelity_error(image, part, crop_box):>6.2f}"
+        )
+        if model is not None:
+            text = transcribe(model, part)
+            if reference is None:
+                reference = text
+            line += f" {difflib.SequenceMatcher(None, reference, text).ratio():>9.3f}"
+        print(line)
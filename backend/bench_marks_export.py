@@ -0,0 +1,145 @@
+"""
+Benchmark: in-memory vs streaming Excel export of subject marks.
+
+Seeds a temporary SQLite database per class size, then runs each export
+in a fresh subprocess so peak RSS is measured per run. The in-memory
+variant is the previous implementation: every sheet and mark loaded,
+a styled regular Workbook, saved to BytesIO and copied with getvalue().
+
+Usage:
+    python bench_marks_export.py [questions]
+"""
+
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+CLASS_SIZES = (100, 1000, 10000)
+
+
+def seed(db_path, students, questions):
+    os.environ['DATABASE_URL'] = f"sqlite:///{db_path}"
+    from app import create_app
+    from models import db, Subject, AnswerSheet, Mark
+    from services.mark_store import backfill_sheet_totals
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        subject = Subject(name='Physics', class_name='12A')
+        db.session.add(subject)
+        db.session.flush()
+        db.session.execute(AnswerSheet.__table__.insert(), [
+            {'subject_id': subject.id, 'student_name': f"Student {i}", 'roll_number': f"R{i:05d}",
+             'file_path': f"uploads/s{i}.pdf", 'status': 'evaluated'}
+            for i in range(students)
+        ])
+        sheet_ids = [sheet_id for sheet_id, in db.session.query(AnswerSheet.id)]
+        db.session.execute(Mark.__table__.insert(), [
+            {'answer_sheet_id': sheet_id, 'question_number': q, 'marks_awarded': (sheet_id + q) % 6, 'max_marks': 5}
+            for sheet_id in sheet_ids for q in range(1, questions + 1)
+        ])
+        backfill_sheet_totals()
+        return subject.id
+
+
+def export_in_memory(subject):
+    """The export as it was before streaming"""
+    import openpyxl
+    from openpyxl.styles import Font, Alignment, PatternFill
+    from models import AnswerSheet
+    from routes.subject import load_subject_marks
+    from services.marks_export import question_sort_key, question_header
+
+    answer_sheets = AnswerSheet.query.filter_by(subject_id=subject.id).order_by(AnswerSheet.roll_number).all()
+    sheet_marks = load_subject_marks(subject.id)
+    questions = sorted({q for marks in sheet_marks.values() for q in marks}, key=question_sort_key)
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    headers = ['Roll Number', 'Student Name'] + [question_header(q) for q in questions] + ['Total', 'Percentage', 'Status']
+    for col_num, title in enumerate(headers, 1):
+        cell = ws.cell(row=1, column=col_num, value=title)
+        cell.font = Font(bold=True, color="FFFFFF")
+        cell.fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
+        cell.alignment = Alignment(horizontal="center")
+    for row_num, sheet in enumerate(answer_sheets, 2):
+        ws.cell(row=row_num, column=1, value=sheet.roll_number)
+        ws.cell(row=row_num, column=2, value=sheet.student_name)
+        marks = sheet_marks.get(sheet.id, {})
+        row_total = 0
+        for col_num, q in enumerate(questions, 3):
+            value = marks[q][0] if q in marks else '-'
+            ws.cell(row=row_num, column=col_num, value=value)
+            if isinstance(value, (int, float)):
+                row_total += value
+        percentage = sheet.percentage
+        ws.cell(row=row_num, column=len(headers) - 2, value=row_total)
+        ws.cell(row=row_num, column=len(headers) - 1, value=f"{percentage:.2f}%")
+        ws.cell(row=row_num, column=len(headers), value=sheet.status.capitalize())
+
+    output = io.BytesIO()
+    wb.save(output)
+    return len(output.getvalue())
+
+
+def export_streaming(subject):
+    from services.marks_export import build_marks_workbook
+
+    output = build_marks_workbook(subject)
+    size = output.seek(0, io.SEEK_END)
+    output.close()
+    return size
+
+
+def worker(variant, db_path, subject_id):
+    """Run one export and print its stats as JSON (in a fresh process)"""
+    os.environ['DATABASE_URL'] = f"sqlite:///{db_path}"
+    from app import create_app
+    from models import db, Subject
+
+    app = create_app()
+    with app.app_context():
+        subject = db.session.get(Subject, subject_id)
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        size = (export_streaming if variant == 'streaming' else export_in_memory)(subject)
+        elapsed = time.perf_counter() - start
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is in KiB on Linux
+    print(json.dumps({'seconds': elapsed, 'peak_mb': rss_after / 1024, 'growth_mb': (rss_after - rss_before) / 1024, 'bytes': size}))
+
+
+def run(*args):
+    return subprocess.run(
+        [sys.executable, __file__, *map(str, args)],
+        capture_output=True, text=True, check=True
+    ).stdout.strip()
+
+
+if __name__ == "__main__":
+    # Config reads DATABASE_URL at import, so every database gets its own process
+    if len(sys.argv) > 1 and sys.argv[1] == '--seed':
+        print(seed(sys.argv[2], int(sys.argv[3]), int(sys.argv[4])))
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == '--worker':
+        worker(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+        sys.exit(0)
+
+    questions = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    tmp = tempfile.mkdtemp()
+
+    print(f"📊 Marks export, {questions} questions per student")
+    print(f"{'students':>9} {'variant':>10} {'time (s)':>9} {'peak RSS (MB)':>14} {'growth (MB)':>12} {'size (KB)':>10}")
+    for students in CLASS_SIZES:
+        db_path = os.path.join(tmp, f"bench_{students}.db")
+        subject_id = int(run('--seed', db_path, students, questions).splitlines()[-1])
+        for variant in ('in-memory', 'streaming'):
+            stats = json.loads(run('--worker', variant, db_path, subject_id).splitlines()[-1])
+            print(f"{students:>9} {variant:>10} {stats['seconds']:>9.2f} {stats['peak_mb']:>14.1f} {stats['growth_mb']:>12.1f} {stats['bytes'] / 1024:>10.0f}")
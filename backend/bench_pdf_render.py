@@ -0,0 +1,72 @@
+"""
+Micro-benchmark: PNG round trip vs raw samples when converting rendered
+PDF pages to PIL Images.
+
+Usage:
+    python bench_pdf_render.py [path/to/sheet.pdf] [iterations]
+
+Without a PDF argument a synthetic A4 page with text and vector drawings
+is generated in a temp directory.
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+
+import fitz
+from PIL import Image
+
+from services.pdf_processor import PDFProcessor
+
+
+def make_sample_pdf(path):
+    doc = fitz.open()
+    page = doc.new_page(width=595, height=842)  # A4
+    for i in range(40):
+        page.insert_text((50, 60 + i * 19), f"Q{i + 1}. Derive v² = u² + 2as for a body under uniform acceleration", fontsize=11)
+    page.draw_rect(fitz.Rect(300, 500, 540, 760), color=(0, 0, 1), width=2)
+    page.draw_circle((420, 630), 80, color=(1, 0, 0), width=2)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def via_png(pix):
+    return Image.open(io.BytesIO(pix.tobytes("png"))).convert('RGB')
+
+
+def via_samples(pix):
+    return PDFProcessor.pixmap_to_image(pix)
+
+
+def bench(pdf_path, zoom, convert, iterations):
+    doc = fitz.open(pdf_path)
+    page = doc[0]
+    mat = fitz.Matrix(zoom, zoom)
+    pix = page.get_pixmap(matrix=mat, clip=page.cropbox)
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        image = convert(pix)
+        image.load()
+    elapsed = (time.perf_counter() - start) / iterations
+
+    doc.close()
+    return elapsed, image.size
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    if len(sys.argv) > 1:
+        pdf_path = sys.argv[1]
+    else:
+        pdf_path = make_sample_pdf(os.path.join(tempfile.mkdtemp(), 'sample.pdf'))
+
+    print(f"📄 {pdf_path} ({iterations} iterations per zoom, conversion only)")
+    print(f"{'zoom':>5} {'size':>12} {'png (ms)':>10} {'raw (ms)':>10} {'speedup':>8}")
+    for zoom in (1.5, 2.0, 4.0):
+        png_time, size = bench(pdf_path, zoom, via_png, iterations)
+        raw_time, _ = bench(pdf_path, zoom, via_samples, iterations)
+        print(f"{zoom:>5} {f'{size[0]}x{size[1]}':>12} {png_time * 1000:>10.1f} {raw_time * 1000:>10.1f} {png_time / raw_time:>7.1f}x")
@@ -21,12 +21,73 @@ class Config:
     MAX_FILE_SIZE = int(os.getenv('MAX_FILE_SIZE', 52428800))  # 50MB default
     ALLOWED_EXTENSIONS = {'pdf'}
     
+    # Open PDF handles kept per process
+    PDF_DOC_POOL_SIZE = int(os.getenv('PDF_DOC_POOL_SIZE', 8))  # 0 = open/close on every call
+    
+    # Rendered page image cache
+    RENDER_CACHE_MAX_MB = int(os.getenv('RENDER_CACHE_MAX_MB', 96))  # In-memory budget, 0 = disabled
+    RENDER_CACHE_DISK_MAX_MB = int(os.getenv('RENDER_CACHE_DISK_MAX_MB', 0))  # Disk tier under UPLOAD_FOLDER/render_cache, 0 = off
+    
     # Gemini API
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
     
+    # Gemini response cache (in-process LRU + on-disk SQLite tier)
+    GEMINI_CACHE_ENABLED = os.getenv('GEMINI_CACHE_ENABLED', 'true').lower() == 'true'
+    GEMINI_CACHE_MAX_ENTRIES = int(os.getenv('GEMINI_CACHE_MAX_ENTRIES', 512))
+    GEMINI_CACHE_TTL = int(os.getenv('GEMINI_CACHE_TTL', 7 * 24 * 3600))  # seconds, 0 = never expire
+    GEMINI_CACHE_PATH = os.getenv('GEMINI_CACHE_PATH', os.path.join(UPLOAD_FOLDER, 'cache', 'gemini_responses.sqlite'))  # empty = memory only
+    
+    # Gemini rate limiting, off by default (429s are still retried with backoff).
+    # Opt in with the limits of your key's tier, e.g. RPM 15 / TPM 1000000 for the gemini-2.0-flash free tier
+    GEMINI_RATE_LIMIT_ENABLED = os.getenv('GEMINI_RATE_LIMIT_ENABLED', 'false').lower() == 'true'
+    GEMINI_RPM = int(os.getenv('GEMINI_RPM', 0))  # Requests per minute, 0 = unlimited
+    GEMINI_TPM = int(os.getenv('GEMINI_TPM', 0))  # Tokens per minute, 0 = unlimited
+    GEMINI_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', 8))  # In-flight calls per process, 0 = unlimited
+    GEMINI_RATE_LIMIT_PATH = os.getenv('GEMINI_RATE_LIMIT_PATH', '')  # SQLite file to share budgets across workers; empty = per process
+    
+    # Region transcription: one JSON-mode call for text + diagrams (false = two separate calls)
+    GEMINI_COMBINED_REGION = os.getenv('GEMINI_COMBINED_REGION', 'true').lower() == 'true'
+    
+    # Images sent to Gemini: grayscale, trim white margins, cap the longest
+    # side (1536 = 2x2 billing tiles) and encode lossy instead of lossless WebP
+    GEMINI_IMAGE_PREPROCESS = os.getenv('GEMINI_IMAGE_PREPROCESS', 'true').lower() == 'true'
+    GEMINI_IMAGE_MAX_SIDE = int(os.getenv('GEMINI_IMAGE_MAX_SIDE', 1536))
+    GEMINI_IMAGE_FORMAT = os.getenv('GEMINI_IMAGE_FORMAT', 'JPEG')
+    GEMINI_IMAGE_QUALITY = int(os.getenv('GEMINI_IMAGE_QUALITY', 85))
+    GEMINI_IMAGE_GRAYSCALE = os.getenv('GEMINI_IMAGE_GRAYSCALE', 'true').lower() == 'true'
+    GEMINI_IMAGE_TRIM = os.getenv('GEMINI_IMAGE_TRIM', 'true').lower() == 'true'
+    
+    # Blank page detection (opt-in): pages with less ink than this ratio skip
+    # Gemini unless a scan is forced. Ink is anything CONTRAST gray levels
+    # darker than the paper, judged on a render at ZOOM.
+    BLANK_PAGE_DETECTION = os.getenv('BLANK_PAGE_DETECTION', 'false').lower() == 'true'
+    BLANK_PAGE_INK_RATIO = float(os.getenv('BLANK_PAGE_INK_RATIO', 0.00005))
+    BLANK_PAGE_INK_CONTRAST = int(os.getenv('BLANK_PAGE_INK_CONTRAST', 40))
+    BLANK_PAGE_ZOOM = float(os.getenv('BLANK_PAGE_ZOOM', 1.5))
+    
     # Security
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     
+    # Student details extraction: fraction of page 0 (from the top) holding the
+    # name/roll number header; used when a subject has no header_box of its own
+    STUDENT_HEADER_RATIO = float(os.getenv('STUDENT_HEADER_RATIO', 0.25))
+    
+    # Background jobs
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))  # Jobs running at once per process
+    JOB_HEARTBEAT_SECONDS = int(os.getenv('JOB_HEARTBEAT_SECONDS', 30))  # How often live jobs refresh updated_at
+    JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', 300))  # Queued/running jobs silent this long are failed
+    SCAN_JOB_CONCURRENCY = int(os.getenv('SCAN_JOB_CONCURRENCY', 4))  # Parallel Gemini calls per scan job
+    BATCH_UPLOAD_CONCURRENCY = int(os.getenv('BATCH_UPLOAD_CONCURRENCY', 4))  # Parallel student extractions per upload batch
+    
+    # Marks export: rows fetched per round trip, and how large a generated
+    # file may grow in memory before it is spilled to a temp file on disk
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+    EXPORT_SPOOL_MAX_SIZE = int(os.getenv('EXPORT_SPOOL_MAX_SIZE', 8 * 1024 * 1024))
+    
+    # Per-subject exports kept on disk until the subject's marks change
+    EXPORT_CACHE_ENABLED = os.getenv('EXPORT_CACHE_ENABLED', 'true').lower() == 'true'
+    EXPORT_CACHE_DIR = os.getenv('EXPORT_CACHE_DIR', os.path.join(UPLOAD_FOLDER, 'exports'))
+    
     # CORS
     CORS_ORIGINS = os.getenv('ALLOWED_ORIGINS', 'http://localhost:5173,http://localhost:3000').split(',')
     
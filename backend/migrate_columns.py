@@ -0,0 +1,70 @@
+"""
+Add the columns declared in models.py that an existing database is missing.
+
+Works on SQLite and PostgreSQL through SQLAlchemy, against the database
+configured in DATABASE_URL (migrate_db.py only handles the local SQLite
+file). Safe to run repeatedly: existing columns are skipped. NOT NULL
+columns are added with the model's default as their DEFAULT so existing
+rows stay valid. When the answer sheet totals are added they are filled
+from the Mark table straight away. New databases get every column from
+db.create_all() and do not need this.
+
+Usage:
+    python migrate_columns.py
+"""
+
+from sqlalchemy import DefaultClause, inspect, literal, text
+from sqlalchemy.schema import CreateColumn
+
+from app import create_app
+from models import db
+from services.mark_store import TOTAL_COLUMNS, backfill_sheet_totals
+
+
+def column_ddl(column, dialect):
+    """Column definition for ALTER TABLE ... ADD COLUMN"""
+    copy = column._copy()
+    if copy.server_default is None and copy.default is not None and copy.default.is_scalar:
+        value = literal(copy.default.arg, copy.type).compile(dialect=dialect, compile_kwargs={'literal_binds': True})
+        copy.server_default = DefaultClause(text(str(value)))
+
+    ddl = str(CreateColumn(copy).compile(dialect=dialect))
+    for foreign_key in column.foreign_keys:
+        ddl += f" REFERENCES {foreign_key.column.table.name}({foreign_key.column.name})"
+    return ddl
+
+
+def migrate_columns():
+    """
+    Returns:
+        Set of (table, column) names that were added
+    """
+    inspector = inspect(db.engine)
+    tables = set(inspector.get_table_names())
+    added = set()
+
+    for table in db.metadata.sorted_tables:
+        if table.name not in tables:
+            print(f"  {table.name} does not exist – skipped (created by db.create_all)")
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = column_ddl(column, db.engine.dialect)
+            print(f"  Adding '{column.name}' to {table.name} ({ddl})...")
+            with db.engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+            added.add((table.name, column.name))
+
+    print(f"✅ Columns ready ({len(added)} added)")
+    return added
+
+
+if __name__ == "__main__":
+    app = create_app()
+    with app.app_context():
+        added = migrate_columns()
+        if any(('answer_sheets', column) in added for column in TOTAL_COLUMNS):
+            updated = backfill_sheet_totals()
+            print(f"✅ Recomputed totals for {updated} answer sheets")
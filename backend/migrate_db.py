@@ -10,6 +10,17 @@ def add_col_if_missing(cursor, table, column, col_type, existing_cols):
     else:
         print(f"  '{column}' already exists in {table} – skipped")
 
+def backfill_totals():
+    """Fill the answer sheet totals just added, through the app's models"""
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(DB_PATH)
+    from app import create_app
+    from services.mark_store import backfill_sheet_totals
+
+    app = create_app()
+    with app.app_context():
+        updated = backfill_sheet_totals()
+    print(f"✅ Recomputed totals for {updated} answer sheets")
+
 def migrate():
     if not os.path.exists(DB_PATH):
         print(f"Database not found at {DB_PATH}, skipping migration.")
@@ -41,6 +52,9 @@ def migrate():
         add_col_if_missing(cursor, "subjects", "first_evaluator_id",  "INTEGER REFERENCES users(id)", subj_columns)
         add_col_if_missing(cursor, "subjects", "second_evaluator_id", "INTEGER REFERENCES users(id)", subj_columns)
         add_col_if_missing(cursor, "subjects", "created_by",          "INTEGER REFERENCES users(id)", subj_columns)
+        add_col_if_missing(cursor, "subjects", "header_box",          "TEXT",         subj_columns)
+        add_col_if_missing(cursor, "subjects", "eager_analysis",      "BOOLEAN NOT NULL DEFAULT 0", subj_columns)
+        add_col_if_missing(cursor, "subjects", "data_version",        "INTEGER NOT NULL DEFAULT 0", subj_columns)
         print("✅ subjects table ready")
 
         # ── 3. answer_sheets table ───────────────────────────────────────────
@@ -53,6 +67,12 @@ def migrate():
         add_col_if_missing(cursor, "answer_sheets", "teacher_marks",  "REAL",         as_columns)
         add_col_if_missing(cursor, "answer_sheets", "external_marks", "REAL",         as_columns)
         add_col_if_missing(cursor, "answer_sheets", "final_marks",    "REAL",         as_columns)
+        add_col_if_missing(cursor, "answer_sheets", "page_count",     "INTEGER",      as_columns)
+        add_col_if_missing(cursor, "answer_sheets", "page_sizes",     "TEXT",         as_columns)
+        add_col_if_missing(cursor, "answer_sheets", "blank_pages",    "TEXT",         as_columns)
+        add_col_if_missing(cursor, "answer_sheets", "total_awarded",  "REAL NOT NULL DEFAULT 0", as_columns)
+        add_col_if_missing(cursor, "answer_sheets", "total_max",      "REAL NOT NULL DEFAULT 0", as_columns)
+        add_col_if_missing(cursor, "answer_sheets", "marks_count",    "INTEGER NOT NULL DEFAULT 0", as_columns)
 
         # Normalise any NULL/empty status values
         cursor.execute("UPDATE answer_sheets SET status = 'UPLOADED' WHERE status IS NULL OR status = ''")
@@ -62,15 +82,37 @@ def migrate():
         cursor.execute("PRAGMA table_info(question_papers)")
         qp_columns = [info[1] for info in cursor.fetchall()]
         add_col_if_missing(cursor, "question_papers", "subject_id", "INTEGER REFERENCES subjects(id)", qp_columns)
+        add_col_if_missing(cursor, "question_papers", "page_count", "INTEGER", qp_columns)
+        add_col_if_missing(cursor, "question_papers", "page_sizes", "TEXT", qp_columns)
+        add_col_if_missing(cursor, "question_papers", "blank_pages", "TEXT", qp_columns)
         print("✅ question_papers table ready")
 
         # ── 5. evaluation_rubrics table ──────────────────────────────────────
         cursor.execute("PRAGMA table_info(evaluation_rubrics)")
         er_columns = [info[1] for info in cursor.fetchall()]
         add_col_if_missing(cursor, "evaluation_rubrics", "subject_id", "INTEGER REFERENCES subjects(id)", er_columns)
+        add_col_if_missing(cursor, "evaluation_rubrics", "blank_pages", "TEXT", er_columns)
         print("✅ evaluation_rubrics table ready")
 
+        # ── 6. scan_jobs table (created by db.create_all) ────────────────────
+        cursor.execute("PRAGMA table_info(scan_jobs)")
+        sj_columns = [info[1] for info in cursor.fetchall()]
+        if sj_columns:
+            add_col_if_missing(cursor, "scan_jobs", "pages_skipped", "INTEGER DEFAULT 0", sj_columns)
+            add_col_if_missing(cursor, "scan_jobs", "pages", "TEXT", sj_columns)
+            add_col_if_missing(cursor, "scan_jobs", "updated_at", "DATETIME", sj_columns)
+            print("✅ scan_jobs table ready")
+
+        # ── 7. upload_batches table (created by db.create_all) ──────────────
+        cursor.execute("PRAGMA table_info(upload_batches)")
+        ub_columns = [info[1] for info in cursor.fetchall()]
+        if ub_columns:
+            add_col_if_missing(cursor, "upload_batches", "updated_at", "DATETIME", ub_columns)
+            print("✅ upload_batches table ready")
+
         conn.commit()
+        if "marks_count" not in as_columns:
+            backfill_totals()
         print("\n🎉 Migration complete! Restart the backend server.")
 
     except Exception as e:
@@ -0,0 +1,94 @@
+"""
+Create the lookup indexes declared in models.py on an existing database
+and show whether the hot queries use them.
+
+Works on SQLite and PostgreSQL through SQLAlchemy, against the database
+configured in DATABASE_URL. Safe to run repeatedly: existing indexes are
+skipped. New databases get the indexes from db.create_all() and do not
+need this.
+
+Usage:
+    python migrate_indexes.py            # create missing indexes, then EXPLAIN
+    python migrate_indexes.py --explain  # EXPLAIN only
+"""
+
+import sys
+
+from sqlalchemy import inspect, text
+
+from app import create_app
+from models import db, Subject, AnswerSheet, Mark, QuestionPaper, QuestionContent, RubricContent
+
+
+def migrate_indexes():
+    inspector = inspect(db.engine)
+    tables = set(inspector.get_table_names())
+
+    for table in db.metadata.sorted_tables:
+        if table.name not in tables:
+            print(f"  {table.name} does not exist – skipped (created by db.create_all)")
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                print(f"  '{index.name}' already exists – skipped")
+                continue
+            print(f"  Creating '{index.name}' on {table.name}({', '.join(c.name for c in index.columns)})...")
+            index.create(bind=db.engine)
+
+    print("✅ Indexes ready")
+
+
+def hot_queries():
+    """The per-request lookups that scanned whole tables without indexes"""
+    return {
+        'answer sheets of a subject by roll number':
+            db.select(AnswerSheet.id).where(AnswerSheet.subject_id == 1).order_by(AnswerSheet.roll_number),
+        'answer sheets of a subject by status':
+            db.select(AnswerSheet.id).where(AnswerSheet.subject_id == 1, AnswerSheet.status == 'FIRST_DONE'),
+        'marks of an answer sheet':
+            db.select(Mark.id).where(Mark.answer_sheet_id == 1),
+        'subjects of a first evaluator':
+            db.select(Subject.id).where(Subject.first_evaluator_id == 1).order_by(Subject.created_at.desc()),
+        'subjects of a second evaluator':
+            db.select(Subject.id).where(Subject.second_evaluator_id == 1).order_by(Subject.created_at.desc()),
+        'question papers of a subject':
+            db.select(QuestionPaper.id).where(QuestionPaper.subject_id == 1),
+        'questions of a question paper':
+            db.select(QuestionContent.id).where(QuestionContent.question_paper_id == 1),
+        'criteria of a rubric':
+            db.select(RubricContent.id).where(RubricContent.rubric_id == 1),
+    }
+
+
+def explain():
+    dialect = db.engine.dialect
+    prefix = 'EXPLAIN QUERY PLAN' if dialect.name == 'sqlite' else 'EXPLAIN'
+    missing = []
+
+    with db.engine.connect() as conn:
+        if dialect.name == 'postgresql':
+            # Small tables are cheaper to scan; ask whether an index is usable at all
+            conn.execute(text("SET enable_seqscan = off"))
+
+        for label, query in hot_queries().items():
+            sql = str(query.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+            rows = conn.execute(text(f"{prefix} {sql}")).fetchall()
+            plan = ' | '.join(str(row[-1]) for row in rows)
+            uses_index = 'INDEX' in plan.upper()
+            if not uses_index:
+                missing.append(label)
+            print(f"{'✅' if uses_index else '❌'} {label}: {plan}")
+
+    if missing:
+        print(f"\n⚠️ {len(missing)} hot queries still scan the table")
+    return not missing
+
+
+if __name__ == "__main__":
+    app = create_app()
+    with app.app_context():
+        if '--explain' not in sys.argv:
+            migrate_indexes()
+            print()
+        sys.exit(0 if explain() else 1)
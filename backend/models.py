@@ -1,5 +1,7 @@
 from datetime import datetime
+import json
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect, or_
 import bcrypt
 
 db = SQLAlchemy()
@@ -69,6 +71,23 @@ class Subject(db.Model):
     second_evaluator_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
 
+    # Where the student details sit on page 0 of this subject's answer sheets:
+    # JSON {x, y, width, height} as fractions of the page (None → top strip from config)
+    header_box = db.Column(db.Text, nullable=True)
+
+    # Analyse every answer sheet page in the background right after upload
+    eager_analysis = db.Column(db.Boolean, default=False, nullable=False)
+
+    # Bumped whenever anything shown in this subject's exports changes
+    # (see bump_data_versions below); keys the cached export files
+    data_version = db.Column(db.Integer, default=0, nullable=False)
+
+    # Evaluator dashboards list their subjects newest first
+    __table_args__ = (
+        db.Index('ix_subjects_first_evaluator_created', 'first_evaluator_id', 'created_at'),
+        db.Index('ix_subjects_second_evaluator_created', 'second_evaluator_id', 'created_at'),
+    )
+
     # Relationships
     question_papers = db.relationship('QuestionPaper', backref='subject', lazy=True, cascade='all, delete-orphan')
     answer_sheets = db.relationship('AnswerSheet', backref='subject', lazy=True, cascade='all, delete-orphan')
@@ -79,20 +98,35 @@ class Subject(db.Model):
     second_evaluator = db.relationship('User', foreign_keys=[second_evaluator_id], backref='second_eval_subjects')
     creator = db.relationship('User', foreign_keys=[created_by], backref='created_subjects')
     
-    def to_dict(self):
+    def to_dict(self, counts=None):
+        """
+        Args:
+            counts: Optional precomputed {'total_students', 'total_questions'}
+                    (see services/subject_stats.py); missing values are
+                    counted through the relationships
+        """
+        counts = counts or {}
+        total_students = counts.get('total_students')
+        if total_students is None:
+            total_students = len(self.answer_sheets)
+        total_questions = counts.get('total_questions')
+        if total_questions is None:
+            total_questions = sum(qp.total_questions for qp in self.question_papers) if self.question_papers else 0
         return {
             'id': self.id,
             'name': self.name,
             'class_name': self.class_name,
             'academic_year': self.academic_year,
             'created_at': self.created_at.isoformat(),
-            'total_students': len(self.answer_sheets),
-            'total_questions': sum(qp.total_questions for qp in self.question_papers) if self.question_papers else 0,
+            'total_students': total_students,
+            'total_questions': total_questions,
             # NEW: evaluator info
             'first_evaluator_id': self.first_evaluator_id,
             'first_evaluator_name': self.first_evaluator.name if self.first_evaluator else None,
             'second_evaluator_id': self.second_evaluator_id,
             'second_evaluator_name': self.second_evaluator.name if self.second_evaluator else None,
+            'header_box': json.loads(self.header_box) if self.header_box else None,
+            'eager_analysis': bool(self.eager_analysis),
         }
 
 class QuestionPaper(db.Model):
@@ -105,6 +139,13 @@ class QuestionPaper(db.Model):
     file_path = db.Column(db.String(500), nullable=False)
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
     total_questions = db.Column(db.Integer, default=0)
+    page_count = db.Column(db.Integer, nullable=True)  # Stored at upload so the PDF need not be reopened
+    page_sizes = db.Column(db.Text, nullable=True)  # JSON list of [width, height] in PDF points
+    blank_pages = db.Column(db.Text, nullable=True)  # JSON list of blank page numbers (NULL = not yet detected)
+    
+    __table_args__ = (
+        db.Index('ix_question_papers_subject', 'subject_id'),
+    )
     
     # Relationships
     marks = db.relationship('Mark', backref='question_paper', lazy=True, cascade='all, delete-orphan')
@@ -116,7 +157,9 @@ class QuestionPaper(db.Model):
             'title': self.title,
             'file_path': self.file_path,
             'uploaded_at': self.uploaded_at.isoformat(),
-            'total_questions': self.total_questions
+            'total_questions': self.total_questions,
+            'page_count': self.page_count,
+            'blank_pages': json.loads(self.blank_pages) if self.blank_pages else []
         }
 
 
@@ -149,8 +192,25 @@ class AnswerSheet(db.Model):
     external_marks = db.Column(db.Float, nullable=True)   # Submitted by second evaluator
     final_marks = db.Column(db.Float, nullable=True)      # (teacher_marks + external_marks) / 2
 
+    # Sums over this sheet's Mark rows, kept up to date by services/mark_store.py
+    total_awarded = db.Column(db.Float, default=0, nullable=False)
+    total_max = db.Column(db.Float, default=0, nullable=False)
+    marks_count = db.Column(db.Integer, default=0, nullable=False)
+
+    # Stored at upload so /pdf-info never has to reopen the PDF
+    page_count = db.Column(db.Integer, nullable=True)
+    page_sizes = db.Column(db.Text, nullable=True)  # JSON list of [width, height] in PDF points
+    blank_pages = db.Column(db.Text, nullable=True)  # JSON list of blank page numbers (NULL = not yet detected)
+
+    # Sheets are listed per subject by roll number and counted per subject and status
+    __table_args__ = (
+        db.Index('ix_answer_sheets_subject_roll', 'subject_id', 'roll_number'),
+        db.Index('ix_answer_sheets_subject_status', 'subject_id', 'status'),
+    )
+
     # Relationships
     marks = db.relationship('Mark', backref='answer_sheet', lazy=True, cascade='all, delete-orphan')
+    page_analyses = db.relationship('PageAnalysis', backref='answer_sheet', lazy=True, cascade='all, delete-orphan')
     
     def compute_final_marks(self):
         """Compute final_marks as average of teacher and external marks.
@@ -161,6 +221,10 @@ class AnswerSheet(db.Model):
             return self.final_marks
         return None
 
+    @property
+    def percentage(self):
+        return (self.total_awarded / self.total_max * 100) if self.total_max else 0
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -177,6 +241,11 @@ class AnswerSheet(db.Model):
             'teacher_marks': self.teacher_marks,
             'external_marks': self.external_marks,
             'final_marks': self.final_marks,
+            'total_awarded': self.total_awarded,
+            'total_max': self.total_max,
+            'marks_count': self.marks_count,
+            'page_count': self.page_count,
+            'blank_pages': json.loads(self.blank_pages) if self.blank_pages else [],
         }
 
 
@@ -190,6 +259,11 @@ class EvaluationRubric(db.Model):
     file_path = db.Column(db.String(500), nullable=False)
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
     rubric_data = db.Column(db.Text, nullable=True)  # JSON string for structured data
+    blank_pages = db.Column(db.Text, nullable=True)  # JSON list of blank page numbers (NULL = not yet detected)
+    
+    __table_args__ = (
+        db.Index('ix_evaluation_rubrics_subject', 'subject_id'),
+    )
     
     def to_dict(self):
         return {
@@ -198,7 +272,8 @@ class EvaluationRubric(db.Model):
             'title': self.title,
             'file_path': self.file_path,
             'uploaded_at': self.uploaded_at.isoformat(),
-            'rubric_data': self.rubric_data
+            'rubric_data': self.rubric_data,
+            'blank_pages': json.loads(self.blank_pages) if self.blank_pages else []
         }
 
 
@@ -215,6 +290,7 @@ class Mark(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Unique constraint to prevent duplicate marks for same question
+    # (its index also serves lookups by answer_sheet_id)
     __table_args__ = (
         db.UniqueConstraint('answer_sheet_id', 'question_number', name='unique_answer_question'),
     )
@@ -242,7 +318,7 @@ class QuestionContent(db.Model):
     page_number = db.Column(db.Integer, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Unique constraint
+    # Unique constraint (its index also serves lookups by question_paper_id)
     __table_args__ = (
         db.UniqueConstraint('question_paper_id', 'question_number', name='unique_qp_question'),
     )
@@ -269,7 +345,7 @@ class RubricContent(db.Model):
     max_marks = db.Column(db.Float, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Unique constraint
+    # Unique constraint (its index also serves lookups by rubric_id)
     __table_args__ = (
         db.UniqueConstraint('rubric_id', 'question_number', name='unique_rubric_question'),
     )
@@ -284,3 +360,231 @@ class RubricContent(db.Model):
             'created_at': self.created_at.isoformat()
         }
 
+
+
+class PageAnalysis(db.Model):
+    """Stores Gemini auto-scan results per answer sheet page.
+
+    Rows are keyed by the analysis version (model + prompt) and the hash of
+    the PDF file, so a re-uploaded file or a prompt change never serves a
+    stale result.
+    """
+    __tablename__ = 'page_analyses'
+
+    id = db.Column(db.Integer, primary_key=True)
+    answer_sheet_id = db.Column(db.Integer, db.ForeignKey('answer_sheets.id'), nullable=False)
+    page_number = db.Column(db.Integer, nullable=False)
+    analysis_version = db.Column(db.String(100), nullable=False)  # e.g. "gemini-2.0-flash/auto-analyze-v1"
+    file_hash = db.Column(db.String(64), nullable=False)  # sha256 of the PDF file
+    transcription = db.Column(db.Text, nullable=True)
+    questions = db.Column(db.Text, nullable=True)  # JSON list of {id, content}
+    diagrams = db.Column(db.Text, nullable=True)  # JSON list of {description, bounding_box}
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Unique constraint
+    __table_args__ = (
+        db.UniqueConstraint('answer_sheet_id', 'page_number', 'analysis_version', 'file_hash', name='unique_page_analysis'),
+    )
+
+    def to_result(self):
+        """Return the stored analysis in the shape produced by auto_analyze_page"""
+        return {
+            'transcription': self.transcription or '',
+            'questions': json.loads(self.questions) if self.questions else [],
+            'diagrams': json.loads(self.diagrams) if self.diagrams else [],
+            'success': True
+        }
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'answer_sheet_id': self.answer_sheet_id,
+            'page_number': self.page_number,
+            'analysis_version': self.analysis_version,
+            'file_hash': self.file_hash,
+            **self.to_result(),
+            'created_at': self.created_at.isoformat()
+        }
+
+
+class ScanJob(db.Model):
+    """Background job scanning every page of a question paper or rubric, or
+    analysing answer sheet pages into the PageAnalysis store.
+    
+    Status values:
+      - 'QUEUED'  : waiting for a worker
+      - 'RUNNING' : pages are being analysed
+      - 'DONE'    : results stored (individual pages may still have failed, see errors)
+      - 'FAILED'  : the job itself crashed
+    """
+    __tablename__ = 'scan_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    doc_type = db.Column(db.String(50), nullable=False)  # 'question_paper', 'rubric' or 'answer_sheet'
+    doc_id = db.Column(db.Integer, nullable=False)
+    pages = db.Column(db.Text, nullable=True)  # JSON list of answer sheet pages to analyse (NULL = all)
+    status = db.Column(db.String(50), default='QUEUED')
+    total_pages = db.Column(db.Integer, default=0)
+    pages_done = db.Column(db.Integer, default=0)
+    pages_skipped = db.Column(db.Integer, default=0)  # Blank pages not sent for analysis (counted in pages_done)
+    items_stored = db.Column(db.Integer, default=0)
+    errors = db.Column(db.Text, nullable=True)  # JSON list of {page, error}
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Progress or worker heartbeat
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'doc_type': self.doc_type,
+            'doc_id': self.doc_id,
+            'pages': json.loads(self.pages) if self.pages else None,
+            'status': self.status,
+            'total_pages': self.total_pages,
+            'pages_done': self.pages_done,
+            'pages_skipped': self.pages_skipped or 0,
+            'items_stored': self.items_stored,
+            'errors': json.loads(self.errors) if self.errors else [],
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class UploadBatch(db.Model):
+    """Batch upload of answer sheets processed in the background.
+    
+    Files are saved during the request; student extraction, thumbnails and
+    the AnswerSheet inserts happen on the job queue.
+    
+    Status values:
+      - 'QUEUED'  : files saved, waiting for a worker
+      - 'RUNNING' : files are being processed
+      - 'DONE'    : answer sheets created (individual files may still have failed, see results)
+      - 'FAILED'  : the batch itself crashed or the server stopped (sheets
+                    already created are kept)
+    """
+    __tablename__ = 'upload_batches'
+
+    id = db.Column(db.Integer, primary_key=True)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subjects.id'), nullable=True)
+    question_paper_id = db.Column(db.Integer, db.ForeignKey('question_papers.id'), nullable=True)
+    status = db.Column(db.String(50), default='QUEUED')
+    total_files = db.Column(db.Integer, default=0)
+    files_done = db.Column(db.Integer, default=0)
+    results = db.Column(db.Text, nullable=True)  # JSON list of per-file results, in upload order
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Progress or worker heartbeat
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        results = json.loads(self.results) if self.results else []
+        successful = len([r for r in results if r['status'] == 'success'])
+        failed = len([r for r in results if r['status'] == 'error'])
+        return {
+            'id': self.id,
+            'subject_id': self.subject_id,
+            'question_paper_id': self.question_paper_id,
+            'status': self.status,
+            'total_files': self.total_files,
+            'files_done': self.files_done,
+            'message': f'Uploaded {successful} answer sheets successfully, {failed} failed',
+            'results': [{k: v for k, v in r.items() if k != 'file_path'} for r in results],
+            'summary': {
+                'total': len(results),
+                'successful': successful,
+                'failed': failed
+            },
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+# ─────────────────────────────────────────────
+# Export invalidation: columns that appear in the marks/results exports.
+# Any insert, delete or change to one of them bumps Subject.data_version.
+# ─────────────────────────────────────────────
+EXPORTED_COLUMNS = {
+    Subject: ('name', 'class_name'),
+    QuestionPaper: ('title',),
+    AnswerSheet: ('subject_id', 'student_name', 'roll_number', 'question_paper_id', 'remarks', 'status'),
+    Mark: ('answer_sheet_id', 'question_number', 'marks_awarded', 'max_marks'),
+}
+
+
+def _touched_values(obj, column):
+    """Current value of a column, plus its previous value if it changed"""
+    history = inspect(obj).attrs[column].history
+    return [v for v in history.sum() if v is not None]
+
+
+@event.listens_for(db.session, 'after_flush')
+def bump_data_versions(session, flush_context):
+    """
+    Bump data_version of every subject whose exports this flush changed,
+    in one UPDATE. Runs after the flush so new rows already have their
+    foreign keys; marks are mapped to subjects through their answer sheet.
+    """
+    subject_ids = set()
+    sheet_ids = set()
+
+    touched = [(obj, False) for obj in session.new | session.deleted]
+    touched += [(obj, True) for obj in session.dirty]
+    for obj, changed_only in touched:
+        columns = EXPORTED_COLUMNS.get(type(obj))
+        if not columns:
+            continue
+        if changed_only and not any(inspect(obj).attrs[c].history.has_changes() for c in columns):
+            continue
+        if isinstance(obj, Subject):
+            if changed_only:
+                subject_ids.add(obj.id)
+        elif isinstance(obj, Mark):
+            sheet_ids.update(_touched_values(obj, 'answer_sheet_id'))
+        else:
+            subject_ids.update(_touched_values(obj, 'subject_id'))
+
+    bump_subject_versions(session, subject_ids, sheet_ids)
+
+
+@event.listens_for(db.session, 'after_flush')
+def refresh_mark_totals(session, flush_context):
+    """
+    Recompute the stored totals of every answer sheet whose marks this flush
+    inserted, changed or deleted, including marks removed by a cascade (a
+    deleted question paper takes its marks on every answer sheet with it)
+    """
+    sheet_ids = set()
+    for obj in session.new | session.deleted | session.dirty:
+        if not isinstance(obj, Mark):
+            continue
+        if obj in session.dirty and not any(
+            inspect(obj).attrs[c].history.has_changes() for c in EXPORTED_COLUMNS[Mark]
+        ):
+            continue
+        sheet_ids.update(_touched_values(obj, 'answer_sheet_id'))
+
+    if sheet_ids:
+        from services.mark_store import refresh_sheet_totals
+        refresh_sheet_totals(sheet_ids)
+
+
+def bump_subject_versions(session, subject_ids=(), answer_sheet_ids=()):
+    """
+    Bump data_version of these subjects and of the subjects owning these
+    answer sheets, in one UPDATE. Writes that bypass the ORM (bulk
+    upserts) call this themselves.
+    """
+    subject_ids = set(subject_ids)
+    answer_sheet_ids = set(answer_sheet_ids)
+    if not subject_ids and not answer_sheet_ids:
+        return
+
+    affected = Subject.id.in_(subject_ids)
+    if answer_sheet_ids:
+        affected = or_(affected, Subject.id.in_(
+            db.select(AnswerSheet.subject_id).where(AnswerSheet.id.in_(answer_sheet_ids))
+        ))
+    session.execute(
+        db.update(Subject).where(affected).values(data_version=Subject.data_version + 1),
+        execution_options={'synchronize_session': False}
+    )
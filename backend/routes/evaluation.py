@@ -1,41 +1,45 @@
-from flask import Blueprint, request, jsonify
-from models import db, Mark, AnswerSheet, QuestionPaper, QuestionContent, RubricContent, EvaluationRubric
-from services.gemini_ocr import GeminiOCRService
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from models import db, Mark, AnswerSheet, QuestionPaper, QuestionContent, RubricContent, EvaluationRubric, ScanJob, Subject
+from config import Config
+from services.gemini_ocr import AsyncGeminiOCRService
 from services.pdf_processor import PDFProcessor
+from services.page_analysis import analyze_answer_sheet_page, get_blank_pages, stored_page_results
+from services.content_store import upsert_questions, upsert_rubric_criteria
+from services.export_cache import send_export
+from services.mark_store import upsert_marks
+from services.marks_export import iter_results_csv, write_results_csv
+from services.question_parser import analyze_text_layer
+from services.scan_jobs import start_scan_job, fail_stale_scan_jobs
+from routes.subject import parse_flag
 import base64
 import io
+import json
 
 evaluation_bp = Blueprint('evaluation', __name__)
 
 # Initialize OCR service
-ocr_service = GeminiOCRService()
+ocr_service = AsyncGeminiOCRService()
 
 @evaluation_bp.route('/auto-scan', methods=['POST'])
 def auto_scan():
-    """Automatically scan a full page for transcription and diagrams"""
+    """Automatically scan a full page for transcription and diagrams.
+    
+    Pages detected as blank are skipped (blank: true in the response)
+    unless the body has force: true.
+    """
     try:
         data = request.json
         answer_sheet_id = data.get('answersheetId')
         page_number = data.get('page', 0)
+        force = parse_flag(data.get('force', False)) is True  # analyse even if detected as blank
         
         print(f"🔍 Auto-scan request: ID={answer_sheet_id}, Page={page_number}")
         
         # Get answer sheet
         answer_sheet = AnswerSheet.query.get_or_404(answer_sheet_id)
         
-        # Convert full page to image (Medium res for memory safety on production)
-        print(f"📄 Processing PDF: {answer_sheet.file_path}")
-        image = PDFProcessor.pdf_page_to_image(
-            answer_sheet.file_path,
-            page_number,
-            zoom=2.0 # Reduced from 3.0 for production stability
-        )
-        print(f"🖼️ Full page image generated: {image.size}")
-        
-        # Perform automatic analysis
-        print(f"🤖 Sending to Gemini...")
-        result = ocr_service.auto_analyze_page(image, is_path=False)
-        print(f"✅ Gemini response received. success={result.get('success')}")
+        # Serve the stored analysis if this page was scanned before, else ask Gemini
+        result, cached = analyze_answer_sheet_page(answer_sheet, page_number, ocr_service, force=force)
         
         # Process detected diagrams
         processed_diagrams = []
@@ -73,6 +77,8 @@ def auto_scan():
             'questions': result.get('questions', []),
             'diagrams': processed_diagrams,
             'success': result.get('success', False),
+            'cached': cached,
+            'blank': result.get('blank', False),
             'error': result.get('error') if not result.get('success') else None
         }), 200
         
@@ -80,6 +86,43 @@ def auto_scan():
         print(f"❌ CRITICAL error in auto-scan: {str(e)}")
         return jsonify({'error': str(e), 'success': False}), 500
 
+@evaluation_bp.route('/auto-scan-pages', methods=['POST'])
+def auto_scan_pages():
+    """
+    Queue a background analysis of many pages of an answer sheet (all pages
+    by default)
+    
+    Pages are sent to Gemini concurrently and stored, so later /auto-scan
+    requests for them are served without a model call. Returns 202 with a
+    job id immediately; poll GET /scan-jobs/<id> for progress and per-page
+    results. Blank pages are skipped unless the body has force: true.
+    """
+    try:
+        data = request.json
+        answer_sheet_id = data.get('answersheetId')
+        pages = data.get('pages')
+        
+        answer_sheet = AnswerSheet.query.get_or_404(answer_sheet_id)
+        print(f"🔍 Auto-scan pages request: ID={answer_sheet_id}, Pages={pages or 'all'}")
+        
+        try:
+            pages = [int(p) for p in pages] if pages else None
+        except (TypeError, ValueError):
+            return jsonify({'error': 'pages must be a list of page numbers', 'success': False}), 400
+        
+        job = start_scan_job('answer_sheet', answer_sheet.id, ocr_service,
+                             force=parse_flag(data.get('force', False)) is True, pages=pages)
+        
+        return jsonify({
+            'success': True,
+            'job_id': job.id,
+            'job': job.to_dict()
+        }), 202
+        
+    except Exception as e:
+        print(f"❌ Error in auto-scan pages: {str(e)}")
+        return jsonify({'error': str(e), 'success': False}), 500
+
 @evaluation_bp.route('/transcribe', methods=['POST'])
 def transcribe():
     """Transcribe handwriting from a specific region of an answer sheet"""
@@ -88,6 +131,11 @@ def transcribe():
         answer_sheet_id = data.get('answersheetId')
         page_number = data.get('page', 0)
         coordinates = data.get('coordinates')
+        combined = None  # GEMINI_COMBINED_REGION unless overridden
+        if data.get('combined') is not None:
+            combined = parse_flag(data['combined'])
+            if combined is None:
+                return jsonify({'error': 'combined must be true or false'}), 400
         
         # Get answer sheet
         answer_sheet = AnswerSheet.query.get_or_404(answer_sheet_id)
@@ -107,7 +155,7 @@ def transcribe():
             )
         
         # Perform OCR
-        result = ocr_service.process_pdf_region(image, None)
+        result = ocr_service.process_pdf_region(image, None, combined=combined)
         
         # Convert image to base64 for sending back
         img_buffer = io.BytesIO()
@@ -215,6 +263,68 @@ def save_marks():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@evaluation_bp.route('/marks/batch', methods=['POST'])
+def save_marks_batch():
+    """
+    Save marks for many questions of an answer sheet in one transaction
+    
+    Body: { answersheetId, questionPaperId, marks: [{questionNumber,
+    marksAwarded, maxMarks}], remarks (optional), finalize (optional:
+    also save the report, as /save-report does) }
+    """
+    try:
+        data = request.json or {}
+        answer_sheet_id = data.get('answersheetId')
+        question_paper_id = data.get('questionPaperId')
+        entries = data.get('marks') or []
+        
+        if not answer_sheet_id or not isinstance(entries, list):
+            return jsonify({'error': 'Missing required fields'}), 400
+        
+        marks = []
+        for entry in entries:
+            if not isinstance(entry, dict):
+                return jsonify({'error': 'Each mark must be an object'}), 400
+            question_number = entry.get('questionNumber')
+            marks_awarded = entry.get('marksAwarded')
+            max_marks = entry.get('maxMarks')
+            if question_number is None or marks_awarded is None or max_marks is None:
+                return jsonify({'error': 'Each mark needs questionNumber, marksAwarded and maxMarks'}), 400
+            try:
+                marks.append((int(question_number), float(marks_awarded), float(max_marks)))
+            except (TypeError, ValueError):
+                return jsonify({'error': f"Invalid mark for question {question_number}"}), 400
+        
+        answer_sheet = db.session.get(AnswerSheet, answer_sheet_id)
+        if not answer_sheet:
+            return jsonify({'error': 'Answer sheet not found'}), 404
+        
+        saved = upsert_marks(answer_sheet.id, question_paper_id, marks)
+        
+        if data.get('finalize'):
+            finalize_report(answer_sheet, data.get('remarks'))
+        elif 'remarks' in data:
+            answer_sheet.remarks = data.get('remarks')
+        
+        db.session.commit()
+        
+        stored = Mark.query.filter_by(answer_sheet_id=answer_sheet.id).order_by(Mark.question_number).all()
+        return jsonify({
+            'message': f'Saved marks for {saved} questions',
+            'saved': saved,
+            'marks': [mark.to_dict() for mark in stored],
+            'total': {
+                'total_awarded': answer_sheet.total_awarded,
+                'total_max': answer_sheet.total_max,
+                'percentage': answer_sheet.percentage
+            },
+            'data': answer_sheet.to_dict()
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @evaluation_bp.route('/marks/<int:answer_sheet_id>', methods=['GET'])
 def get_marks(answer_sheet_id):
     """Get all marks for an answer sheet"""
@@ -230,17 +340,16 @@ def get_marks(answer_sheet_id):
 
 @evaluation_bp.route('/marks/<int:answer_sheet_id>/total', methods=['GET'])
 def get_total_marks(answer_sheet_id):
-    """Calculate total marks for an answer sheet"""
+    """Total marks for an answer sheet (stored on the sheet by save_marks)"""
     try:
-        marks = Mark.query.filter_by(answer_sheet_id=answer_sheet_id).all()
-        
-        total_awarded = sum(mark.marks_awarded for mark in marks)
-        total_max = sum(mark.max_marks for mark in marks)
+        answer_sheet = db.session.get(AnswerSheet, answer_sheet_id)
+        if not answer_sheet:
+            return jsonify({'total_awarded': 0, 'total_max': 0, 'percentage': 0}), 200
         
         return jsonify({
-            'total_awarded': total_awarded,
-            'total_max': total_max,
-            'percentage': (total_awarded / total_max * 100) if total_max > 0 else 0
+            'total_awarded': answer_sheet.total_awarded,
+            'total_max': answer_sheet.total_max,
+            'percentage': answer_sheet.percentage
         }), 200
         
     except Exception as e:
@@ -251,15 +360,42 @@ def get_pdf_info(answer_sheet_id):
     """Get PDF information (page count, etc.)"""
     try:
         answer_sheet = AnswerSheet.query.get_or_404(answer_sheet_id)
-        page_count = PDFProcessor.get_page_count(answer_sheet.file_path)
+        
+        # Sheets uploaded before page info was stored: read it once and keep it
+        if answer_sheet.page_count is None:
+            info = PDFProcessor.get_page_info(answer_sheet.file_path)
+            answer_sheet.page_count = info['page_count']
+            answer_sheet.page_sizes = json.dumps(info['page_sizes'])
+            db.session.commit()
         
         return jsonify({
-            'page_count': page_count,
+            'page_count': answer_sheet.page_count,
+            'page_sizes': json.loads(answer_sheet.page_sizes) if answer_sheet.page_sizes else [],
             'file_path': answer_sheet.file_path
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+
+def finalize_report(answer_sheet, remarks):
+    """Store remarks, mark the first evaluation done and write teacher_marks"""
+    # Total of the sheet's marks (None until a question is marked)
+    total_awarded = answer_sheet.total_awarded if answer_sheet.marks_count else None
+
+    answer_sheet.remarks = remarks
+    answer_sheet.status = 'FIRST_DONE'  # Mark as first evaluation done
+
+    # Write teacher_marks so TeacherDashboard can display it
+    if total_awarded is not None:
+        answer_sheet.teacher_marks = total_awarded
+
+    # If external_marks already exist, compute final
+    if answer_sheet.external_marks is not None and total_awarded is not None:
+        answer_sheet.final_marks = (total_awarded + answer_sheet.external_marks) / 2
+        answer_sheet.status = 'SECOND_DONE'
+
+
 @evaluation_bp.route('/save-report', methods=['POST'])
 def save_report():
     """Save final evaluation report and write teacher_marks to AnswerSheet."""
@@ -272,23 +408,7 @@ def save_report():
             return jsonify({'error': 'Missing answer sheet ID'}), 400
 
         answer_sheet = AnswerSheet.query.get_or_404(answer_sheet_id)
-
-        # Compute total marks from Mark table
-        marks = Mark.query.filter_by(answer_sheet_id=answer_sheet_id).all()
-        total_awarded = sum(m.marks_awarded for m in marks) if marks else None
-
-        answer_sheet.remarks = remarks
-        answer_sheet.status = 'FIRST_DONE'  # Mark as first evaluation done
-
-        # Write teacher_marks so TeacherDashboard can display it
-        if total_awarded is not None:
-            answer_sheet.teacher_marks = total_awarded
-
-        # If external_marks already exist, compute final
-        if answer_sheet.external_marks is not None and total_awarded is not None:
-            answer_sheet.final_marks = (total_awarded + answer_sheet.external_marks) / 2
-            answer_sheet.status = 'SECOND_DONE'
-
+        finalize_report(answer_sheet, remarks)
         db.session.commit()
 
         return jsonify({
@@ -307,33 +427,24 @@ def get_results():
     try:
         subject_id = request.args.get('subject_id')
         
-        # Fetch status='evaluated' sheets
-        query = AnswerSheet.query.filter_by(status='evaluated')
+        # Fetch status='evaluated' sheets with their stored totals and paper title
+        query = db.session.query(AnswerSheet, QuestionPaper.title).outerjoin(
+            QuestionPaper, QuestionPaper.id == AnswerSheet.question_paper_id
+        ).filter(AnswerSheet.status == 'evaluated')
         
         if subject_id and subject_id.lower() not in ['undefined', 'null', '', 'none']:
-            query = query.filter_by(subject_id=int(subject_id))
-            
-        evaluated_sheets = query.all()
+            query = query.filter(AnswerSheet.subject_id == int(subject_id))
         
         results = []
-        for sheet in evaluated_sheets:
-            # Calculate total marks
-            marks = Mark.query.filter_by(answer_sheet_id=sheet.id).all()
-            total_awarded = sum(m.marks_awarded for m in marks)
-            total_max = sum(m.max_marks for m in marks)
-            percentage = (total_awarded / total_max * 100) if total_max > 0 else 0
-            
-            # Get Question Paper title
-            qp = QuestionPaper.query.get(sheet.question_paper_id) if sheet.question_paper_id else None
-            
+        for sheet, qp_title in query.order_by(AnswerSheet.id):
             results.append({
                 'id': sheet.id,
                 'student_name': sheet.student_name,
                 'roll_number': sheet.roll_number,
-                'question_paper': qp.title if qp else 'Unknown',
-                'total_awarded': total_awarded,
-                'total_max': total_max,
-                'percentage': round(percentage, 2),
+                'question_paper': qp_title or 'Unknown',
+                'total_awarded': sheet.total_awarded,
+                'total_max': sheet.total_max,
+                'percentage': round(sheet.percentage, 2),
                 'remarks': sheet.remarks,
                 'evaluated_at': sheet.uploaded_at.isoformat()
             })
@@ -345,52 +456,28 @@ def get_results():
 
 @evaluation_bp.route('/results/export', methods=['GET'])
 def export_results():
-    """Export results as CSV, optionally filtered by subject"""
+    """Export results as CSV, optionally filtered by subject
+    (per-subject files are cached per data version; the rest stream row by row)"""
     try:
-        import csv
-        import io
-        from flask import make_response
-        
         subject_id = request.args.get('subject_id')
-        query = AnswerSheet.query.filter_by(status='evaluated')
-        
         if subject_id and subject_id.lower() not in ['undefined', 'null', '', 'none']:
-            query = query.filter_by(subject_id=int(subject_id))
-            
-        evaluated_sheets = query.all()
-        
-        si = io.StringIO()
-        cw = csv.writer(si)
-        cw.writerow(['Student Name', 'Roll Number', 'Question Paper', 'Marks Obtained', 'Max Marks', 'Percentage', 'Remarks'])
-        
-        for sheet in evaluated_sheets:
-            marks = Mark.query.filter_by(answer_sheet_id=sheet.id).all()
-            total_awarded = sum(m.marks_awarded for m in marks)
-            total_max = sum(m.max_marks for m in marks)
-            percentage = (total_awarded / total_max * 100) if total_max > 0 else 0
-            qp = QuestionPaper.query.get(sheet.question_paper_id) if sheet.question_paper_id else None
-            
-            cw.writerow([
-                sheet.student_name,
-                sheet.roll_number or 'N/A',
-                qp.title if qp else 'Unknown',
-                total_awarded,
-                total_max,
-                f"{percentage:.2f}%",
-                sheet.remarks or ''
-            ])
-            
-        output = make_response(si.getvalue())
+            subject_id = int(subject_id)
+        else:
+            subject_id = None
+        
         filename = "class_results.csv"
         if subject_id:
-            from models import Subject
-            subj = Subject.query.get(subject_id)
+            subj = db.session.get(Subject, subject_id)
             if subj:
                 filename = f"{subj.name}_results.csv".replace(" ", "_")
+                if Config.EXPORT_CACHE_ENABLED:
+                    return send_export(subj, 'csv', write_results_csv, 'text/csv', filename)
         
-        output.headers["Content-Disposition"] = f"attachment; filename={filename}"
-        output.headers["Content-type"] = "text/csv"
-        return output
+        return Response(
+            stream_with_context(iter_results_csv(subject_id)),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f"attachment; filename={filename}"}
+        )
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -437,51 +524,38 @@ def scan_question_paper():
         data = request.json
         question_paper_id = data.get('questionPaperId')
         page_number = data.get('page', 0)
+        force = parse_flag(data.get('force', False)) is True
         
         print(f"📝 Scanning question paper ID={question_paper_id}, Page={page_number}")
         
         question_paper = QuestionPaper.query.get_or_404(question_paper_id)
         
-        # Convert page to image
-        image = PDFProcessor.pdf_page_to_image(
-            question_paper.file_path,
-            page_number,
-            zoom=2.0
-        )
+        if not force and page_number in get_blank_pages(question_paper):
+            print(f"⬜ Page {page_number} is blank, skipping Gemini")
+            result = ocr_service.blank_page_result()
+        else:
+            # Typed PDFs are read from the text layer; only scanned pages go to Gemini
+            result = analyze_text_layer(question_paper.file_path, page_number)
+            if result is not None:
+                print(f"📝 Read page {page_number} from the PDF text layer")
         
-        # Analyze with Gemini
-        result = ocr_service.auto_analyze_page(image, is_path=False)
+        if result is None:
+            # Convert page to image
+            image = PDFProcessor.pdf_page_to_image(
+                question_paper.file_path,
+                page_number,
+                zoom=2.0
+            )
+            
+            # Analyze with Gemini
+            result = ocr_service.auto_analyze_page(image, is_path=False)
         
         if not result.get('success'):
             return jsonify({'error': 'Failed to analyze page', 'success': False}), 500
         
         # Parse questions from response
         questions = result.get('questions', [])
-        stored_count = 0
-        
-        for q in questions:
-            q_number = q.get('id', '').strip()
-            q_text = q.get('content', '').strip()
-            
-            if q_number and q_text:
-                # Check if already exists
-                existing = QuestionContent.query.filter_by(
-                    question_paper_id=question_paper_id,
-                    question_number=q_number
-                ).first()
-                
-                if existing:
-                    existing.question_text = q_text
-                    existing.page_number = page_number
-                else:
-                    new_question = QuestionContent(
-                        question_paper_id=question_paper_id,
-                        question_number=q_number,
-                        question_text=q_text,
-                        page_number=page_number
-                    )
-                    db.session.add(new_question)
-                stored_count += 1
+        stored_count = upsert_questions(question_paper_id, questions, page_number)
         
         db.session.commit()
         
@@ -507,59 +581,39 @@ def scan_rubric():
         data = request.json
         rubric_id = data.get('rubricId')
         page_number = data.get('page', 0)
+        force = parse_flag(data.get('force', False)) is True
         
         print(f"📋 Scanning rubric ID={rubric_id}, Page={page_number}")
         
         rubric = EvaluationRubric.query.get_or_404(rubric_id)
         
-        # Convert page to image
-        image = PDFProcessor.pdf_page_to_image(
-            rubric.file_path,
-            page_number,
-            zoom=2.0
-        )
+        if not force and page_number in get_blank_pages(rubric):
+            print(f"⬜ Page {page_number} is blank, skipping Gemini")
+            result = ocr_service.blank_page_result()
+        else:
+            # Typed PDFs are read from the text layer; only scanned pages go to Gemini
+            result = analyze_text_layer(rubric.file_path, page_number)
+            if result is not None:
+                print(f"📝 Read page {page_number} from the PDF text layer")
         
-        # Analyze with Gemini
-        result = ocr_service.auto_analyze_page(image, is_path=False)
+        if result is None:
+            # Convert page to image
+            image = PDFProcessor.pdf_page_to_image(
+                rubric.file_path,
+                page_number,
+                zoom=2.0
+            )
+            
+            # Analyze with Gemini
+            result = ocr_service.auto_analyze_page(image, is_path=False)
         
         if not result.get('success'):
             return jsonify({'error': 'Failed to analyze page', 'success': False}), 500
         
-        # Parse rubric criteria from response
+        # Parse rubric criteria from response; max marks are read from
+        # the criteria text (e.g., "[10 marks]" or "10M")
         questions = result.get('questions', [])
-        stored_count = 0
-        
-        for q in questions:
-            q_number = q.get('id', '').strip()
-            criteria = q.get('content', '').strip()
-            
-            # Try to extract max marks from criteria text (e.g., "[10 marks]" or "10M")
-            max_marks = None
-            import re
-            marks_pattern = r'(?:[\[\(])?(\d+)\s*(?:marks?|M)[\]\)]?'
-            marks_match = re.search(marks_pattern, criteria, re.IGNORECASE)
-            if marks_match:
-                max_marks = float(marks_match.group(1))
-            
-            if q_number and criteria:
-                # Check if already exists
-                existing = RubricContent.query.filter_by(
-                    rubric_id=rubric_id,
-                    question_number=q_number
-                ).first()
-                
-                if existing:
-                    existing.criteria_text = criteria
-                    existing.max_marks = max_marks
-                else:
-                    new_rubric = RubricContent(
-                        rubric_id=rubric_id,
-                        question_number=q_number,
-                        criteria_text=criteria,
-                        max_marks=max_marks
-                    )
-                    db.session.add(new_rubric)
-                stored_count += 1
+        stored_count = upsert_rubric_criteria(rubric_id, questions)
         
         db.session.commit()
         
@@ -637,7 +691,11 @@ def match_content(answer_sheet_id):
 
 @evaluation_bp.route('/scan-all-pages', methods=['POST'])
 def scan_all_pages():
-    """Scan all pages of a question paper or rubric and extract questions/criteria"""
+    """Queue a background scan of all pages of a question paper or rubric.
+    
+    Returns 202 with a job id immediately; poll GET /scan-jobs/<id> for progress.
+    Blank pages are skipped (job.pages_skipped) unless the body has force: true.
+    """
     try:
         data = request.json
         doc_type = data.get('type')  # 'question_paper' or 'rubric'
@@ -649,104 +707,19 @@ def scan_all_pages():
         print(f"📖 Scanning all pages: type={doc_type}, id={doc_id}")
         
         if doc_type == 'question_paper':
-            doc = QuestionPaper.query.get_or_404(doc_id)
+            QuestionPaper.query.get_or_404(doc_id)
         elif doc_type == 'rubric':
-            doc = EvaluationRubric.query.get_or_404(doc_id)
+            EvaluationRubric.query.get_or_404(doc_id)
         else:
             return jsonify({'error': 'Invalid type. Use "question_paper" or "rubric"', 'success': False}), 400
         
-        # Get total pages
-        total_pages = PDFProcessor.get_page_count(doc.file_path)
-        print(f"📄 Total pages: {total_pages}")
-        
-        total_stored = 0
-        
-        for page_number in range(total_pages):
-            print(f"🔍 Scanning page {page_number + 1}/{total_pages}...")
-            
-            # Convert page to image
-            image = PDFProcessor.pdf_page_to_image(doc.file_path, page_number, zoom=2.0)
-            
-            # Analyze with Gemini
-            result = ocr_service.auto_analyze_page(image, is_path=False)
-            
-            if not result.get('success'):
-                print(f"⚠️ Failed to analyze page {page_number + 1}")
-                continue
-            
-            questions = result.get('questions', [])
-            
-            for q in questions:
-                q_number = q.get('id', '').strip()
-                q_text = q.get('content', '').strip()
-                
-                if not q_number or not q_text:
-                    continue
-                
-                if doc_type == 'question_paper':
-                    existing = QuestionContent.query.filter_by(
-                        question_paper_id=doc_id,
-                        question_number=q_number
-                    ).first()
-                    
-                    if existing:
-                        existing.question_text = q_text
-                        existing.page_number = page_number
-                    else:
-                        db.session.add(QuestionContent(
-                            question_paper_id=doc_id,
-                            question_number=q_number,
-                            question_text=q_text,
-                            page_number=page_number
-                        ))
-                    total_stored += 1
-                    
-                elif doc_type == 'rubric':
-                    # Try to extract max marks
-                    import re
-                    max_marks = None
-                    marks_match = re.search(r'(?:[\[\(])?(\d+)\s*(?:marks?|M)[\]\)]?', q_text, re.IGNORECASE)
-                    if marks_match:
-                        max_marks = float(marks_match.group(1))
-                    
-                    existing = RubricContent.query.filter_by(
-                        rubric_id=doc_id,
-                        question_number=q_number
-                    ).first()
-                    
-                    if existing:
-                        existing.criteria_text = q_text
-                        existing.max_marks = max_marks
-                    else:
-                        db.session.add(RubricContent(
-                            rubric_id=doc_id,
-                            question_number=q_number,
-                            criteria_text=q_text,
-                            max_marks=max_marks
-                        ))
-                    total_stored += 1
-        
-        # Update total_questions on QuestionPaper if applicable
-        if doc_type == 'question_paper':
-            count = QuestionContent.query.filter_by(question_paper_id=doc_id).count()
-            doc.total_questions = count
-        
-        db.session.commit()
-        
-        print(f"✅ Scan complete. Stored {total_stored} items across {total_pages} pages.")
-        
-        # Return all stored content
-        if doc_type == 'question_paper':
-            items = [q.to_dict() for q in QuestionContent.query.filter_by(question_paper_id=doc_id).order_by(QuestionContent.question_number).all()]
-        else:
-            items = [r.to_dict() for r in RubricContent.query.filter_by(rubric_id=doc_id).order_by(RubricContent.question_number).all()]
+        job = start_scan_job(doc_type, int(doc_id), ocr_service, force=parse_flag(data.get('force', False)) is True)
         
         return jsonify({
             'success': True,
-            'total_pages_scanned': total_pages,
-            'total_items_stored': total_stored,
-            'items': items
-        }), 200
+            'job_id': job.id,
+            'job': job.to_dict()
+        }), 202
         
     except Exception as e:
         db.session.rollback()
@@ -754,6 +727,59 @@ def scan_all_pages():
         return jsonify({'error': str(e), 'success': False}), 500
 
 
+def answer_sheet_job_pages(job):
+    """Per-page outcome of a finished answer sheet job, with the stored questions"""
+    answer_sheet = db.session.get(AnswerSheet, job.doc_id)
+    if not answer_sheet:
+        return []
+    page_numbers = json.loads(job.pages) if job.pages is not None else list(range(job.total_pages))
+    errors = {e['page']: e['error'] for e in json.loads(job.errors or '[]')}
+    blank = get_blank_pages(answer_sheet) if job.pages_skipped else set()
+    stored = stored_page_results(answer_sheet, ocr_service, page_numbers)
+
+    return [
+        {
+            'page': page_number,
+            'success': page_number not in errors,
+            'blank': page_number in blank and page_number not in stored,
+            'questions': stored[page_number].get('questions', []) if page_number in stored else [],
+            'error': errors.get(page_number)
+        }
+        for page_number in page_numbers
+    ]
+
+
+@evaluation_bp.route('/scan-jobs/<int:job_id>', methods=['GET'])
+def get_scan_job(job_id):
+    """Get progress of a scan job; includes the stored items once it is DONE"""
+    try:
+        job = ScanJob.query.get_or_404(job_id)
+        if job.status in ('QUEUED', 'RUNNING'):
+            fail_stale_scan_jobs()  # The worker running it may have died
+        
+        response = {
+            'success': True,
+            'job': job.to_dict()
+        }
+        
+        if job.status == 'DONE' and job.doc_type == 'answer_sheet':
+            response['pages'] = answer_sheet_job_pages(job)
+        elif job.status == 'DONE':
+            # Return all stored content
+            if job.doc_type == 'question_paper':
+                items = [q.to_dict() for q in QuestionContent.query.filter_by(question_paper_id=job.doc_id).order_by(QuestionContent.question_number).all()]
+            else:
+                items = [r.to_dict() for r in RubricContent.query.filter_by(rubric_id=job.doc_id).order_by(RubricContent.question_number).all()]
+            response['total_pages_scanned'] = job.total_pages
+            response['total_items_stored'] = job.items_stored
+            response['items'] = items
+        
+        return jsonify(response), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e), 'success': False}), 500
+
+
 @evaluation_bp.route('/question-contents/<int:question_paper_id>', methods=['GET'])
 def get_question_contents(question_paper_id):
     """Get all stored question content for a question paper"""
@@ -821,7 +847,7 @@ def analyze_blooms():
         }}
         """
         
-        result = ocr_service.model.generate_content(prompt)
+        result = ocr_service.generate_content(prompt)
         response_text = result.text.strip()
         
         # Clean up JSON
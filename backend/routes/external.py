@@ -8,6 +8,7 @@ All endpoints accept ?user_id=<id> as a query param for auth (no JWT needed).
 
 from flask import Blueprint, request, jsonify
 from models import db, User, Subject, AnswerSheet
+from services.subject_stats import load_subjects_with_counts, status_counts
 
 external_bp = Blueprint('external', __name__)
 
@@ -29,24 +30,22 @@ def get_external_subjects():
         if not user:
             return jsonify({'error': 'User not found'}), 401
 
-        subjects = Subject.query.filter_by(second_evaluator_id=user.id).order_by(Subject.created_at.desc()).all()
+        subjects = load_subjects_with_counts(Subject.second_evaluator_id == user.id)
+        statuses = status_counts([s.id for s, _ in subjects])
 
         result = []
-        for s in subjects:
-            ready_scripts = AnswerSheet.query.filter(
-                AnswerSheet.subject_id == s.id,
-                AnswerSheet.status.in_(['FIRST_DONE', 'SECOND_DONE'])
-            ).all()
+        for s, counts in subjects:
+            by_status = statuses[s.id]
+            ready = by_status.get('FIRST_DONE', 0)
+            already_done = by_status.get('SECOND_DONE', 0)
 
-            already_done = [a for a in ready_scripts if a.status == 'SECOND_DONE']
-
-            d = s.to_dict()
+            d = s.to_dict(dict(counts, total_students=sum(by_status.values())))
             d.pop('first_evaluator_id', None)
             d.pop('first_evaluator_name', None)
             d['stats'] = {
-                'ready_for_evaluation': len([a for a in ready_scripts if a.status == 'FIRST_DONE']),
-                'completed': len(already_done),
-                'total_ready': len(ready_scripts)
+                'ready_for_evaluation': ready,
+                'completed': already_done,
+                'total_ready': ready + already_done
             }
             result.append(d)
 
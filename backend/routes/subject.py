@@ -1,11 +1,23 @@
-from flask import Blueprint, request, jsonify, make_response
+from flask import Blueprint, request, jsonify, send_file
 from models import db, Subject, QuestionPaper, AnswerSheet, EvaluationRubric, Mark, User
-import io
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill
+from config import Config
+from services.export_cache import send_export, discard_artifacts
+from services.marks_export import build_marks_workbook, write_marks_workbook, XLSX_MIMETYPE
+from services.subject_stats import load_subjects_with_counts, status_counts
+import json
 
 subject_bp = Blueprint('subject', __name__)
 
+
+def parse_flag(value):
+    """JSON boolean or 'true'/'false' string -> bool; anything else -> None"""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ('true', 'false'):
+        return value.strip().lower() == 'true'
+    return None
+
+
 @subject_bp.route('', methods=['POST'])
 def create_subject():
     """Create a new subject/class.
@@ -21,9 +33,12 @@ def create_subject():
         first_evaluator_id = data.get('first_evaluator_id')
         second_evaluator_id = data.get('second_evaluator_id')
         created_by = data.get('created_by')  # Optional: custodian user id
+        eager_analysis = parse_flag(data.get('eager_analysis', False))
         
         if not name:
             return jsonify({'error': 'Subject name is required'}), 400
+        if eager_analysis is None:
+            return jsonify({'error': 'eager_analysis must be true or false'}), 400
         
         # Validate evaluator IDs if provided
         if first_evaluator_id:
@@ -39,7 +54,8 @@ def create_subject():
             academic_year=academic_year,
             first_evaluator_id=first_evaluator_id,
             second_evaluator_id=second_evaluator_id,
-            created_by=created_by
+            created_by=created_by,
+            eager_analysis=eager_analysis
         )
         
         db.session.add(subject)
@@ -62,10 +78,11 @@ def create_subject():
 def list_subjects():
     """Get all subjects"""
     try:
-        subjects = Subject.query.order_by(Subject.created_at.desc()).all()
+        subjects = load_subjects_with_counts()
+        statuses = status_counts([s.id for s, _ in subjects])
         
         return jsonify({
-            'subjects': [s.to_dict() for s in subjects]
+            'subjects': [s.to_dict(dict(counts, total_students=sum(statuses[s.id].values()))) for s, counts in subjects]
         }), 200
         
     except Exception as e:
@@ -110,6 +127,7 @@ def delete_subject(subject_id):
         # Cascade delete will handle all relationships
         db.session.delete(subject)
         db.session.commit()
+        discard_artifacts(subject_id)
         
         print(f"✅ Deleted subject: {subject.name} (ID={subject_id})")
         
@@ -171,6 +189,75 @@ def assign_evaluators(subject_id):
         return jsonify({'error': str(e)}), 500
 
 
+@subject_bp.route('/<int:subject_id>/header-box', methods=['PUT'])
+def set_header_box(subject_id):
+    """Set where student details appear on page 0 of this subject's answer sheets.
+    
+    Body: { header_box: {x, y, width, height} | null } as fractions (0-1) of
+    the page. null falls back to the top strip from STUDENT_HEADER_RATIO.
+    """
+    try:
+        subject = Subject.query.get_or_404(subject_id)
+        data = request.json
+        box = data.get('header_box')
+
+        if box is None:
+            subject.header_box = None
+        else:
+            try:
+                box = {key: float(box[key]) for key in ('x', 'y', 'width', 'height')}
+            except (KeyError, TypeError, ValueError):
+                return jsonify({'error': 'header_box needs numeric x, y, width and height'}), 400
+            if (min(box.values()) < 0 or box['width'] <= 0 or box['height'] <= 0
+                    or box['x'] + box['width'] > 1 or box['y'] + box['height'] > 1):
+                return jsonify({'error': 'header_box must lie within the page (fractions 0-1)'}), 400
+            subject.header_box = json.dumps(box)
+
+        db.session.commit()
+
+        print(f"✅ Header box set for subject {subject_id}: {subject.header_box}")
+
+        return jsonify({
+            'message': 'Header box updated successfully',
+            'subject': subject.to_dict()
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error setting header box: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@subject_bp.route('/<int:subject_id>/eager-analysis', methods=['PUT'])
+def set_eager_analysis(subject_id):
+    """Turn background analysis of every page after upload on or off.
+    
+    Body: { enabled: bool }
+    """
+    try:
+        subject = Subject.query.get_or_404(subject_id)
+        data = request.json
+
+        enabled = parse_flag(data.get('enabled'))
+        if enabled is None:
+            return jsonify({'error': 'enabled must be true or false'}), 400
+
+        subject.eager_analysis = enabled
+        db.session.commit()
+
+        print(f"✅ Eager analysis for subject {subject_id}: {subject.eager_analysis}")
+
+        return jsonify({
+            'message': 'Eager analysis updated successfully',
+            'subject': subject.to_dict()
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error setting eager analysis: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
 @subject_bp.route('/<int:subject_id>/students', methods=['GET'])
 def get_subject_students(subject_id):
     """Get all students for a subject (for student switcher)"""
@@ -199,95 +286,17 @@ def get_subject_students(subject_id):
         return jsonify({'error': str(e)}), 500
 @subject_bp.route('/<int:subject_id>/export-marks', methods=['GET'])
 def export_subject_marks(subject_id):
-    """Export all marks for a subject to Excel"""
+    """Export all marks for a subject to Excel (cached per data version, see services/export_cache.py)"""
     try:
         subject = Subject.query.get_or_404(subject_id)
-        answer_sheets = AnswerSheet.query.filter_by(subject_id=subject_id).order_by(AnswerSheet.roll_number).all()
-        
-        # Create a mapping of student marks
-        # student_id -> {question_number -> marks_awarded}
-        all_marks = {}
-        unique_questions = set()
-        
-        for sheet in answer_sheets:
-            marks = Mark.query.filter_by(answer_sheet_id=sheet.id).all()
-            student_marks = {}
-            for m in marks:
-                student_marks[m.question_number] = m.marks_awarded
-                unique_questions.add(m.question_number)
-            all_marks[sheet.id] = student_marks
-        
-        # Sort unique questions (numeric if possible, else string)
-        def sort_key(q):
-            try:
-                # Try to extract numbers if it's like "Q1", "2a"
-                import re
-                nums = re.findall(r'\d+', str(q))
-                return int(nums[0]) if nums else 0
-            except:
-                return 0
-
-        sorted_questions = sorted(list(unique_questions), key=sort_key)
-        
-        # Create Excel Workbook
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = f"Marks - {subject.name}"
-        
-        # Define styles
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
-        center_align = Alignment(horizontal="center")
-        
-        # Set Headers
-        headers = ['Roll Number', 'Student Name'] + [f"Q{q}" if not str(q).startswith('Q') else q for q in sorted_questions] + ['Total', 'Percentage', 'Status']
-        
-        for col_num, header_title in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num)
-            cell.value = header_title
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = center_align
-            
-            # Adjust column width
-            column_letter = openpyxl.utils.get_column_letter(col_num)
-            ws.column_dimensions[column_letter].width = max(len(str(header_title)) + 2, 12)
-            
-        # Write Data
-        for row_num, sheet in enumerate(answer_sheets, 2):
-            ws.cell(row=row_num, column=1, value=sheet.roll_number)
-            ws.cell(row=row_num, column=2, value=sheet.student_name)
-            
-            row_total = 0
-            max_total = 0 # This would ideally come from the rubric/QP
-            
-            for col_num, q_num in enumerate(sorted_questions, 3):
-                val = all_marks.get(sheet.id, {}).get(q_num, '-')
-                ws.cell(row=row_num, column=col_num, value=val)
-                if isinstance(val, (int, float)):
-                    row_total += val
-            
-            # For percentage, we need max marks. If not available per student, we use evaluated percentage if stored.
-            # Get total marks if available
-            eval_total = get_total_marks_logic(sheet.id)
-            
-            ws.cell(row=row_num, column=len(headers) - 2, value=row_total)
-            ws.cell(row=row_num, column=len(headers) - 1, value=f"{eval_total.get('percentage', 0):.2f}%" if eval_total else "-")
-            ws.cell(row=row_num, column=len(headers), value=sheet.status.capitalize())
-            
-        # Save to buffer
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
-        
         filename = f"{subject.name}_{subject.class_name}_Marks.xlsx".replace(" ", "_")
         
-        response = make_response(output.getvalue())
-        response.headers["Content-Disposition"] = f"attachment; filename={filename}"
-        response.headers["Content-type"] = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        if Config.EXPORT_CACHE_ENABLED:
+            return send_export(subject, 'xlsx', write_marks_workbook, XLSX_MIMETYPE, filename)
         
+        output = build_marks_workbook(subject)
         print(f"✅ Exported marks for subject ID={subject_id}")
-        return response
+        return send_file(output, mimetype=XLSX_MIMETYPE, as_attachment=True, download_name=filename)
         
     except Exception as e:
         print(f"❌ Error exporting marks: {str(e)}")
@@ -296,20 +305,23 @@ def export_subject_marks(subject_id):
         return jsonify({'error': str(e)}), 500
 
 
-def get_total_marks_logic(answer_sheet_id):
-    """Helper for total marks calculation (ported from evaluation route)"""
-    try:
-        marks = Mark.query.filter_by(answer_sheet_id=answer_sheet_id).all()
-        if not marks: return {'total_awarded': 0, 'total_max': 0, 'percentage': 0}
-        total_awarded = sum(mark.marks_awarded for mark in marks)
-        total_max = sum(mark.max_marks for mark in marks)
-        return {
-            'total_awarded': total_awarded,
-            'total_max': total_max,
-            'percentage': (total_awarded / total_max * 100) if total_max > 0 else 0
-        }
-    except:
-        return None
+def load_subject_marks(subject_id):
+    """
+    Marks of every answer sheet of a subject in one query, instead of
+    one per student (totals are stored on the sheets themselves)
+    
+    Returns:
+        {sheet_id: {question_number: (awarded, max)}}; sheets without
+        marks are absent
+    """
+    marks = {}
+    rows = db.session.query(
+        Mark.answer_sheet_id, Mark.question_number, Mark.marks_awarded, Mark.max_marks
+    ).join(AnswerSheet, (AnswerSheet.id == Mark.answer_sheet_id) & (AnswerSheet.subject_id == subject_id))
+    for sheet_id, question_number, awarded, max_marks in rows:
+        marks.setdefault(sheet_id, {})[question_number] = (awarded, max_marks)
+    
+    return marks
 
 
 @subject_bp.route('/<int:subject_id>/results', methods=['GET'])
@@ -319,20 +331,19 @@ def get_subject_results(subject_id):
         subject = Subject.query.get_or_404(subject_id)
         answer_sheets = AnswerSheet.query.filter_by(subject_id=subject_id).order_by(AnswerSheet.roll_number).all()
 
+        sheet_marks = load_subject_marks(subject_id)
+
         all_questions = set()
         students = []
 
         for sheet in answer_sheets:
-            marks = Mark.query.filter_by(answer_sheet_id=sheet.id).all()
             marks_map = {}
-            for m in marks:
-                marks_map[str(m.question_number)] = {
-                    'awarded': m.marks_awarded,
-                    'max': m.max_marks
+            for q_num, (awarded, max_marks) in sheet_marks.get(sheet.id, {}).items():
+                marks_map[str(q_num)] = {
+                    'awarded': awarded,
+                    'max': max_marks
                 }
-                all_questions.add(str(m.question_number))
-
-            totals = get_total_marks_logic(sheet.id)
+                all_questions.add(str(q_num))
 
             students.append({
                 'id': sheet.id,
@@ -340,9 +351,9 @@ def get_subject_results(subject_id):
                 'roll_number': sheet.roll_number or '-',
                 'status': sheet.status,
                 'marks': marks_map,
-                'total_awarded': totals['total_awarded'] if totals else 0,
-                'total_max': totals['total_max'] if totals else 0,
-                'percentage': round(totals['percentage'], 1) if totals else 0
+                'total_awarded': sheet.total_awarded,
+                'total_max': sheet.total_max,
+                'percentage': round(sheet.percentage, 1)
             })
 
         # Sort questions naturally
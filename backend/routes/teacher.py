@@ -17,6 +17,7 @@ All endpoints accept ?user_id=<id> as a query param for auth.
 
 from flask import Blueprint, request, jsonify
 from models import db, User, Subject, AnswerSheet
+from services.subject_stats import load_subjects_with_counts, status_counts
 
 teacher_bp = Blueprint('teacher', __name__)
 
@@ -50,19 +51,21 @@ def get_teacher_subjects():
         if not user:
             return jsonify({'error': 'User not found'}), 401
 
-        subjects = Subject.query.filter_by(first_evaluator_id=user.id).order_by(Subject.created_at.desc()).all()
+        subjects = load_subjects_with_counts(Subject.first_evaluator_id == user.id)
+        statuses = status_counts([s.id for s, _ in subjects])
 
         result = []
-        for s in subjects:
-            all_sheets = AnswerSheet.query.filter_by(subject_id=s.id).all()
-            first_done = [a for a in all_sheets if a.status in ('FIRST_DONE', 'SECOND_DONE', 'evaluated')]
-            pending = [a for a in all_sheets if a.status in ('UPLOADED', 'pending')]
+        for s, counts in subjects:
+            by_status = statuses[s.id]
+            total = sum(by_status.values())
+            first_done = sum(by_status.get(status, 0) for status in ('FIRST_DONE', 'SECOND_DONE', 'evaluated'))
+            pending = sum(by_status.get(status, 0) for status in ('UPLOADED', 'pending'))
 
-            d = s.to_dict()
+            d = s.to_dict(dict(counts, total_students=total))
             d['stats'] = {
-                'total': len(all_sheets),
-                'evaluated_by_me': len(first_done),
-                'pending': len(pending)
+                'total': total,
+                'evaluated_by_me': first_done,
+                'pending': pending
             }
             result.append(d)
 
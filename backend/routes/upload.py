@@ -1,13 +1,19 @@
 from flask import Blueprint, request, jsonify, send_from_directory
 from werkzeug.utils import secure_filename
-from models import db, QuestionPaper, AnswerSheet, EvaluationRubric
+from models import db, QuestionPaper, AnswerSheet, EvaluationRubric, UploadBatch, Subject
 from config import Config
+from services.gemini_ocr import AsyncGeminiOCRService
+from services.page_analysis import queue_eager_analysis
 from services.pdf_processor import PDFProcessor
+import json
 import os
 from datetime import datetime
 
 upload_bp = Blueprint('upload', __name__)
 
+# Shared by eager analysis of uploaded sheets (one client setup per process)
+ocr_service = AsyncGeminiOCRService()
+
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and \
@@ -23,6 +29,27 @@ def get_upload_path(subject_id, folder_type, filename):
     os.makedirs(base_dir, exist_ok=True)
     return os.path.join(base_dir, filename)
 
+def read_page_info(filepath):
+    """Page count, sizes and blank pages to store on the document row (non-critical)"""
+    try:
+        info = PDFProcessor.get_page_info(filepath)
+        page_count, page_sizes = info['page_count'], json.dumps(info['page_sizes'])
+    except Exception as e:
+        print(f"⚠️ Could not read page info for {filepath}: {e}")
+        return None, None, None
+    
+    return page_count, page_sizes, read_blank_pages(filepath)
+
+def read_blank_pages(filepath):
+    """Blank page numbers as JSON, or None to detect them on first use"""
+    if not Config.BLANK_PAGE_DETECTION:
+        return None
+    try:
+        return json.dumps(PDFProcessor.find_blank_pages(filepath))
+    except Exception as e:
+        print(f"⚠️ Blank page detection skipped for {filepath}: {e}")
+        return None
+
 def parse_id(id_val):
     """Safe parsing of ID from form data"""
     if id_val and str(id_val).lower() not in ['undefined', 'null', '', 'none']:
@@ -71,11 +98,16 @@ def upload_question_paper():
         except Exception as e:
             print(f"Thumbnail generation skipped: {e}")
             
+        page_count, page_sizes, blank_pages = read_page_info(filepath)
+            
         question_paper = QuestionPaper(
             subject_id=final_subject_id,
             title=title or filename,
             file_path=filepath,
-            total_questions=int(total_questions or 0)
+            total_questions=int(total_questions or 0),
+            page_count=page_count,
+            page_sizes=page_sizes,
+            blank_pages=blank_pages
         )
         db.session.add(question_paper)
         db.session.commit()
@@ -130,15 +162,28 @@ def upload_answer_sheet():
         except Exception as e:
             print(f"⚠️ Answer sheet thumbnail generation skipped: {e}")
         
+        page_count, page_sizes, blank_pages = read_page_info(filepath)
+        
         answer_sheet = AnswerSheet(
             subject_id=final_subject_id,
             student_name=student_name or 'Unknown Student',
             file_path=filepath,
-            question_paper_id=final_qp_id
+            question_paper_id=final_qp_id,
+            page_count=page_count,
+            page_sizes=page_sizes,
+            blank_pages=blank_pages
         )
         db.session.add(answer_sheet)
         db.session.commit()
         
+        # Pre-analyse all pages in the background if the subject opted in (non-critical)
+        subject = db.session.get(Subject, final_subject_id) if final_subject_id else None
+        if subject and subject.eager_analysis:
+            try:
+                queue_eager_analysis([answer_sheet.id], ocr_service)
+            except Exception as e:
+                print(f"⚠️ Eager analysis not queued for sheet {answer_sheet.id}: {e}")
+        
         return jsonify({
             'message': 'Answer sheet uploaded successfully',
             'data': answer_sheet.to_dict()
@@ -191,7 +236,8 @@ def upload_rubric():
         rubric = EvaluationRubric(
             subject_id=final_subject_id,
             title=title or filename,
-            file_path=filepath
+            file_path=filepath,
+            blank_pages=read_blank_pages(filepath)
         )
         db.session.add(rubric)
         db.session.commit()
@@ -304,6 +350,7 @@ def delete_file(file_id):
         
         # 3. Delete physical files (try-except as they might already be gone)
         try:
+            PDFProcessor.release_document(file_path)
             if os.path.exists(file_path):
                 os.remove(file_path)
             if os.path.exists(thumb_path):
@@ -320,7 +367,13 @@ def delete_file(file_id):
 
 @upload_bp.route('/answer-sheets-batch', methods=['POST'])
 def upload_answer_sheets_batch():
-    """Upload multiple answer sheets at once with auto student extraction"""
+    """
+    Upload multiple answer sheets at once with auto student extraction
+    
+    Files are saved immediately; extraction, thumbnails and the answer sheet
+    rows are created by a background batch. Poll
+    GET /answer-sheets-batch/<batch_id> for per-file progress.
+    """
     try:
         if 'files' not in request.files:
             return jsonify({'error': 'No files provided'}), 400
@@ -349,9 +402,8 @@ def upload_answer_sheets_batch():
                 pass
         
         from services.student_extractor import StudentExtractor
-        from services.pdf_processor import PDFProcessor
+        from services.batch_upload import start_batch_upload
         
-        extractor = StudentExtractor()
         results = []
         
         for file in files:
@@ -376,72 +428,48 @@ def upload_answer_sheets_batch():
                 filepath = get_upload_path(final_subject_id, 'answer_sheets', filename)
                 file.save(filepath)
                 
-                # Extract first page for student info
-                try:
-                    first_page_image = PDFProcessor.pdf_page_to_image(filepath, 0, zoom=2.0)
-                    student_info = extractor.extract_student_info(first_page_image)
-                except Exception as extract_err:
-                    print(f"⚠️ Student extraction failed for {filename}: {extract_err}")
-                    student_info = {'name': None, 'roll_number': None, 'class_name': None}
-                
-                # Use extracted name or fallback to filename
-                student_name = student_info.get('name') or filename.split('.')[0]
-                
-                # Generate thumbnail (non-critical)
-                thumbnail_dir = os.path.join(Config.UPLOAD_FOLDER, 'thumbnails')
-                os.makedirs(thumbnail_dir, exist_ok=True)
-                thumbnail_path = os.path.join(thumbnail_dir, f"thumb_{filename}.png")
-                try:
-                    PDFProcessor.generate_thumbnail(filepath, thumbnail_path)
-                except Exception as e:
-                    print(f"⚠️ Thumbnail generation skipped for {filename}: {e}")
-                
-                # Create database entry
-                answer_sheet = AnswerSheet(
-                    subject_id=final_subject_id,
-                    student_name=student_name,
-                    roll_number=student_info.get('roll_number'),
-                    class_name=student_info.get('class_name'),
-                    file_path=filepath,
-                    question_paper_id=final_qp_id
-                )
-                db.session.add(answer_sheet)
-                db.session.commit()
-                
                 results.append({
                     'filename': file.filename,
-                    'status': 'success',
-                    'student_name': student_name,
-                    'roll_number': student_info.get('roll_number'),
-                    'id': answer_sheet.id
+                    'status': 'pending',
+                    'file_path': filepath
                 })
                 
-                print(f"✅ Uploaded {file.filename} → {student_name} ({student_info.get('roll_number')})")
-                
             except Exception as e:
-                db.session.rollback()
                 results.append({
                     'filename': file.filename,
                     'status': 'error',
                     'message': str(e)
                 })
-                print(f"❌ Failed to upload {file.filename}: {str(e)}")
+                print(f"❌ Failed to save {file.filename}: {str(e)}")
         
-        # Summary
-        successful = len([r for r in results if r['status'] == 'success'])
-        failed = len([r for r in results if r['status'] == 'error'])
+        if not any(r['status'] == 'pending' for r in results):
+            return jsonify({
+                'error': 'No valid files to process',
+                'results': results
+            }), 400
+        
+        batch = start_batch_upload(final_subject_id, final_qp_id, results, StudentExtractor())
         
         return jsonify({
-            'message': f'Uploaded {successful} answer sheets successfully, {failed} failed',
-            'results': results,
-            'summary': {
-                'total': len(results),
-                'successful': successful,
-                'failed': failed
-            }
-        }), 201 if successful > 0 else 400
+            'success': True,
+            'batch_id': batch.id,
+            'batch': batch.to_dict()
+        }), 202
         
     except Exception as e:
         db.session.rollback()
         print(f"❌ Batch upload error: {str(e)}")
         return jsonify({'error': str(e)}), 500
+
+@upload_bp.route('/answer-sheets-batch/<int:batch_id>', methods=['GET'])
+def get_upload_batch(batch_id):
+    """Get the progress and per-file results of a batch upload"""
+    try:
+        batch = UploadBatch.query.get_or_404(batch_id)
+        if batch.status in ('QUEUED', 'RUNNING'):
+            from services.batch_upload import fail_stale_upload_batches
+            fail_stale_upload_batches()  # The worker running it may have died
+        return jsonify({'batch': batch.to_dict()}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,69 @@
+"""
+Async Runner
+A single background event loop for the async Gemini client, and a fan-out
+helper that lets synchronous code (Flask views, background jobs) run many
+coroutines concurrently behind a semaphore
+"""
+
+import asyncio
+import queue
+import threading
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop():
+    """
+    Return the process-wide event loop, starting its thread on first use
+
+    The loop lives for the whole process because the Gemini SDK's async
+    transport is bound to the loop it was first used on.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='scriptsense-asyncio', daemon=True).start()
+    return _loop
+
+
+def run_async(coro):
+    """Run a coroutine on the shared loop and block until it returns"""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result()
+
+
+def fan_out(func, items, concurrency):
+    """
+    Await func(item) for every item with at most `concurrency` in flight
+
+    Results are yielded on the calling thread as they complete, so callers
+    can record progress with their own DB session while the rest run.
+
+    Args:
+        func: Coroutine function taking one item
+        items: Iterable of items
+        concurrency: Maximum coroutines running at once
+
+    Yields:
+        Tuple of (item, result, exception); exception is None on success
+    """
+    items = list(items)
+    done = queue.Queue()
+
+    async def run_all():
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def run_one(item):
+            async with semaphore:
+                try:
+                    done.put((item, await func(item), None))
+                except Exception as e:
+                    done.put((item, None, e))
+
+        await asyncio.gather(*(run_one(item) for item in items))
+
+    future = asyncio.run_coroutine_threadsafe(run_all(), get_event_loop())
+    for _ in items:
+        yield done.get()
+    future.result()
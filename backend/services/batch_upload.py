@@ -0,0 +1,214 @@
+"""
+Batch Upload
+Creates answer sheets for a batch of uploaded PDFs in the background:
+student details are extracted with a bounded number of concurrent Gemini
+calls on the shared event loop, and each AnswerSheet row is inserted in
+the same commit as its file's progress, so a crash mid-batch keeps the
+sheets already processed. Saved files that never get a row are deleted.
+"""
+
+import asyncio
+from datetime import datetime
+from flask import current_app
+import json
+import os
+from config import Config
+from models import db, UploadBatch, AnswerSheet, Subject
+from services.async_runner import fan_out
+from services.job_queue import submit_job, stale_jobs
+from services.page_analysis import queue_eager_analysis
+from services.pdf_processor import PDFProcessor
+from services.rate_limiter import request_priority, BULK
+
+
+def start_batch_upload(subject_id, question_paper_id, results, extractor):
+    """
+    Create an UploadBatch row and queue it on the background worker pool
+
+    Args:
+        subject_id: Subject the sheets belong to (or None)
+        question_paper_id: Question paper the sheets answer (or None)
+        results: Per-file result dicts in upload order; saved files have
+                 status 'pending' and a file_path, rejected files 'error'
+        extractor: StudentExtractor used by the workers
+
+    Returns:
+        The queued UploadBatch
+    """
+    batch = UploadBatch(
+        subject_id=subject_id,
+        question_paper_id=question_paper_id,
+        status='QUEUED',
+        total_files=len(results),
+        files_done=len([r for r in results if r['status'] != 'pending']),
+        results=json.dumps(results)
+    )
+    db.session.add(batch)
+    db.session.commit()
+
+    submit_job(current_app._get_current_object(), run_batch_upload, batch.id, extractor, heartbeat=batch)
+    print(f"📥 Queued upload batch {batch.id}: {batch.total_files} files")
+    return batch
+
+
+def fail_stale_upload_batches():
+    """
+    Mark upload batches orphaned by a stopped or crashed server as FAILED
+
+    Answer sheets already created are kept; files still waiting are
+    deleted and reported as errors.
+
+    Returns:
+        Number of batches failed
+    """
+    batches = stale_jobs(UploadBatch)
+    for batch in batches:
+        results = json.loads(batch.results) if batch.results else []
+        _discard_pending(results, 'Interrupted: the server stopped before this file was processed')
+        batch.results = json.dumps(results)
+        batch.status = 'FAILED'
+        batch.finished_at = datetime.utcnow()
+    if batches:
+        db.session.commit()
+        print(f"⚠️ Failed {len(batches)} interrupted upload batch(es): {[batch.id for batch in batches]}")
+    return len(batches)
+
+
+def _discard_file(result, message):
+    """Report a saved file as failed and delete it, since no answer sheet points at it"""
+    try:
+        os.remove(result['file_path'])
+    except OSError:
+        pass
+    result.update({'status': 'error', 'message': message})
+
+
+def _discard_pending(results, message):
+    for result in results:
+        if result['status'] == 'pending':
+            _discard_file(result, message)
+
+
+async def _process_file(file_path, extractor, header_box):
+    """Extract student info, page info and a thumbnail for one saved PDF (runs on the shared event loop)"""
+    filename = os.path.basename(file_path)
+
+    # Student info from the page 0 header (text layer first, then Gemini)
+    try:
+        with request_priority(BULK):
+            student_info = await extractor.extract_from_pdf_async(file_path, header_box)
+    except Exception as extract_err:
+        print(f"⚠️ Student extraction failed for {filename}: {extract_err}")
+        student_info = {'name': None, 'roll_number': None, 'class_name': None}
+
+    info = await asyncio.to_thread(_thumbnail_and_page_info, file_path)
+    return student_info, info
+
+
+def _thumbnail_and_page_info(file_path):
+    filename = os.path.basename(file_path)
+
+    # Generate thumbnail (non-critical)
+    thumbnail_dir = os.path.join(Config.UPLOAD_FOLDER, 'thumbnails')
+    os.makedirs(thumbnail_dir, exist_ok=True)
+    thumbnail_path = os.path.join(thumbnail_dir, f"thumb_{filename}.png")
+    try:
+        PDFProcessor.generate_thumbnail(file_path, thumbnail_path)
+    except Exception as e:
+        print(f"⚠️ Thumbnail generation skipped for {filename}: {e}")
+
+    info = PDFProcessor.get_page_info(file_path)
+    if Config.BLANK_PAGE_DETECTION:
+        try:
+            info['blank_pages'] = PDFProcessor.find_blank_pages(file_path)
+        except Exception as e:
+            print(f"⚠️ Blank page detection skipped for {filename}: {e}")
+    return info
+
+
+def run_batch_upload(batch_id, extractor):
+    """Process a queued UploadBatch; called inside an app context by the job queue"""
+    batch = db.session.get(UploadBatch, batch_id)
+    if not batch:
+        return
+
+    try:
+        results = json.loads(batch.results)
+        batch.status = 'RUNNING'
+        db.session.commit()
+
+        subject = db.session.get(Subject, batch.subject_id) if batch.subject_id else None
+        header_box = json.loads(subject.header_box) if subject and subject.header_box else None
+
+        pending = [i for i, r in enumerate(results) if r['status'] == 'pending']
+        print(f"📦 Upload batch {batch.id}: {len(pending)} files, concurrency={Config.BATCH_UPLOAD_CONCURRENCY}")
+
+        sheet_ids = []
+
+        processed = fan_out(
+            lambda i: _process_file(results[i]['file_path'], extractor, header_box),
+            pending,
+            Config.BATCH_UPLOAD_CONCURRENCY
+        )
+        for i, outcome, error in processed:
+            result = results[i]
+            try:
+                if error is not None:
+                    raise error
+                student_info, info = outcome
+
+                # Use extracted name or fallback to filename
+                student_name = student_info.get('name') or os.path.basename(result['file_path']).split('.')[0]
+
+                sheet = AnswerSheet(
+                    subject_id=batch.subject_id,
+                    student_name=student_name,
+                    roll_number=student_info.get('roll_number'),
+                    class_name=student_info.get('class_name'),
+                    file_path=result['file_path'],
+                    question_paper_id=batch.question_paper_id,
+                    page_count=info['page_count'],
+                    page_sizes=json.dumps(info['page_sizes']),
+                    blank_pages=json.dumps(info['blank_pages']) if 'blank_pages' in info else None
+                )
+                db.session.add(sheet)
+                db.session.flush()
+                sheet_ids.append(sheet.id)
+                result.update({
+                    'status': 'success',
+                    'id': sheet.id,
+                    'student_name': student_name,
+                    'roll_number': student_info.get('roll_number')
+                })
+                print(f"✅ Processed {result['filename']} → {student_name} ({student_info.get('roll_number')})")
+            except Exception as e:
+                db.session.rollback()
+                _discard_file(result, str(e))
+                print(f"❌ Failed to process {result['filename']}: {str(e)}")
+
+            # The sheet and the batch progress are committed together, from
+            # this thread only; the coroutines never touch the DB
+            batch.files_done += 1
+            batch.results = json.dumps(results)
+            db.session.commit()
+
+        batch.status = 'DONE'
+        batch.finished_at = datetime.utcnow()
+        db.session.commit()
+
+        print(f"✅ Upload batch {batch.id} complete. Created {len(sheet_ids)} answer sheets.")
+
+        # Pre-analyse all pages of the new sheets if the subject opted in
+        if subject and subject.eager_analysis:
+            queue_eager_analysis(sorted(sheet_ids), extractor.ocr_service)
+
+    except Exception as e:
+        db.session.rollback()
+        batch = db.session.get(UploadBatch, batch_id)
+        results = json.loads(batch.results) if batch.results else []
+        _discard_pending(results, str(e))
+        batch.results = json.dumps(results)
+        batch.status = 'FAILED'
+        batch.finished_at = datetime.utcnow()
+        db.session.commit()
+        print(f"❌ Upload batch {batch_id} failed: {str(e)}")
@@ -0,0 +1,118 @@
+"""
+Content Store
+Upserts scanned questions and rubric criteria in one statement per page,
+using INSERT ... ON CONFLICT on the (document, question_number) unique
+constraints instead of a lookup per question (marks reuse the same helper)
+"""
+
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, QuestionContent, RubricContent
+from services.question_parser import extract_max_marks
+
+_INSERTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert
+}
+
+
+def upsert_by_question_number(model, key_column, rows, update_columns):
+    """
+    Insert rows, updating update_columns where (key_column, question_number) exists
+
+    Later rows win over earlier rows with the same question number, as
+    they would with one update per question. Caller commits.
+    """
+    # ON CONFLICT cannot touch the same row twice in one statement
+    rows = list({row['question_number']: row for row in rows}.values())
+    if not rows:
+        return 0
+
+    insert = _INSERTS.get(db.engine.dialect.name)
+    if insert is None:
+        return _upsert_by_lookup(model, key_column, rows, update_columns)
+
+    now = datetime.utcnow()
+    stmt = insert(model).values([dict(row, created_at=now) for row in rows])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[key_column, 'question_number'],
+        set_={column: stmt.excluded[column] for column in update_columns}
+    )
+    db.session.execute(stmt)
+    return len(rows)
+
+
+def _upsert_by_lookup(model, key_column, rows, update_columns):
+    """Fallback for other databases: load the document's rows once and merge"""
+    document_id = rows[0][key_column]
+    existing = {
+        row.question_number: row
+        for row in model.query.filter(getattr(model, key_column) == document_id).all()
+    }
+    for row in rows:
+        current = existing.get(row['question_number'])
+        if current:
+            for column in update_columns:
+                setattr(current, column, row[column])
+        else:
+            db.session.add(model(**row))
+    return len(rows)
+
+
+def upsert_questions(question_paper_id, questions, page_number):
+    """
+    Store questions extracted from one question paper page
+
+    Args:
+        question_paper_id: QuestionPaper ID
+        questions: List of {'id', 'content'} dicts from a page analysis
+        page_number: Page the questions were found on (0-indexed)
+
+    Returns:
+        Number of questions stored
+    """
+    rows = [
+        {
+            'question_paper_id': question_paper_id,
+            'question_number': q.get('id', '').strip(),
+            'question_text': q.get('content', '').strip(),
+            'page_number': page_number
+        }
+        for q in questions
+    ]
+    rows = [row for row in rows if row['question_number'] and row['question_text']]
+    return upsert_by_question_number(QuestionContent, 'question_paper_id', rows, ('question_text', 'page_number'))
+
+
+def upsert_rubric_criteria(rubric_id, criteria):
+    """
+    Store grading criteria extracted from one rubric page
+
+    Args:
+        rubric_id: EvaluationRubric ID
+        criteria: List of {'id', 'content'} dicts from a page analysis
+
+    Returns:
+        Number of criteria stored
+    """
+    rows = [
+        {
+            'rubric_id': rubric_id,
+            'question_number': q.get('id', '').strip(),
+            'criteria_text': q.get('content', '').strip()
+        }
+        for q in criteria
+    ]
+    rows = [
+        dict(row, max_marks=extract_max_marks(row['criteria_text']))
+        for row in rows if row['question_number'] and row['criteria_text']
+    ]
+    return upsert_by_question_number(RubricContent, 'rubric_id', rows, ('criteria_text', 'max_marks'))
+
+
+def count_questions(question_paper_id):
+    """Number of stored questions for a question paper"""
+    return db.session.query(func.count(QuestionContent.id)).filter(
+        QuestionContent.question_paper_id == question_paper_id
+    ).scalar()
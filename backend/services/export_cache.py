@@ -0,0 +1,85 @@
+"""
+Export Cache
+Keeps each generated subject export on disk, keyed by (subject, format,
+Subject.data_version), and serves it with an ETag so repeat downloads are
+a file send or a 304 instead of a rebuild. data_version is bumped by the
+flush hook in models.py whenever exported data changes, so a new version
+simply misses the cache and older files are removed on the next build.
+"""
+
+import glob
+import os
+import threading
+from flask import Response, request, send_file
+from config import Config
+
+
+def export_etag(subject, fmt):
+    return f"subject-{subject.id}-{fmt}-v{subject.data_version or 0}"
+
+
+def _artifact_pattern(subject_id, fmt):
+    return os.path.join(Config.EXPORT_CACHE_DIR, f"subject_{subject_id}_v*.{fmt}")
+
+
+def artifact_path(subject, fmt):
+    return os.path.join(Config.EXPORT_CACHE_DIR, f"subject_{subject.id}_v{subject.data_version or 0}.{fmt}")
+
+
+def get_artifact(subject, fmt, write):
+    """
+    Path of the export for the subject's current data version, building it
+    with write(subject, binary_file) if it is not on disk yet
+
+    The file is written under a temporary name and renamed into place, so
+    concurrent requests never serve a partial file.
+    """
+    path = artifact_path(subject, fmt)
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(Config.EXPORT_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            write(subject, f)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    print(f"📦 Built {fmt} export for subject ID={subject.id} (v{subject.data_version or 0})")
+
+    # Earlier versions can never be requested again
+    for old_path in glob.glob(_artifact_pattern(subject.id, fmt)):
+        if old_path != path:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+    return path
+
+
+def discard_artifacts(subject_id):
+    """Remove every cached export of a subject (e.g. once it is deleted)"""
+    for path in glob.glob(_artifact_pattern(subject_id, '*')):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def send_export(subject, fmt, write, mimetype, download_name):
+    """
+    Response for a subject export: 304 when the client's If-None-Match
+    already has the current version, else the cached file with its ETag
+    """
+    etag = export_etag(subject, fmt)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    path = get_artifact(subject, fmt, write)
+    return send_file(path, mimetype=mimetype, as_attachment=True, download_name=download_name,
+                     etag=etag, conditional=True)
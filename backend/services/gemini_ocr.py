@@ -1,29 +1,264 @@
 import google.generativeai as genai
+import asyncio
 from PIL import Image
+from collections import OrderedDict
+import hashlib
 import io
+import json
+import os
+import sqlite3
+import threading
 import time
 from config import Config
+from services.image_preprocess import preprocess_image, remap_bounding_box
+from services.question_parser import split_question_blocks
+from services.rate_limiter import get_rate_limiter, estimate_tokens
+
+
+class MemoryCacheBackend:
+    """In-process LRU cache tier bounded by entry count"""
+    
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (text, created_at)
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+    
+    def set(self, key, text, created_at):
+        with self._lock:
+            self._entries[key] = (text, created_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class SQLiteCacheBackend:
+    """On-disk cache tier shared by every worker process on the host"""
+    
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, text TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+    
+    def _connect(self):
+        # One short-lived connection per call keeps this safe across threads
+        return sqlite3.connect(self.path, timeout=10)
+    
+    def get(self, key):
+        with self._connect() as conn:
+            row = conn.execute("SELECT text, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        return tuple(row) if row else None
+    
+    def set(self, key, text, created_at):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, text, created_at) VALUES (?, ?, ?)",
+                (key, text, created_at)
+            )
+    
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+
+class GeminiResponseCache:
+    """
+    Content-addressed cache of Gemini response text
+    
+    Keys hash the model name, generation config, prompt text and the raw
+    pixels of any image, so the same request always maps to the same entry
+    regardless of which endpoint issued it. Backends are checked in order
+    and a hit in a slower tier is promoted into the faster ones.
+    """
+    
+    # Bump to invalidate every cached response (e.g. after an SDK upgrade)
+    CACHE_VERSION = 1
+    
+    def __init__(self, backends, ttl=0):
+        self.backends = backends
+        self.ttl = ttl
+    
+    def make_key(self, model_name, inputs, config=None):
+        """Hash a generate_content request into a cache key"""
+        sha = hashlib.sha256()
+        sha.update(f"v{self.CACHE_VERSION}|{model_name}|".encode('utf-8'))
+        sha.update(json.dumps(config or {}, sort_keys=True, default=str).encode('utf-8'))
+        
+        parts = inputs if isinstance(inputs, (list, tuple)) else [inputs]
+        for part in parts:
+            if isinstance(part, str):
+                sha.update(b'|text|' + part.encode('utf-8'))
+            elif isinstance(part, Image.Image):
+                # Hash decoded pixels, not the encoded file, so the same image
+                # loaded from PNG or rendered from a PDF gives the same key
+                sha.update(f"|image|{part.mode}|{part.size}|".encode('utf-8'))
+                sha.update(part.tobytes())
+            elif isinstance(part, dict) and 'data' in part:
+                sha.update(f"|blob|{part.get('mime_type')}|".encode('utf-8'))
+                sha.update(part['data'])
+            elif isinstance(part, (bytes, bytearray)):
+                sha.update(b'|bytes|' + bytes(part))
+            else:
+                # Unknown part type: do not risk serving a wrong response
+                return None
+        return sha.hexdigest()
+    
+    def get(self, key):
+        now = time.time()
+        for i, backend in enumerate(self.backends):
+            try:
+                entry = backend.get(key)
+            except Exception as e:
+                print(f"⚠️ Gemini cache read failed: {e}")
+                continue
+            if entry is None:
+                continue
+            text, created_at = entry
+            if self.ttl and now - created_at > self.ttl:
+                backend.delete(key)
+                continue
+            for faster in self.backends[:i]:
+                faster.set(key, text, created_at)
+            return text
+        return None
+    
+    def set(self, key, text):
+        created_at = time.time()
+        for backend in self.backends:
+            try:
+                backend.set(key, text, created_at)
+            except Exception as e:
+                print(f"⚠️ Gemini cache write failed: {e}")
+
+
+class CachedResponse:
+    """Stand-in for a Gemini response served from the cache"""
+    
+    def __init__(self, text):
+        self.text = text
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """Return the process-wide response cache, or None when disabled"""
+    global _response_cache
+    if not Config.GEMINI_CACHE_ENABLED:
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            backends = [MemoryCacheBackend(Config.GEMINI_CACHE_MAX_ENTRIES)]
+            if Config.GEMINI_CACHE_PATH:
+                try:
+                    backends.append(SQLiteCacheBackend(Config.GEMINI_CACHE_PATH))
+                except Exception as e:
+                    print(f"⚠️ Gemini disk cache unavailable, using memory only: {e}")
+            _response_cache = GeminiResponseCache(backends, ttl=Config.GEMINI_CACHE_TTL)
+    return _response_cache
+
+def image_settings_tag():
+    """Short label of the GEMINI_IMAGE_* settings images are uploaded with"""
+    if not Config.GEMINI_IMAGE_PREPROCESS:
+        return 'raw'
+    tag = f"{Config.GEMINI_IMAGE_FORMAT.lower()}{Config.GEMINI_IMAGE_QUALITY}-{Config.GEMINI_IMAGE_MAX_SIDE}px"
+    if Config.GEMINI_IMAGE_GRAYSCALE:
+        tag += '-gray'
+    if Config.GEMINI_IMAGE_TRIM:
+        tag += '-trim'
+    return tag
 
 class GeminiOCRService:
     """Service for OCR using Google Gemini API"""
     
+    MODEL_NAME = 'gemini-2.0-flash'
+    
+    # Bump whenever the auto_analyze_page prompt or parsing changes so that
+    # stored PageAnalysis rows are no longer served. The image settings are
+    # part of it too: a page sent at another size or quality is a new analysis.
+    ANALYSIS_VERSION = f"{MODEL_NAME}/auto-analyze-v1/{image_settings_tag()}"
+    
     def __init__(self):
         """Initialize Gemini API"""
         if not Config.GEMINI_API_KEY:
             raise ValueError("GEMINI_API_KEY not set in environment variables")
         
         genai.configure(api_key=Config.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel('gemini-2.0-flash')
+        self.model = genai.GenerativeModel(self.MODEL_NAME)
+        
+    def generate_content(self, inputs, config=None):
+        """
+        Call Gemini through the shared response cache
+        
+        Args:
+            inputs: Prompt string or list of prompt parts (text, PIL Images)
+            config: Optional generation config dict
+            
+        Returns:
+            Gemini response (or CachedResponse) exposing .text
+        """
+        key, cached = self._cache_lookup(inputs, config)
+        if cached:
+            return cached
+        
+        response = self._generate_content_with_retry(inputs, config=config)
+        self._cache_store(key, response)
+        return response
+    
+    def _cache_lookup(self, inputs, config=None):
+        """Return (cache key or None, CachedResponse or None)"""
+        cache = get_response_cache()
+        key = cache.make_key(self.MODEL_NAME, inputs, config) if cache else None
         
+        if key:
+            text = cache.get(key)
+            if text is not None:
+                print(f"⚡ Gemini cache hit ({key[:12]})")
+                return key, CachedResponse(text)
+        return key, None
+    
+    def _cache_store(self, key, response):
+        if not key:
+            return
+        try:
+            text = response.text
+        except Exception:
+            # Blocked or empty responses are never cached
+            text = None
+        if text:
+            get_response_cache().set(key, text)
+    
     def _generate_content_with_retry(self, inputs, config=None, max_retries=3):
-        """Helper to retry API calls on 429 errors"""
+        """Helper to pace API calls through the rate limiter and retry on 429 errors"""
+        limiter = get_rate_limiter()
         for attempt in range(max_retries):
             try:
-                if config:
-                    return self.model.generate_content(inputs, generation_config=config)
-                return self.model.generate_content(inputs)
+                if limiter is None:
+                    return self._call_model(inputs, config)
+                with limiter.limit(estimate_tokens(inputs)) as permit:
+                    response = self._call_model(inputs, config)
+                    permit.record(response)
+                    return response
             except Exception as e:
                 if "429" in str(e) or "Resource has been exhausted" in str(e):
+                    if limiter is not None:
+                        limiter.backoff()
                     if attempt < max_retries - 1:
                         wait_time = (2 ** attempt) + 1  # Exponential backoff: 2s, 3s, 5s
                         print(f"⚠️ Gemini 429 Limit hit. Retrying in {wait_time}s...")
@@ -31,6 +266,42 @@ class GeminiOCRService:
                         continue
                 raise e
     
+    def _call_model(self, inputs, config=None):
+        if config:
+            return self.model.generate_content(inputs, generation_config=config)
+        return self.model.generate_content(inputs)
+    
+    def prepare_image(self, image):
+        """
+        Shrink an image for upload (see services/image_preprocess.py)
+        
+        Returns:
+            Tuple of (prompt part, crop box of the trimmed margins or None)
+        """
+        if not Config.GEMINI_IMAGE_PREPROCESS:
+            return image, None
+        return preprocess_image(
+            image,
+            max_side=Config.GEMINI_IMAGE_MAX_SIDE,
+            grayscale=Config.GEMINI_IMAGE_GRAYSCALE,
+            trim=Config.GEMINI_IMAGE_TRIM,
+            fmt=Config.GEMINI_IMAGE_FORMAT,
+            quality=Config.GEMINI_IMAGE_QUALITY
+        )
+    
+    @staticmethod
+    def _remap_diagrams(result, crop_box, original_size):
+        """Express diagram boxes found on a trimmed image relative to the full page"""
+        if crop_box and result.get('success'):
+            for diagram in result.get('diagrams', []):
+                bbox = diagram.get('bounding_box')
+                if bbox and len(bbox) == 4:
+                    try:
+                        diagram['bounding_box'] = remap_bounding_box([float(v) for v in bbox], crop_box, original_size)
+                    except (TypeError, ValueError):
+                        pass
+        return result
+    
     def transcribe_handwriting(self, image_data, is_path=True):
         """
         Transcribe handwritten text from image
@@ -76,7 +347,7 @@ class GeminiOCRService:
             6. RESPONSE FORMAT: 
                - Return ONLY the clean transcription text. No metadata or conversation."""
             
-            response = self._generate_content_with_retry([prompt, image])
+            response = self.generate_content([prompt, self.prepare_image(image)[0]])
             
             if response and response.text:
                 return response.text.strip()
@@ -120,7 +391,7 @@ class GeminiOCRService:
             IF NO VALID DIAGRAM IS FOUND:
             - Explicitly respond with "No diagrams found."."""
             
-            response = self._generate_content_with_retry([prompt, image])
+            response = self.generate_content([prompt, self.prepare_image(image)[0]])
             
             if response and response.text:
                 has_diagram = "no diagram" not in response.text.lower() and "no valid diagram" not in response.text.lower()
@@ -144,24 +415,8 @@ class GeminiOCRService:
                 'image_available': False
             }
     
-    def auto_analyze_page(self, image_data, is_path=True):
-        """
-        Automatically analyze a full page to extract transcription and diagram bounding boxes.
-        
-        Args:
-            image_data: File path or PIL Image object
-            is_path: Whether image_data is a file path
-            
-        Returns:
-            Dictionary with transcription and a list of diagram objects
-        """
-        try:
-            if is_path:
-                image = Image.open(image_data)
-            else:
-                image = image_data
-            
-            prompt = """Analyze this image of an academic answer sheet. I need a complete transcription of all handwritten text and identification of all diagrams.
+    # auto_analyze_page prompt; any change here needs an ANALYSIS_VERSION bump
+    AUTO_ANALYZE_PROMPT = """Analyze this image of an academic answer sheet. I need a complete transcription of all handwritten text and identification of all diagrams.
             
             Return the result in a valid JSON format with the following structure:
             {
@@ -187,95 +442,41 @@ class GeminiOCRService:
                - IMPORTANT: Start the corresponding text block with specific bold labels like '**Q1.**', '**Q2(a).**', etc.
                - Ensure every answer block is clearly associated with its question identifier if visible.
             9. Return ONLY the JSON object. No other text."""
+    
+    def auto_analyze_page(self, image_data, is_path=True):
+        """
+        Automatically analyze a full page to extract transcription and diagram bounding boxes.
+        
+        Args:
+            image_data: File path or PIL Image object
+            is_path: Whether image_data is a file path
+            
+        Returns:
+            Dictionary with transcription and a list of diagram objects
+        """
+        try:
+            if is_path:
+                image = Image.open(image_data)
+            else:
+                image = image_data
+            
+            part, crop_box = self.prepare_image(image)
             
             # Using JSON mode if supported
             try:
                 try:
-                    response = self._generate_content_with_retry(
-                        [prompt, image],
+                    response = self.generate_content(
+                        [self.AUTO_ANALYZE_PROMPT, part],
                         config={"response_mime_type": "application/json"}
                     )
                 except Exception as config_err:
                     # Fallback if response_mime_type is not supported
                     print(f"⚠️ JSON mode not supported: {config_err}. Falling back to standard text.")
-                    response = self._generate_content_with_retry([prompt, image])
+                    response = self.generate_content([self.AUTO_ANALYZE_PROMPT, part])
                 
-                if not response or not response.text:
-                    return {
-                        'transcription': "AI returned an empty response.",
-                        'diagrams': [],
-                        'success': False,
-                        'error': "Empty response from Gemini"
-                    }
-
-                import json
-                text = response.text
-                print(f"DEBUG_GEMINI_RAW: {text}")
-                
-                import re
-                
-                # Cleanup text if not in JSON-only mode (remove markdown blocks)
-                if "```json" in text:
-                    text = text.split("```json")[1].split("```")[0].strip()
-                elif "```" in text:
-                    text = text.split("```")[1].split("```")[0].strip()
-                
-                # Fallback: Extraction using regex if potential JSON is found but not in code blocks
-                if not text.startswith('{'):
-                    json_match = re.search(r'(\{.*\})', text, re.DOTALL)
-                    if json_match:
-                        text = json_match.group(1)
-
-                try:
-                    result = json.loads(text)
-                    
-                    # Parse transcription for question blocks
-                    transcription_text = result.get('transcription', '')
-                    questions = []
-                    
-                    try:
-                        # Regex to find blocks starting with **Q...** or **1...**
-                        # Captures: 1. The ID (e.g. Q1, 1a), 2. The content until next tag
-                        question_blocks = re.split(r'(\*\*(?:Q\d+|Q?\d+[a-z]?|\d+[\.\)])[\w\s\.]*\*\*)', transcription_text)
-                        
-                        if len(question_blocks) > 1:
-                            # 0 is usually empty pre-match text, then pairs of (Header, Content)
-                            current_header = ""
-                            for i in range(1, len(question_blocks), 2):
-                                header = question_blocks[i].replace('*', '').strip()
-                                content = question_blocks[i+1].strip() if i+1 < len(question_blocks) else ""
-                                questions.append({
-                                    'id': header,
-                                    'content': content
-                                })
-                    except Exception as parse_e:
-                        print(f"Error parsing question blocks: {parse_e}")
-
-                    return {
-                        'transcription': transcription_text,
-                        'questions': questions,
-                        'diagrams': result.get('diagrams', []),
-                        'success': True
-                    }
-                except json.JSONDecodeError as je:
-                    print(f"JSON Decode Failed. Text: {text[:200]}...")
-                    return {
-                        'transcription': "Failed to parse AI response as JSON.",
-                        'diagrams': [],
-                        'success': False,
-                        'error': f"JSON Decode Error: {str(je)}"
-                    }
+                return self._remap_diagrams(self._parse_page_analysis(response), crop_box, image.size)
             except Exception as e:
-                # Handle safety filters or blocked responses
-                error_msg = str(e)
-                if "safety" in error_msg.lower():
-                    error_msg = "Content flagged by safety filters. Please ensure the handwriting is clear and appropriate."
-                return {
-                    'transcription': "AI Analysis failed.",
-                    'diagrams': [],
-                    'success': False,
-                    'error': error_msg
-                }
+                return self._analysis_failure(e)
                 
         except Exception as e:
             print(f"Error in automatic analysis: {str(e)}")
@@ -284,10 +485,165 @@ class GeminiOCRService:
                 'diagrams': [],
                 'success': False
             }
+    
+    def _parse_page_analysis(self, response):
+        """Turn an auto-analysis response into the auto_analyze_page result dict"""
+        if not response or not response.text:
+            return {
+                'transcription': "AI returned an empty response.",
+                'diagrams': [],
+                'success': False,
+                'error': "Empty response from Gemini"
+            }
 
-    def process_pdf_region(self, image_data, coordinates=None):
+        import json
+        text = response.text
+        print(f"DEBUG_GEMINI_RAW: {text}")
+        
+        import re
+        
+        # Cleanup text if not in JSON-only mode (remove markdown blocks)
+        if "```json" in text:
+            text = text.split("```json")[1].split("```")[0].strip()
+        elif "```" in text:
+            text = text.split("```")[1].split("```")[0].strip()
+        
+        # Fallback: Extraction using regex if potential JSON is found but not in code blocks
+        if not text.startswith('{'):
+            json_match = re.search(r'(\{.*\})', text, re.DOTALL)
+            if json_match:
+                text = json_match.group(1)
+
+        try:
+            result = json.loads(text)
+            
+            # Parse transcription for question blocks
+            transcription_text = result.get('transcription', '')
+            questions = []
+            
+            try:
+                # Blocks starting with **Q...** or **1...** (see services/question_parser.py)
+                questions = split_question_blocks(transcription_text)
+            except Exception as parse_e:
+                print(f"Error parsing question blocks: {parse_e}")
+
+            return {
+                'transcription': transcription_text,
+                'questions': questions,
+                'diagrams': result.get('diagrams', []),
+                'success': True
+            }
+        except json.JSONDecodeError as je:
+            print(f"JSON Decode Failed. Text: {text[:200]}...")
+            return {
+                'transcription': "Failed to parse AI response as JSON.",
+                'diagrams': [],
+                'success': False,
+                'error': f"JSON Decode Error: {str(je)}"
+            }
+    
+    @staticmethod
+    def _analysis_failure(e):
+        """auto_analyze_page result for a failed or blocked Gemini call"""
+        # Handle safety filters or blocked responses
+        error_msg = str(e)
+        if "safety" in error_msg.lower():
+            error_msg = "Content flagged by safety filters. Please ensure the handwriting is clear and appropriate."
+        return {
+            'transcription': "AI Analysis failed.",
+            'diagrams': [],
+            'success': False,
+            'error': error_msg
+        }
+    
+    @staticmethod
+    def blank_page_result():
+        """auto_analyze_page result for a page detected as blank, without a Gemini call"""
+        return {
+            'transcription': '',
+            'questions': [],
+            'diagrams': [],
+            'success': True,
+            'blank': True
+        }
+    
+    def analyze_region(self, image):
+        """
+        Transcribe a region and detect diagrams in it with a single JSON-mode call
+        
+        Args:
+            image: PIL Image of the region
+            
+        Returns:
+            Tuple of (transcription string, diagram info dict shaped like
+            extract_diagram's), or None if the response was not the expected
+            JSON object. API errors (quota, transport, blocked responses)
+            are raised, not retried as two more calls.
+        """
+        prompt = """Analyze this image region of a handwritten academic answer (Science/Math/Engineering).
+        
+        Return the result in a valid JSON format with the following structure:
+        {
+          "transcription": "Clean transcription of all handwritten text",
+          "has_diagram": true or false,
+          "diagram_description": "Structural description of the diagram, or an empty string"
+        }
+        
+        TRANSCRIPTION:
+        1. Use actual Unicode mathematical symbols (θ, μ, ρ, ±, √, →, ², ³) instead of LaTeX; no dollar signs.
+        2. Write equations as they appear visually (e.g., "R sin θ + F cos θ = mv² / r"), fractions as "a / b".
+        3. Preserve line breaks and alignment, including step identifiers like (1), (2).
+        4. Keep subscripts clear (e.g., "v_max", "v_1").
+        5. Fix obvious spelling and grammatical errors without changing the meaning of equations or symbols.
+        
+        DIAGRAMS (scientific, mathematical or educational diagrams, charts or sketches only):
+        1. Describe GEOMETRIC and STRUCTURAL properties (e.g., "Right-angled triangle with labels A, B, C").
+        2. List all visible labels, variables and values.
+        3. For graphs: identify the axes, labels and general trend.
+        4. Ignore random scribbles or crossed-out content; if there is no valid diagram set "has_diagram" to false.
+        
+        Return ONLY the JSON object. No other text."""
+        
+        response = self.generate_content(
+            [prompt, self.prepare_image(image)[0]],
+            config={"response_mime_type": "application/json"}
+        )
+        text = response.text.strip()
+        if "```" in text:
+            text = text.split("```")[1].removeprefix("json").strip()
+        
+        # Only a malformed response falls back to the separate calls in process_pdf_region
+        try:
+            result = json.loads(text)
+        except json.JSONDecodeError as e:
+            print(f"⚠️ Combined region analysis returned invalid JSON: {str(e)}")
+            return None
+        
+        if not isinstance(result, dict):
+            print(f"⚠️ Combined region analysis returned {type(result).__name__}, not an object")
+            return None
+        
+        has_diagram = bool(result.get('has_diagram'))
+        description = (result.get('diagram_description') or '').strip()
+        
+        transcription = (result.get('transcription') or '').strip()
+        diagram_info = {
+            'has_diagram': has_diagram,
+            'description': description if has_diagram and description else 'No diagrams found.',
+            'image_available': True
+        }
+        return transcription or "No text could be transcribed from this image.", diagram_info
+    
+    def process_pdf_region(self, image_data, coordinates=None, combined=None):
         """
         Process a specific region of a PDF page
+        
+        Args:
+            image_data: PIL Image of the page or region
+            coordinates: Optional crop within image_data
+            combined: One Gemini call for transcription and diagrams (default
+                      Config.GEMINI_COMBINED_REGION); False uses the separate
+                      transcribe_handwriting and extract_diagram calls
         """
         try:
             image = image_data
@@ -318,9 +674,16 @@ class GeminiOCRService:
                 if width > 0 and height > 0:
                     image = image.crop((x, y, x + width, y + height))
             
-            # Get both transcription and diagram analysis
-            transcription = self.transcribe_handwriting(image, is_path=False)
-            diagram_info = self.extract_diagram(image, is_path=False)
+            if combined is None:
+                combined = Config.GEMINI_COMBINED_REGION
+            
+            analysis = self.analyze_region(image) if combined else None
+            if analysis:
+                transcription, diagram_info = analysis
+            else:
+                # Get both transcription and diagram analysis
+                transcription = self.transcribe_handwriting(image, is_path=False)
+                diagram_info = self.extract_diagram(image, is_path=False)
             
             return {
                 'transcription': transcription,
@@ -336,3 +699,77 @@ class GeminiOCRService:
                 'success': False,
                 'error': str(e)
             }
+
+
+class AsyncGeminiOCRService(GeminiOCRService):
+    """
+    GeminiOCRService with coroutine variants for the multi-page paths
+
+    Awaiting a call does not hold a thread for the model latency, so many
+    pages can be in flight at once on the shared event loop (see
+    services/async_runner.py). The sync methods remain available.
+    """
+    
+    async def generate_content_async(self, inputs, config=None):
+        """Async generate_content: same response cache, rate limiter and 429 retries"""
+        # Hashing page images and the SQLite cache block, so keep them off the event loop
+        key, cached = await asyncio.to_thread(self._cache_lookup, inputs, config)
+        if cached:
+            return cached
+        
+        response = await self._generate_content_with_retry_async(inputs, config=config)
+        await asyncio.to_thread(self._cache_store, key, response)
+        return response
+    
+    async def _generate_content_with_retry_async(self, inputs, config=None, max_retries=3):
+        limiter = get_rate_limiter()
+        for attempt in range(max_retries):
+            try:
+                if limiter is None:
+                    return await self._call_model_async(inputs, config)
+                # Waits on the event loop, without parking a thread per queued call
+                permit = await limiter.acquire_async(estimate_tokens(inputs))
+                try:
+                    response = await self._call_model_async(inputs, config)
+                    permit.record(response)
+                    return response
+                finally:
+                    limiter.release()
+            except Exception as e:
+                if "429" in str(e) or "Resource has been exhausted" in str(e):
+                    if limiter is not None:
+                        limiter.backoff()
+                    if attempt < max_retries - 1:
+                        wait_time = (2 ** attempt) + 1
+                        print(f"⚠️ Gemini 429 Limit hit. Retrying in {wait_time}s...")
+                        await asyncio.sleep(wait_time)
+                        continue
+                raise e
+    
+    async def _call_model_async(self, inputs, config=None):
+        if config:
+            return await self.model.generate_content_async(inputs, generation_config=config)
+        return await self.model.generate_content_async(inputs)
+    
+    async def auto_analyze_page_async(self, image):
+        """
+        Async auto_analyze_page for a PIL Image
+        
+        Returns:
+            Dictionary with transcription, questions and diagrams (same shape as auto_analyze_page)
+        """
+        try:
+            part, crop_box = await asyncio.to_thread(self.prepare_image, image)
+            try:
+                response = await self.generate_content_async(
+                    [self.AUTO_ANALYZE_PROMPT, part],
+                    config={"response_mime_type": "application/json"}
+                )
+            except Exception as config_err:
+                # Fallback if response_mime_type is not supported
+                print(f"⚠️ JSON mode not supported: {config_err}. Falling back to standard text.")
+                response = await self.generate_content_async([self.AUTO_ANALYZE_PROMPT, part])
+            
+            return self._remap_diagrams(self._parse_page_analysis(response), crop_box, image.size)
+        except Exception as e:
+            return self._analysis_failure(e)
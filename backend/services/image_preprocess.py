@@ -0,0 +1,93 @@
+"""
+Image Preprocessing
+Shrinks page and region images before they are sent to Gemini: grayscale,
+trim white margins, cap the longest side and encode as JPEG/WebP. Without
+this the SDK uploads every PIL image as lossless WebP at full render size.
+"""
+
+from PIL import Image
+import io
+
+# Pixels darker than this count as ink when trimming margins
+INK_THRESHOLD = 230
+
+
+def trim_box(gray):
+    """
+    Bounding box of the ink on a grayscale image, with a small margin kept
+
+    Returns:
+        (left, upper, right, lower) or None if there is nothing worth trimming
+    """
+    bbox = gray.point(lambda p: 255 if p < INK_THRESHOLD else 0).getbbox()
+    if not bbox:
+        return None  # Blank page: send it as is
+
+    pad = max(8, max(gray.size) // 100)
+    left, upper, right, lower = bbox
+    box = (
+        max(0, left - pad),
+        max(0, upper - pad),
+        min(gray.width, right + pad),
+        min(gray.height, lower + pad)
+    )
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    if area > 0.97 * gray.width * gray.height:
+        return None
+    return box
+
+
+def preprocess_image(image, max_side=1536, grayscale=True, trim=True, fmt='JPEG', quality=85):
+    """
+    Prepare an image for a Gemini request
+
+    Args:
+        image: PIL Image
+        max_side: Longest side in pixels after scaling (0 = no limit)
+        grayscale: Convert to 8-bit grayscale
+        trim: Crop away white margins
+        fmt: 'JPEG' or 'WEBP'
+        quality: Encoder quality (1-100)
+
+    Returns:
+        Tuple of (blob dict {mime_type, data} usable as a prompt part,
+        crop box in original pixels or None if the image was not trimmed)
+    """
+    image = image.convert('L') if grayscale else image.convert('RGB')
+
+    box = None
+    if trim:
+        box = trim_box(image if grayscale else image.convert('L'))
+        if box:
+            image = image.crop(box)
+
+    if max_side and max(image.size) > max_side:
+        scale = max_side / max(image.size)
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.LANCZOS, reducing_gap=3.0)
+
+    fmt = fmt.upper()
+    buffer = io.BytesIO()
+    if fmt == 'WEBP':
+        image.save(buffer, format='WEBP', quality=quality, method=4)
+    else:
+        fmt = 'JPEG'
+        image.save(buffer, format='JPEG', quality=quality, optimize=True)
+
+    return {'mime_type': f"image/{fmt.lower()}", 'data': buffer.getvalue()}, box
+
+
+def remap_bounding_box(bbox, crop_box, original_size):
+    """
+    Map a Gemini [ymin, xmin, ymax, xmax] box (0-1000) on a trimmed image
+    back to 0-1000 coordinates on the original image
+    """
+    left, upper, right, lower = crop_box
+    width, height = original_size
+    ymin, xmin, ymax, xmax = bbox
+    return [
+        round((upper + ymin / 1000 * (lower - upper)) / height * 1000),
+        round((left + xmin / 1000 * (right - left)) / width * 1000),
+        round((upper + ymax / 1000 * (lower - upper)) / height * 1000),
+        round((left + xmax / 1000 * (right - left)) / width * 1000)
+    ]
@@ -0,0 +1,122 @@
+"""
+Background Job Queue
+Runs long operations off the request thread on a bounded local worker pool.
+
+Job rows (ScanJob, UploadBatch) get their updated_at refreshed by a
+heartbeat thread while they are queued or running here, so a row left
+QUEUED/RUNNING by a process that died can be told apart from one that is
+still waiting for a worker (see stale_jobs).
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import threading
+import time
+import traceback
+from config import Config
+from models import db
+
+ACTIVE_STATUSES = ('QUEUED', 'RUNNING')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+_heartbeats = set()  # (model, row id) of jobs queued or running in this process
+_heartbeats_lock = threading.Lock()
+_heartbeat_thread = None
+
+
+def get_executor():
+    """Return the process-wide job executor, creating it on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=Config.JOB_WORKERS,
+                thread_name_prefix='scriptsense-job'
+            )
+    return _executor
+
+
+def submit_job(app, fn, *args, heartbeat=None, **kwargs):
+    """
+    Run fn(*args, **kwargs) in the background inside an app context
+
+    Args:
+        app: Flask application (current_app._get_current_object())
+        fn: Job function; it owns its own DB session and error reporting
+        heartbeat: Optional job row (with status and updated_at columns)
+                   kept fresh until fn returns
+
+    Returns:
+        concurrent.futures.Future
+    """
+    key = (type(heartbeat), heartbeat.id) if heartbeat is not None else None
+    if key:
+        _start_heartbeat(app)
+        with _heartbeats_lock:
+            _heartbeats.add(key)
+
+    def run():
+        with app.app_context():
+            try:
+                fn(*args, **kwargs)
+            except Exception as e:
+                print(f"❌ Background job {fn.__name__} crashed: {str(e)}")
+                traceback.print_exc()
+            finally:
+                if key:
+                    with _heartbeats_lock:
+                        _heartbeats.discard(key)
+
+    return get_executor().submit(run)
+
+
+def _start_heartbeat(app):
+    global _heartbeat_thread
+    with _heartbeats_lock:
+        if _heartbeat_thread is None:
+            _heartbeat_thread = threading.Thread(target=_heartbeat_loop, args=(app,),
+                                                 name='scriptsense-job-heartbeat', daemon=True)
+            _heartbeat_thread.start()
+
+
+def _heartbeat_loop(app):
+    """Refresh updated_at of this process's active jobs every JOB_HEARTBEAT_SECONDS"""
+    while True:
+        time.sleep(Config.JOB_HEARTBEAT_SECONDS)
+        with _heartbeats_lock:
+            live = list(_heartbeats)
+        if not live:
+            continue
+
+        ids_by_model = {}
+        for model, row_id in live:
+            ids_by_model.setdefault(model, []).append(row_id)
+
+        with app.app_context():
+            try:
+                for model, ids in ids_by_model.items():
+                    db.session.execute(
+                        db.update(model)
+                        .where(model.id.in_(ids), model.status.in_(ACTIVE_STATUSES))
+                        .values(updated_at=datetime.utcnow())
+                    )
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"⚠️ Job heartbeat failed: {str(e)}")
+
+
+def stale_jobs(model):
+    """
+    Job rows left QUEUED or RUNNING by a process that is gone
+
+    A row counts as stale when nothing (progress or heartbeat) has touched
+    it for JOB_STALE_SECONDS. The caller marks them failed and commits.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=Config.JOB_STALE_SECONDS)
+    return model.query.filter(
+        model.status.in_(ACTIVE_STATUSES),
+        db.or_(model.updated_at < cutoff, model.updated_at.is_(None))
+    ).all()
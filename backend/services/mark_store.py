@@ -0,0 +1,114 @@
+"""
+Mark Store
+Saves a sheet's marks in one upsert and keeps the per-sheet totals on
+AnswerSheet (total_awarded, total_max, marks_count) in step with the Mark
+table, so results pages and exports read one row per sheet instead of
+summing marks on every request
+"""
+
+from sqlalchemy import func, or_
+from models import db, AnswerSheet, Mark, QuestionPaper, bump_subject_versions
+from services.content_store import upsert_by_question_number
+
+TOTAL_COLUMNS = ('total_awarded', 'total_max', 'marks_count')
+
+
+def _totals_update():
+    """UPDATE answer_sheets SET totals = correlated sums over their marks"""
+    def mark_aggregate(aggregate):
+        return (
+            db.select(aggregate)
+            .where(Mark.answer_sheet_id == AnswerSheet.id)
+            .correlate(AnswerSheet)
+            .scalar_subquery()
+        )
+
+    return db.update(AnswerSheet).values(
+        total_awarded=mark_aggregate(func.coalesce(func.sum(Mark.marks_awarded), 0)),
+        total_max=mark_aggregate(func.coalesce(func.sum(Mark.max_marks), 0)),
+        marks_count=mark_aggregate(func.count(Mark.id))
+    )
+
+
+def refresh_sheet_totals(answer_sheet_ids):
+    """
+    Recompute the stored totals of these answer sheets from their marks
+
+    One UPDATE in the caller's transaction (pending marks are flushed
+    first). Mark rows changed through the ORM are covered by the flush hook
+    in models.py; call this after writes that bypass it (bulk upserts).
+    """
+    answer_sheet_ids = set(answer_sheet_ids)
+    if not answer_sheet_ids:
+        return
+
+    db.session.execute(
+        _totals_update().where(AnswerSheet.id.in_(answer_sheet_ids)),
+        execution_options={'synchronize_session': False}
+    )
+
+    # Sheets already loaded in this session would otherwise keep the old totals
+    for obj in list(db.session.identity_map.values()):
+        if isinstance(obj, AnswerSheet) and obj.id in answer_sheet_ids:
+            db.session.expire(obj, TOTAL_COLUMNS)
+
+
+def backfill_sheet_totals():
+    """
+    Recompute the stored totals of every answer sheet (one UPDATE)
+
+    Returns:
+        Number of sheets updated
+    """
+    result = db.session.execute(_totals_update(), execution_options={'synchronize_session': False})
+    db.session.commit()
+    return result.rowcount
+
+
+def upsert_marks(answer_sheet_id, question_paper_id, marks):
+    """
+    Save marks for many questions of one answer sheet
+
+    One INSERT ... ON CONFLICT on unique_answer_question, then the question
+    paper's total_questions, the sheet totals and the subject's export
+    version are brought up to date. Caller commits.
+
+    Args:
+        answer_sheet_id: AnswerSheet ID
+        question_paper_id: QuestionPaper ID (or None)
+        marks: List of (question_number, marks_awarded, max_marks)
+
+    Returns:
+        Number of questions saved (repeated question numbers count once)
+    """
+    rows = [
+        {
+            'answer_sheet_id': answer_sheet_id,
+            'question_paper_id': question_paper_id,
+            'question_number': question_number,
+            'marks_awarded': marks_awarded,
+            'max_marks': max_marks
+        }
+        for question_number, marks_awarded, max_marks in marks
+    ]
+    saved = upsert_by_question_number(
+        Mark, 'answer_sheet_id', rows, ('marks_awarded', 'max_marks', 'question_paper_id')
+    )
+    if not saved:
+        return 0
+
+    # Update total_questions in QuestionPaper if this is a new high
+    if question_paper_id:
+        highest = max(row['question_number'] for row in rows)
+        db.session.execute(
+            db.update(QuestionPaper)
+            .where(QuestionPaper.id == question_paper_id)
+            .where(or_(QuestionPaper.total_questions.is_(None), QuestionPaper.total_questions < highest))
+            .values(total_questions=highest),
+            execution_options={'synchronize_session': False}
+        )
+
+    refresh_sheet_totals([answer_sheet_id])
+    # The upsert bypasses the ORM flush hook that normally does this
+    bump_subject_versions(db.session, answer_sheet_ids=[answer_sheet_id])
+    return saved
@@ -0,0 +1,199 @@
+"""
+Marks Export
+Streams marks out of the database for download: a subject's marks into a
+write-only openpyxl workbook built in a spooled temp file, and results
+into CSV generated row by row. Rows are read in batches (a server-side
+cursor on PostgreSQL), so memory stays flat however many sheets there are.
+"""
+
+import csv
+from itertools import groupby
+import io
+import re
+import tempfile
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill
+from config import Config
+from models import db, AnswerSheet, Mark, QuestionPaper
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def question_sort_key(q):
+    """Sort question numbers numerically where possible ("Q1", "2a")"""
+    nums = re.findall(r'\d+', str(q))
+    return int(nums[0]) if nums else 0
+
+
+def subject_questions(subject_id):
+    """Sorted question numbers that have marks in a subject"""
+    rows = db.session.query(Mark.question_number).join(
+        AnswerSheet, (AnswerSheet.id == Mark.answer_sheet_id) & (AnswerSheet.subject_id == subject_id)
+    ).distinct()
+    return sorted((q for q, in rows), key=question_sort_key)
+
+
+def iter_subject_sheets(subject_id):
+    """
+    Stream a subject's answer sheets with their marks, in roll number order
+
+    Sheets and marks come from one outer-joined query fetched
+    EXPORT_BATCH_SIZE rows at a time, so memory does not grow with the
+    number of students.
+
+    Yields:
+        Tuple of (sheet row with id, roll_number, student_name, status,
+                  total_awarded, total_max; {question_number: (awarded, max)})
+    """
+    rows = db.session.query(
+        AnswerSheet.id,
+        AnswerSheet.roll_number,
+        AnswerSheet.student_name,
+        AnswerSheet.status,
+        AnswerSheet.total_awarded,
+        AnswerSheet.total_max,
+        Mark.question_number,
+        Mark.marks_awarded,
+        Mark.max_marks
+    ).outerjoin(
+        Mark, Mark.answer_sheet_id == AnswerSheet.id
+    ).filter(
+        AnswerSheet.subject_id == subject_id
+    ).order_by(
+        AnswerSheet.roll_number, AnswerSheet.id
+    ).execution_options(yield_per=Config.EXPORT_BATCH_SIZE)
+
+    for _, sheet_rows in groupby(rows, key=lambda row: row.id):
+        sheet_rows = list(sheet_rows)
+        marks = {
+            row.question_number: (row.marks_awarded, row.max_marks)
+            for row in sheet_rows if row.question_number is not None
+        }
+        yield sheet_rows[0], marks
+
+
+def question_header(q):
+    return f"Q{q}" if not str(q).startswith('Q') else q
+
+
+def build_marks_workbook(subject):
+    """
+    Write the marks export for a subject
+
+    Returns:
+        SpooledTemporaryFile positioned at the start of the .xlsx; the
+        caller closes it (send_file does so when the response ends)
+    """
+    output = tempfile.SpooledTemporaryFile(max_size=Config.EXPORT_SPOOL_MAX_SIZE)
+    try:
+        write_marks_workbook(subject, output)
+    except Exception:
+        output.close()
+        raise
+    output.seek(0)
+    return output
+
+
+def write_marks_workbook(subject, output):
+    """Write the marks export .xlsx for a subject into a binary file object"""
+    sorted_questions = subject_questions(subject.id)
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(f"Marks - {subject.name}")
+
+    # Define styles
+    header_font = Font(bold=True, color="FFFFFF")
+    header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
+    center_align = Alignment(horizontal="center")
+
+    headers = ['Roll Number', 'Student Name'] + [question_header(q) for q in sorted_questions] + ['Total', 'Percentage', 'Status']
+
+    # Column widths must be set before the first row in write-only mode
+    for col_num, header_title in enumerate(headers, 1):
+        column_letter = openpyxl.utils.get_column_letter(col_num)
+        ws.column_dimensions[column_letter].width = max(len(str(header_title)) + 2, 12)
+
+    header_cells = []
+    for header_title in headers:
+        cell = WriteOnlyCell(ws, value=header_title)
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = center_align
+        header_cells.append(cell)
+    ws.append(header_cells)
+
+    for sheet, marks in iter_subject_sheets(subject.id):
+        values = [marks[q][0] if q in marks else '-' for q in sorted_questions]
+        percentage = (sheet.total_awarded / sheet.total_max * 100) if sheet.total_max else 0
+        ws.append(
+            [sheet.roll_number, sheet.student_name]
+            + values
+            + [sheet.total_awarded, f"{percentage:.2f}%", (sheet.status or '').capitalize()]
+        )
+
+    wb.save(output)
+
+
+RESULTS_CSV_HEADERS = ['Student Name', 'Roll Number', 'Question Paper', 'Marks Obtained', 'Max Marks', 'Percentage', 'Remarks']
+
+# Yield CSV text to the client once this much has accumulated
+CSV_CHUNK_SIZE = 64 * 1024
+
+
+def iter_results_csv(subject_id=None):
+    """
+    Generate the results CSV for evaluated sheets, in chunks of text
+
+    One query reads each sheet's stored totals and joins its question
+    paper title, fetched EXPORT_BATCH_SIZE rows at a time. Run inside
+    stream_with_context so the session stays open.
+
+    Args:
+        subject_id: Only export this subject (None = all subjects)
+    """
+    rows = db.session.query(
+        AnswerSheet.student_name,
+        AnswerSheet.roll_number,
+        AnswerSheet.remarks,
+        AnswerSheet.total_awarded,
+        AnswerSheet.total_max,
+        QuestionPaper.title
+    ).outerjoin(
+        QuestionPaper, QuestionPaper.id == AnswerSheet.question_paper_id
+    ).filter(AnswerSheet.status == 'evaluated')
+
+    if subject_id is not None:
+        rows = rows.filter(AnswerSheet.subject_id == subject_id)
+    rows = rows.order_by(AnswerSheet.id).execution_options(yield_per=Config.EXPORT_BATCH_SIZE)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(RESULTS_CSV_HEADERS)
+
+    for row in rows:
+        total_awarded = row.total_awarded or 0
+        total_max = row.total_max or 0
+        percentage = (total_awarded / total_max * 100) if total_max > 0 else 0
+        writer.writerow([
+            row.student_name,
+            row.roll_number or 'N/A',
+            row.title or 'Unknown',
+            total_awarded,
+            total_max,
+            f"{percentage:.2f}%",
+            row.remarks or ''
+        ])
+
+        if buffer.tell() >= CSV_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def write_results_csv(subject, output):
+    """Write the results CSV of a subject into a binary file object"""
+    for chunk in iter_results_csv(subject.id):
+        output.write(chunk.encode('utf-8'))
@@ -0,0 +1,223 @@
+"""
+Page Analysis Store
+Serves auto-scan results from the PageAnalysis table and only falls
+through to Gemini when a page has not been analysed yet
+"""
+
+import asyncio
+import json
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from config import Config
+from models import db, PageAnalysis, AnswerSheet
+from services.async_runner import fan_out
+from services.job_queue import submit_job
+from services.pdf_processor import PDFProcessor
+from services.rate_limiter import request_priority, INTERACTIVE, BULK
+
+
+def get_stored_analysis(answer_sheet_id, page_number, file_hash, analysis_version):
+    """
+    Look up a stored analysis for a page
+
+    Returns:
+        PageAnalysis row or None
+    """
+    return PageAnalysis.query.filter_by(
+        answer_sheet_id=answer_sheet_id,
+        page_number=page_number,
+        analysis_version=analysis_version,
+        file_hash=file_hash
+    ).first()
+
+
+def store_analysis(answer_sheet_id, page_number, file_hash, analysis_version, result):
+    """
+    Persist a successful auto_analyze_page result
+
+    A concurrent request may have stored the same page first; in that case
+    the unique constraint rejects the insert and the existing row is kept.
+    """
+    row = PageAnalysis(
+        answer_sheet_id=answer_sheet_id,
+        page_number=page_number,
+        analysis_version=analysis_version,
+        file_hash=file_hash,
+        transcription=result.get('transcription', ''),
+        questions=json.dumps(result.get('questions', [])),
+        diagrams=json.dumps(result.get('diagrams', []))
+    )
+    try:
+        db.session.add(row)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        print(f"ℹ️ Page analysis for sheet {answer_sheet_id} page {page_number} already stored")
+
+
+def get_blank_pages(doc):
+    """
+    Blank page numbers of an answer sheet, question paper or rubric
+    
+    Detected on first use for rows stored before detection existed.
+    
+    Returns:
+        Set of page numbers (0-indexed); empty when detection is off or fails
+    """
+    if not Config.BLANK_PAGE_DETECTION:
+        return set()
+    stored = doc.blank_pages
+    if stored is not None:
+        return set(json.loads(stored))
+    
+    try:
+        blank = PDFProcessor.find_blank_pages(doc.file_path)
+    except Exception as e:
+        print(f"⚠️ Blank page detection failed for {doc.file_path}: {e}")
+        return set()
+    
+    doc.blank_pages = json.dumps(blank)
+    db.session.commit()
+    return set(blank)
+
+
+def analyze_answer_sheet_page(answer_sheet, page_number, ocr_service, force=False):
+    """
+    Get the auto-scan analysis of an answer sheet page
+
+    Args:
+        answer_sheet: AnswerSheet model instance
+        page_number: Page number (0-indexed)
+        ocr_service: GeminiOCRService used on a miss
+        force: Analyse the page even if it was detected as blank
+
+    Returns:
+        Tuple of (result dict as returned by auto_analyze_page, True if served from the store)
+    """
+    file_hash = PDFProcessor.get_file_hash(answer_sheet.file_path)
+    version = ocr_service.ANALYSIS_VERSION
+
+    stored = get_stored_analysis(answer_sheet.id, page_number, file_hash, version)
+    if stored:
+        print(f"⚡ Serving stored analysis for sheet {answer_sheet.id} page {page_number}")
+        return stored.to_result(), True
+
+    if not force and page_number in get_blank_pages(answer_sheet):
+        print(f"⬜ Sheet {answer_sheet.id} page {page_number} is blank, skipping Gemini")
+        return ocr_service.blank_page_result(), False
+
+    # Convert full page to image (Medium res for memory safety on production)
+    print(f"📄 Processing PDF: {answer_sheet.file_path}")
+    image = PDFProcessor.pdf_page_to_image(
+        answer_sheet.file_path,
+        page_number,
+        zoom=2.0 # Reduced from 3.0 for production stability
+    )
+    print(f"🖼️ Full page image generated: {image.size}")
+
+    print(f"🤖 Sending to Gemini...")
+    result = ocr_service.auto_analyze_page(image, is_path=False)
+    print(f"✅ Gemini response received. success={result.get('success')}")
+
+    # Only successful analyses are stored; failures are retried on next open
+    if result.get('success'):
+        store_analysis(answer_sheet.id, page_number, file_hash, version, result)
+
+    return result, False
+
+
+def analyze_answer_sheet_pages(answer_sheet, ocr_service, page_numbers=None, priority=INTERACTIVE, force=False,
+                               progress=None):
+    """
+    Analyse several pages of an answer sheet, sending the unstored ones to
+    Gemini concurrently (at most SCAN_JOB_CONCURRENCY in flight)
+    
+    Args:
+        answer_sheet: AnswerSheet model instance
+        ocr_service: AsyncGeminiOCRService used on a miss
+        page_numbers: Pages to analyse (0-indexed); defaults to every page
+        priority: Rate limiter priority for the Gemini calls
+        force: Analyse pages detected as blank too
+        progress: Optional callable(page_number, result, cached), called on
+            this thread as each page finishes (safe for DB writes)
+        
+    Returns:
+        Dict page_number -> (result dict as returned by auto_analyze_page, True if served from the store)
+    """
+    file_path = answer_sheet.file_path
+    file_hash = PDFProcessor.get_file_hash(file_path)
+    version = ocr_service.ANALYSIS_VERSION
+    
+    if page_numbers is None:
+        page_numbers = range(answer_sheet.page_count or PDFProcessor.get_page_count(file_path))
+    
+    stored = {
+        row.page_number: row for row in PageAnalysis.query.filter_by(
+            answer_sheet_id=answer_sheet.id,
+            analysis_version=version,
+            file_hash=file_hash
+        ).all()
+    }
+    blank = set() if force else get_blank_pages(answer_sheet)
+    results = {p: (stored[p].to_result(), True) for p in page_numbers if p in stored}
+    results.update({p: (ocr_service.blank_page_result(), False) for p in page_numbers if p in blank and p not in stored})
+    missing = [p for p in page_numbers if p not in results]
+    if progress:
+        for page_number, (result, cached) in sorted(results.items()):
+            progress(page_number, result, cached)
+    
+    async def analyze(page_number):
+        image = await asyncio.to_thread(PDFProcessor.pdf_page_to_image, file_path, page_number, 2.0)
+        with request_priority(priority):
+            return await ocr_service.auto_analyze_page_async(image)
+    
+    for page_number, result, error in fan_out(analyze, missing, Config.SCAN_JOB_CONCURRENCY):
+        if error is not None:
+            print(f"⚠️ Failed to analyze sheet {answer_sheet.id} page {page_number + 1}: {error}")
+            result = {'transcription': f"Error: {error}", 'diagrams': [], 'success': False, 'error': str(error)}
+        elif result.get('success'):
+            store_analysis(answer_sheet.id, page_number, file_hash, version, result)
+        results[page_number] = (result, False)
+        if progress:
+            progress(page_number, result, False)
+    
+    return results
+
+
+def stored_page_results(answer_sheet, ocr_service, page_numbers):
+    """Dict page_number -> stored auto_analyze_page result, for those of these pages already analysed"""
+    rows = PageAnalysis.query.filter(
+        PageAnalysis.answer_sheet_id == answer_sheet.id,
+        PageAnalysis.analysis_version == ocr_service.ANALYSIS_VERSION,
+        PageAnalysis.file_hash == PDFProcessor.get_file_hash(answer_sheet.file_path),
+        PageAnalysis.page_number.in_(list(page_numbers))
+    ).all()
+    return {row.page_number: row.to_result() for row in rows}
+
+
+def queue_eager_analysis(answer_sheet_ids, ocr_service):
+    """
+    Analyse every page of the given answer sheets on the background job queue
+    
+    Used after upload for subjects with eager_analysis on, so evaluators
+    open scripts with the analyses already stored.
+    """
+    if not answer_sheet_ids:
+        return
+    submit_job(current_app._get_current_object(), run_eager_analysis, list(answer_sheet_ids), ocr_service)
+    print(f"📥 Queued eager analysis for {len(answer_sheet_ids)} answer sheets")
+
+
+def run_eager_analysis(answer_sheet_ids, ocr_service):
+    """Analyse all pages of each sheet at bulk priority; called inside an app context by the job queue"""
+    for answer_sheet_id in answer_sheet_ids:
+        answer_sheet = db.session.get(AnswerSheet, answer_sheet_id)
+        if not answer_sheet:
+            continue
+        try:
+            results = analyze_answer_sheet_pages(answer_sheet, ocr_service, priority=BULK)
+            failed = [p for p, (result, _) in results.items() if not result.get('success')]
+            print(f"✅ Eager analysis of sheet {answer_sheet_id}: {len(results) - len(failed)}/{len(results)} pages stored")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Eager analysis of sheet {answer_sheet_id} failed: {str(e)}")
@@ -1,28 +1,311 @@
 import fitz  # PyMuPDF
+import numpy as np
 from PIL import Image
-import io
+from collections import OrderedDict
+from contextlib import contextmanager
+import hashlib
 import os
+import threading
+from config import Config
+from services.render_cache import get_render_cache
+
+class _LRUCache:
+    """Small thread-safe LRU dict, so per-file memos stay bounded in long-running workers"""
+    
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+    
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+
+# (path, mtime, size) -> sha256 hex digest
+_file_hash_cache = _LRUCache(2048)
+
+# (file_hash, page_number) -> page area rendered by pdf_page_to_image, in PDF units
+_page_bounds_cache = _LRUCache(16384)
+
+# MuPDF is not thread-safe; background jobs render from worker threads,
+# so every fitz call is serialized through this lock
+_mupdf_lock = threading.RLock()
+
+
+class _DocumentPool:
+    """
+    LRU pool of open fitz.Document handles keyed by (path, mtime)
+    
+    Opening and parsing a large scanned PDF costs more than rendering a
+    small region of it, so handles are kept open across calls. A changed
+    mtime means the file was replaced and its stale handle is closed.
+    """
+    
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._docs = OrderedDict()  # (abspath, mtime_ns) -> fitz.Document
+    
+    @contextmanager
+    def open(self, pdf_path):
+        """Yield an open document; the MuPDF lock is held for the duration"""
+        with _mupdf_lock:
+            path = os.path.abspath(pdf_path)
+            key = (path, os.stat(path).st_mtime_ns)
+            
+            doc = self._docs.get(key)
+            if doc is None or doc.is_closed:
+                self.release(path)
+                doc = fitz.open(path)
+                if self.max_size > 0:
+                    self._docs[key] = doc
+            if self.max_size > 0:
+                self._docs.move_to_end(key)
+                while len(self._docs) > self.max_size:
+                    _, evicted = self._docs.popitem(last=False)
+                    evicted.close()
+            
+            try:
+                yield doc
+            finally:
+                if self.max_size <= 0:
+                    doc.close()
+    
+    def release(self, pdf_path):
+        """Close every pooled handle for a path (e.g. before deleting the file)"""
+        path = os.path.abspath(pdf_path)
+        with _mupdf_lock:
+            for key in [k for k in self._docs if k[0] == path]:
+                self._docs.pop(key).close()
+
+
+_document_pool = _DocumentPool(Config.PDF_DOC_POOL_SIZE)
 
 class PDFProcessor:
     """Service for processing PDF files"""
     
+    @staticmethod
+    def get_file_hash(pdf_path):
+        """
+        Get the sha256 content hash of a file
+        
+        The digest is memoized on (path, mtime, size) so repeated calls for
+        an unchanged file do not re-read it from disk.
+        
+        Args:
+            pdf_path: Path to PDF file
+            
+        Returns:
+            Hex digest string
+        """
+        stat = os.stat(pdf_path)
+        key = (os.path.abspath(pdf_path), stat.st_mtime_ns, stat.st_size)
+        
+        digest = _file_hash_cache.get(key)
+        if digest is None:
+            sha = hashlib.sha256()
+            with open(pdf_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    sha.update(chunk)
+            digest = sha.hexdigest()
+            _file_hash_cache.put(key, digest)
+        
+        return digest
+    
+    @staticmethod
+    def get_page_info(pdf_path):
+        """
+        Get page count and page sizes, for storing on the document row at upload
+        
+        Args:
+            pdf_path: Path to PDF file
+            
+        Returns:
+            Dict with page_count and page_sizes ([[width, height], ...] in PDF points)
+        """
+        with _document_pool.open(pdf_path) as doc:
+            sizes = [[round(page.rect.width, 2), round(page.rect.height, 2)] for page in doc]
+        return {
+            'page_count': len(sizes),
+            'page_sizes': sizes
+        }
+    
+    @staticmethod
+    def page_ink_ratio(image, contrast=40):
+        """
+        Fraction of a page image covered by writing, ignoring ruled lines
+        
+        Pixels at least `contrast` gray levels darker than the paper count as
+        ink, so light pencil counts as much as dark pen. Rows and columns
+        that are mostly ink (printed rules, margin lines), isolated specks and
+        a thin border (scanner shadows, punch holes) are left out.
+        
+        Args:
+            image: PIL Image (any mode)
+            contrast: Gray levels (0-255) below the paper tone that count as ink
+            
+        Returns:
+            Ink ratio between 0 and 1
+        """
+        gray = np.asarray(image.convert('L'), dtype=np.uint8)
+        height, width = gray.shape
+        border_y, border_x = height * 3 // 100, width * 3 // 100
+        gray = gray[border_y:height - border_y, border_x:width - border_x]
+        if gray.size == 0:
+            return 0.0
+        
+        # A fixed step below the paper tone, so dim or tinted scans are judged
+        # the same way without losing faint strokes on bright paper
+        paper = np.percentile(gray, 90)
+        ink = gray < paper - contrast
+        
+        # Rules run across nearly the whole page; a line of text is never that dense
+        rule_rows = ink.mean(axis=1) > 0.6
+        if rule_rows.mean() > 0.5:
+            return float(ink.mean())  # Mostly dark: not a ruled blank page
+        ink[rule_rows, :] = False
+        ink[:, ink.mean(axis=0) > 0.6] = False
+        
+        # Drop isolated specks (dust, scanner noise): keep pixels with at least
+        # two inked neighbours, so a single short answer still counts
+        padded = np.pad(ink, 1).astype(np.uint8)
+        neighbours = sum(
+            padded[1 + dy:padded.shape[0] - 1 + dy, 1 + dx:padded.shape[1] - 1 + dx]
+            for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dy or dx
+        )
+        return float((ink & (neighbours >= 2)).mean())
+    
+    @staticmethod
+    def find_blank_pages(pdf_path):
+        """
+        Indices of blank or ruled-only pages, from a grayscale render at
+        BLANK_PAGE_ZOOM (high enough that thin pencil strokes survive)
+        
+        Args:
+            pdf_path: Path to PDF file
+            
+        Returns:
+            Sorted list of blank page numbers (0-indexed)
+        """
+        mat = fitz.Matrix(Config.BLANK_PAGE_ZOOM, Config.BLANK_PAGE_ZOOM)
+        blank = []
+        with _document_pool.open(pdf_path) as doc:
+            for page_number, page in enumerate(doc):
+                pix = page.get_pixmap(matrix=mat, clip=page.cropbox, colorspace=fitz.csGRAY)
+                ratio = PDFProcessor.page_ink_ratio(PDFProcessor.pixmap_to_image(pix), Config.BLANK_PAGE_INK_CONTRAST)
+                if ratio < Config.BLANK_PAGE_INK_RATIO:
+                    blank.append(page_number)
+        return blank
+    
+    @staticmethod
+    def release_document(pdf_path):
+        """Close any pooled handle for a file (call before deleting or replacing it)"""
+        _document_pool.release(pdf_path)
+    
+    @staticmethod
+    def pixmap_to_image(pix):
+        """
+        Convert a PyMuPDF pixmap to a PIL Image from its raw samples
+        
+        Avoids the PNG encode/decode round trip of Image.open(pix.tobytes("png")).
+        
+        Args:
+            pix: fitz.Pixmap (gray, RGB or CMYK, with or without alpha)
+            
+        Returns:
+            PIL Image object
+        """
+        if pix.alpha:
+            mode = 'LA' if pix.n == 2 else 'RGBA'
+        else:
+            mode = {1: 'L', 3: 'RGB', 4: 'CMYK'}[pix.n]
+        # pix.samples is a copy, so the image stays valid after the pixmap is freed
+        return Image.frombuffer(mode, (pix.width, pix.height), pix.samples, 'raw', mode, pix.stride, 1)
+    
     @staticmethod
     def get_page_count(pdf_path):
         """Get total number of pages in PDF"""
         try:
-            doc = fitz.open(pdf_path)
-            count = len(doc)
-            doc.close()
-            return count
+            with _document_pool.open(pdf_path) as doc:
+                return len(doc)
         except Exception as e:
             print(f"Error getting page count: {str(e)}")
             return 0
     
+    @staticmethod
+    def _rotate_to_portrait(image):
+        """Rotate a landscape render 90° clockwise"""
+        # Handle different Pillow versions
+        if hasattr(Image, 'Transpose'):
+            rotation = Image.Transpose.ROTATE_270
+        else:
+            rotation = Image.ROTATE_270
+        return image.transpose(rotation)
+    
+    @staticmethod
+    def _page_bounds(pdf_path, page_number):
+        """
+        Get the page area rendered by pdf_page_to_image (page rect clipped to cropbox)
+        
+        Returns:
+            fitz.Rect in PDF units
+        """
+        key = (PDFProcessor.get_file_hash(pdf_path), page_number)
+        bounds = _page_bounds_cache.get(key)
+        if bounds is None:
+            with _document_pool.open(pdf_path) as doc:
+                if page_number >= len(doc):
+                    raise ValueError(f"Page {page_number} does not exist")
+                page = doc[page_number]
+                bounds = page.rect & page.cropbox
+            _page_bounds_cache.put(key, bounds)
+        return fitz.Rect(bounds)
+    
+    @staticmethod
+    def _render_page(pdf_path, page_number, zoom):
+        """Rasterize a full page with MuPDF (no caching)"""
+        with _document_pool.open(pdf_path) as doc:
+            if page_number >= len(doc):
+                raise ValueError(f"Page {page_number} does not exist")
+            
+            page = doc[page_number]
+            
+            # Render page to image with zoom, explicitly using cropbox for consistency with web viewers
+            mat = fitz.Matrix(zoom, zoom)
+            pix = page.get_pixmap(matrix=mat, clip=page.cropbox)
+            
+            # Convert to PIL Image
+            image = PDFProcessor.pixmap_to_image(pix)
+
+        # Auto-rotate to portrait if needed (fail-safe)
+        try:
+            if image.width > image.height:
+                print(f"🔄 Auto-rotating page {page_number} to portrait...")
+                image = PDFProcessor._rotate_to_portrait(image)
+        except Exception as rot_e:
+            print(f"⚠️ Rotation failed but continuing: {rot_e}")
+        
+        return image
+    
     @staticmethod
     def pdf_page_to_image(pdf_path, page_number, zoom=2.0):
         """
         Convert a PDF page to PIL Image
         
+        Renders are served from the page render cache when possible. A lower
+        zoom is derived by downscaling a cached higher-zoom render of the same
+        page instead of rasterizing again.
+        
         Args:
             pdf_path: Path to PDF file
             page_number: Page number (0-indexed)
@@ -32,95 +315,155 @@ class PDFProcessor:
             PIL Image object
         """
         try:
-            doc = fitz.open(pdf_path)
+            cache = get_render_cache()
+            if cache is None:
+                return PDFProcessor._render_page(pdf_path, page_number, zoom)
             
-            if page_number >= len(doc):
-                doc.close()
-                raise ValueError(f"Page {page_number} does not exist")
+            file_hash = PDFProcessor.get_file_hash(pdf_path)
+            key = (file_hash, page_number, zoom, None)
             
-            page = doc[page_number]
+            image = cache.get(key)
+            if image is not None:
+                return image
             
-            # Render page to image with zoom, explicitly using cropbox for consistency with web viewers
-            mat = fitz.Matrix(zoom, zoom)
-            pix = page.get_pixmap(matrix=mat, clip=page.cropbox)
+            higher = cache.closest_higher_zoom(file_hash, page_number, zoom)
+            if higher is not None:
+                source_zoom, source = higher
+                # Same pixel size a fresh render at this zoom would have
+                page_irect = (PDFProcessor._page_bounds(pdf_path, page_number) * fitz.Matrix(zoom, zoom)).irect
+                size = (page_irect.width, page_irect.height)
+                if size[0] > size[1]:
+                    size = (size[1], size[0])  # Rendered landscape pages are rotated to portrait
+                # Area-averaging downscale: cheaper than re-rasterizing a scanned page
+                image = source.resize(size, Image.Resampling.BOX)
+                print(f"🔽 Derived page {page_number} at zoom {zoom} from cached zoom {source_zoom}")
+            else:
+                image = PDFProcessor._render_page(pdf_path, page_number, zoom)
             
-            # Convert to PIL Image
-            img_data = pix.tobytes("png")
-            image = Image.open(io.BytesIO(img_data))
-
-            # Auto-rotate to portrait if needed (fail-safe)
-            try:
-                if image.width > image.height:
-                    print(f"🔄 Auto-rotating page {page_number} to portrait...")
-                    # Handle different Pillow versions
-                    if hasattr(Image, 'Transpose'):
-                        rotation = Image.Transpose.ROTATE_270
-                    else:
-                        rotation = Image.ROTATE_270
-                    image = image.transpose(rotation)
-            except Exception as rot_e:
-                print(f"⚠️ Rotation failed but continuing: {rot_e}")
-            
-            doc.close()
-            return image
+            cache.put(key, image)
+            return image.copy()
             
         except Exception as e:
             print(f"Error converting PDF page to image: {str(e)}")
             raise
     
     @staticmethod
-    def extract_region(pdf_path, page_number, coordinates):
+    def _region_box(coordinates, image_width, image_height, padding=40):
+        """
+        Resolve region coordinates to a padded pixel box on a page image
+        
+        Args:
+            coordinates: Dict with {x, y, width, height}, normalized (0-1) or in pixels
+            image_width: Width of the page image the coordinates refer to
+            image_height: Height of the page image the coordinates refer to
+            padding: Extra pixels added around the region
+            
+        Returns:
+            Tuple (x, y, width, height) in page image pixels
+        """
+        # Extract coordinates
+        x = float(coordinates.get('x', 0))
+        y = float(coordinates.get('y', 0))
+        w_coord = float(coordinates.get('width', 0))
+        h_coord = float(coordinates.get('height', 0))
+        
+        # Check if coordinates are normalized (0-1)
+        if x <= 1.0 and y <= 1.0 and w_coord <= 1.0 and h_coord <= 1.0:
+            # Treat as normalized
+            x = int(x * image_width)
+            y = int(y * image_height)
+            width = int(w_coord * image_width)
+            height = int(h_coord * image_height)
+        else:
+            # Treat as pixels
+            x = int(x)
+            y = int(y)
+            width = int(w_coord) if w_coord > 0 else image_width
+            height = int(h_coord) if h_coord > 0 else image_height
+        
+        # --- INCREASED PADDING FOR SAFETY ---
+        x = max(0, x - padding)
+        y = max(0, y - padding)
+        width = width + (2 * padding)
+        height = height + (2 * padding)
+        
+        # Ensure valid bounds
+        width = min(width, image_width - x)
+        height = min(height, image_height - y)
+        
+        if width <= 0 or height <= 0:
+            raise ValueError(f"Invalid crop dimensions: w={width}, h={height}")
+        
+        return x, y, width, height
+    
+    @staticmethod
+    def extract_region(pdf_path, page_number, coordinates, zoom=4.0):
         """
         Extract a specific region from a PDF page
         
+        Only the requested rectangle is rasterized, so memory is proportional
+        to the region rather than the page. The output is equivalent, within
+        rounding at fractional pixel boundaries, to cropping the full page
+        rendered by pdf_page_to_image at the same zoom (including its
+        cropbox clip and auto-rotation to portrait).
+        
         Args:
             pdf_path: Path to PDF file
             page_number: Page number (0-indexed)
-            coordinates: Dict with {x, y, width, height} in pixels
+            coordinates: Dict with {x, y, width, height} in pixels or normalized
+            zoom: Zoom factor for quality (default 4.0)
             
         Returns:
             PIL Image of the extracted region
         """
         try:
-            # Get full page image
-            full_image = PDFProcessor.pdf_page_to_image(pdf_path, page_number, zoom=4.0)
-            
-            # Extract coordinates
-            x = float(coordinates.get('x', 0))
-            y = float(coordinates.get('y', 0))
-            w_coord = float(coordinates.get('width', 0))
-            h_coord = float(coordinates.get('height', 0))
-            
-            # Check if coordinates are normalized (0-1)
-            if x <= 1.0 and y <= 1.0 and w_coord <= 1.0 and h_coord <= 1.0:
-                # Treat as normalized
-                x = int(x * full_image.width)
-                y = int(y * full_image.height)
-                width = int(w_coord * full_image.width)
-                height = int(h_coord * full_image.height)
+            mat = fitz.Matrix(zoom, zoom)
+            
+            # Pixel bounds of the full-page render (cropbox clip, as in pdf_page_to_image)
+            page_irect = (PDFProcessor._page_bounds(pdf_path, page_number) * mat).irect
+            full_width, full_height = page_irect.width, page_irect.height
+            
+            # pdf_page_to_image turns landscape renders 90° clockwise
+            rotated = full_width > full_height
+            if rotated:
+                x, y, width, height = PDFProcessor._region_box(coordinates, full_height, full_width)
+                # Undo the rotation: rotated (x, y) came from unrotated (y, full_height - x)
+                x0, y0, x1, y1 = y, full_height - (x + width), y + height, full_height - x
             else:
-                # Treat as pixels
-                x = int(x)
-                y = int(y)
-                width = int(w_coord) if w_coord > 0 else full_image.width
-                height = int(h_coord) if h_coord > 0 else full_image.height
+                x, y, width, height = PDFProcessor._region_box(coordinates, full_width, full_height)
+                x0, y0, x1, y1 = x, y, x + width, y + height
             
-            # --- INCREASED PADDING FOR SAFETY ---
-            padding = 40
-            x = max(0, x - padding)
-            y = max(0, y - padding)
-            width = width + (2 * padding)
-            height = height + (2 * padding)
+            cache = get_render_cache()
+            if cache is not None:
+                file_hash = PDFProcessor.get_file_hash(pdf_path)
+                key = (file_hash, page_number, zoom, (x0, y0, x1, y1))
+                
+                region = cache.get(key)
+                if region is None:
+                    # A cached full page at this zoom already contains the region
+                    region = cache.get((file_hash, page_number, zoom, None), box=(x, y, x + width, y + height))
+                if region is not None:
+                    return region
             
-            # Ensure valid bounds
-            width = min(width, full_image.width - x)
-            height = min(height, full_image.height - y)
+            with _document_pool.open(pdf_path) as doc:
+                page = doc[page_number]
+                
+                # Map render pixels back into PDF space and rasterize just that rectangle
+                clip = fitz.Rect(
+                    (page_irect.x0 + x0) / zoom,
+                    (page_irect.y0 + y0) / zoom,
+                    (page_irect.x0 + x1) / zoom,
+                    (page_irect.y0 + y1) / zoom
+                )
+                pix = page.get_pixmap(matrix=mat, clip=clip)
+                region = PDFProcessor.pixmap_to_image(pix)
             
-            if width <= 0 or height <= 0:
-                raise ValueError(f"Invalid crop dimensions: w={width}, h={height}")
+            if rotated:
+                region = PDFProcessor._rotate_to_portrait(region)
             
-            # Crop region
-            region = full_image.crop((x, y, x + width, y + height))
+            if cache is not None:
+                cache.put(key, region)
+                region = region.copy()
             
             return region
             
@@ -128,6 +471,47 @@ class PDFProcessor:
             print(f"Error extracting region: {str(e)}")
             raise
     
+    @staticmethod
+    def get_page_text(pdf_path, page_number, coordinates=None):
+        """
+        Read the embedded text layer of a page (empty for scanned pages)
+        
+        Args:
+            pdf_path: Path to PDF file
+            page_number: Page number (0-indexed)
+            coordinates: Optional dict with normalized (0-1) {x, y, width, height}
+                         on the page image as shown by pdf_page_to_image
+        
+        Returns:
+            Text string
+        """
+        clip = None
+        if coordinates:
+            bounds = PDFProcessor._page_bounds(pdf_path, page_number)
+            fx0 = float(coordinates.get('x', 0))
+            fy0 = float(coordinates.get('y', 0))
+            fx1 = fx0 + float(coordinates.get('width', 1))
+            fy1 = fy0 + float(coordinates.get('height', 1))
+            
+            if bounds.width > bounds.height:
+                # Shown rotated 90° clockwise: image (x, y) came from page (y, height - x)
+                clip = fitz.Rect(
+                    bounds.x0 + fy0 * bounds.width,
+                    bounds.y0 + (1 - fx1) * bounds.height,
+                    bounds.x0 + fy1 * bounds.width,
+                    bounds.y0 + (1 - fx0) * bounds.height
+                )
+            else:
+                clip = fitz.Rect(
+                    bounds.x0 + fx0 * bounds.width,
+                    bounds.y0 + fy0 * bounds.height,
+                    bounds.x0 + fx1 * bounds.width,
+                    bounds.y0 + fy1 * bounds.height
+                )
+        
+        with _document_pool.open(pdf_path) as doc:
+            return doc[page_number].get_text(clip=clip)
+    
     @staticmethod
     def generate_thumbnail(pdf_path, output_path, size=(200, 280)):
         """
@@ -170,18 +554,14 @@ class PDFProcessor:
             List of PIL Images
         """
         try:
-            doc = fitz.open(pdf_path)
             images = []
             
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                mat = fitz.Matrix(zoom, zoom)
-                pix = page.get_pixmap(matrix=mat)
-                img_data = pix.tobytes("png")
-                image = Image.open(io.BytesIO(img_data))
-                images.append(image)
-            
-            doc.close()
+            with _document_pool.open(pdf_path) as doc:
+                for page_num in range(len(doc)):
+                    page = doc[page_num]
+                    mat = fitz.Matrix(zoom, zoom)
+                    pix = page.get_pixmap(matrix=mat)
+                    images.append(PDFProcessor.pixmap_to_image(pix))
             return images
             
         except Exception as e:
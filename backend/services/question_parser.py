@@ -0,0 +1,113 @@
+"""
+Question Parser
+Splits page text into numbered question blocks and reads max marks from
+rubric criteria. Works on Gemini transcriptions (bold **Q1.** labels) and
+on the embedded text layer of typed question papers and rubrics, so those
+can be ingested without a Gemini call.
+"""
+
+import re
+from services.pdf_processor import PDFProcessor
+
+# Bold labels the auto-analysis prompt asks Gemini for: **Q1.**, **2a.**, **3)**
+BOLD_LABEL_PATTERN = re.compile(r'(\*\*(?:Q\d+|Q?\d+[a-z]?|\d+[\.\)])[\w\s\.]*\*\*)')
+
+# Rubric max marks, e.g. "[10 marks]", "(5 Marks)", "4M"
+MARKS_PATTERN = re.compile(r'(?:[\[\(])?(\d+)\s*(?:marks?|M)[\]\)]?', re.IGNORECASE)
+
+# Question starts in typed text: "Q1.", "Q.2", "Question 3:", "4.", "5)", "6(a)", "7b."
+# A bare number needs a "." or ")" (or a "(a)" part) so lines like "10 marks" do not match
+QUESTION_LINE_PATTERN = re.compile(
+    r'^\s*(?:'
+    r'Q(?:uestion)?\s*\.?\s*(?P<qnum>\d{1,3})(?:\((?P<qsub>[a-z])\)|(?P<qsub2>[a-z]))?\s*[\.\):]?'
+    r'|(?P<num>\d{1,3})(?:\((?P<sub>[a-z])\)\s*[\.\):]?|(?P<sub2>[a-z])?\s*[\.\)])'
+    r')(?:\s+|$)',
+    re.IGNORECASE
+)
+
+# Less text than this on a page means it is scanned (or nearly empty)
+MIN_TEXT_LAYER_CHARS = 40
+
+
+def split_question_blocks(transcription):
+    """
+    Split a Gemini transcription on its bold question labels
+
+    Returns:
+        List of {'id', 'content'} dicts in page order
+    """
+    questions = []
+    question_blocks = BOLD_LABEL_PATTERN.split(transcription)
+
+    # 0 is usually empty pre-match text, then pairs of (Header, Content)
+    for i in range(1, len(question_blocks), 2):
+        header = question_blocks[i].replace('*', '').strip()
+        content = question_blocks[i + 1].strip() if i + 1 < len(question_blocks) else ""
+        questions.append({
+            'id': header,
+            'content': content
+        })
+    return questions
+
+
+def split_text_questions(text):
+    """
+    Split typed page text into numbered questions
+
+    Ids are normalised to the labels Gemini produces ("Q1.", "Q2(a).") so
+    both sources store the same question numbers. A bare "3." only starts
+    a new question when it continues the numbering; otherwise it is taken
+    as a numbered point inside the current question.
+
+    Returns:
+        List of {'id', 'content'} dicts in page order
+    """
+    questions = []
+    last_number = 0
+
+    for line in text.splitlines():
+        match = QUESTION_LINE_PATTERN.match(line)
+        if match:
+            prefixed = match.group('qnum') is not None
+            number = int(match.group('qnum') if prefixed else match.group('num'))
+            sub = (match.group('qsub') or match.group('qsub2') or match.group('sub') or match.group('sub2') or '').lower()
+            if prefixed or not questions or number > last_number or (number == last_number and sub):
+                last_number = number
+                label = f"Q{number}({sub})." if sub else f"Q{number}."
+                questions.append({'id': label, 'lines': [line[match.end():].strip()]})
+                continue
+
+        if questions:
+            questions[-1]['lines'].append(line.strip())
+
+    return [
+        {'id': q['id'], 'content': '\n'.join(l for l in q['lines'] if l).strip()}
+        for q in questions
+    ]
+
+
+def extract_max_marks(criteria):
+    """Max marks stated in rubric criteria text, or None"""
+    match = MARKS_PATTERN.search(criteria)
+    return float(match.group(1)) if match else None
+
+
+def analyze_text_layer(pdf_path, page_number):
+    """
+    Analyse a page from its embedded text layer instead of Gemini
+
+    Returns:
+        Dict shaped like an auto_analyze_page result, or None if the page
+        has no usable text layer (scanned) and needs Gemini
+    """
+    text = PDFProcessor.get_page_text(pdf_path, page_number)
+    if len(text.strip()) < MIN_TEXT_LAYER_CHARS:
+        return None
+
+    return {
+        'transcription': text.strip(),
+        'questions': split_text_questions(text),
+        'diagrams': [],
+        'success': True,
+        'text_layer': True
+    }
@@ -0,0 +1,367 @@
+"""
+Gemini Rate Limiter
+Token buckets for requests-per-minute and tokens-per-minute plus a cap on
+in-flight calls, so traffic runs smoothly at the quota ceiling instead of
+bursting into 429s. Interactive requests (transcribe, auto-scan) are
+served before bulk work (batch uploads, scan-all-pages).
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from PIL import Image
+import asyncio
+import heapq
+import io
+import itertools
+import math
+import os
+import sqlite3
+import threading
+import time
+from config import Config
+
+# Priority classes: lower value is served first
+INTERACTIVE = 0
+BULK = 1
+
+_priority = ContextVar('gemini_priority', default=INTERACTIVE)
+
+
+@contextmanager
+def request_priority(priority):
+    """
+    Run Gemini calls made in this block (on this thread) at the given priority
+
+    Worker threads do not inherit the caller's context, so background jobs
+    enter this inside the function they submit to their pool.
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def estimate_tokens(inputs):
+    """
+    Rough token count of a generate_content request, for budgeting before the call
+
+    Text is ~4 characters per token; Gemini bills images as 258 tokens per
+    768x768 tile. A fixed allowance covers the response.
+    """
+    parts = inputs if isinstance(inputs, (list, tuple)) else [inputs]
+    tokens = RateLimiter.OUTPUT_TOKEN_ESTIMATE
+    for part in parts:
+        if isinstance(part, str):
+            tokens += len(part) // 4
+        elif hasattr(part, 'size'):
+            tokens += _image_tokens(*part.size)
+        elif isinstance(part, dict) and 'data' in part:
+            try:
+                # Only the header is parsed; the encoded image is not decoded
+                tokens += _image_tokens(*Image.open(io.BytesIO(part['data'])).size)
+            except Exception:
+                tokens += 258
+    return tokens
+
+
+def _image_tokens(width, height):
+    return 258 * max(1, math.ceil(width / 768) * math.ceil(height / 768))
+
+
+class LocalBucketStore:
+    """Bucket levels held in this process"""
+
+    def __init__(self):
+        self._levels = {}  # name -> (level, updated_at)
+        self._lock = threading.Lock()
+
+    def take(self, amounts):
+        """
+        Take from every bucket at once, or from none
+
+        Args:
+            amounts: Dict name -> (amount, refill per second, capacity)
+
+        Returns:
+            0 if taken, otherwise seconds until there is enough in every bucket
+        """
+        with self._lock:
+            now = time.monotonic()
+            return _take(self._levels, amounts, now)
+
+    def adjust(self, name, delta, capacity):
+        with self._lock:
+            level, updated = self._levels.get(name, (capacity, time.monotonic()))
+            self._levels[name] = (min(capacity, level + delta), updated)
+
+    def drain(self, names):
+        with self._lock:
+            now = time.monotonic()
+            for name in names:
+                self._levels[name] = (0.0, now)
+
+
+class SQLiteBucketStore:
+    """
+    Bucket levels shared by every worker process on this host
+
+    A stand-in for a shared store like Redis: each take runs in an
+    IMMEDIATE transaction, which SQLite serialises across processes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "name TEXT PRIMARY KEY, level REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            levels = {name: (level, updated) for name, level, updated in conn.execute("SELECT name, level, updated_at FROM buckets")}
+            yield levels
+            conn.executemany(
+                "INSERT OR REPLACE INTO buckets (name, level, updated_at) VALUES (?, ?, ?)",
+                [(name, level, updated) for name, (level, updated) in levels.items()]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def take(self, amounts):
+        # Wall clock, since monotonic time is not comparable across processes
+        with self._transaction() as levels:
+            return _take(levels, amounts, time.time())
+
+    def adjust(self, name, delta, capacity):
+        with self._transaction() as levels:
+            level, updated = levels.get(name, (capacity, time.time()))
+            levels[name] = (min(capacity, level + delta), updated)
+
+    def drain(self, names):
+        with self._transaction() as levels:
+            now = time.time()
+            for name in names:
+                levels[name] = (0.0, now)
+
+
+def _take(levels, amounts, now):
+    """Refill the buckets in levels to now and take amounts if all have enough"""
+    refilled = {}
+    wait = 0.0
+    for name, (amount, rate, capacity) in amounts.items():
+        level, updated = levels.get(name, (capacity, now))
+        level = min(capacity, level + max(0.0, now - updated) * rate)
+        refilled[name] = level
+        # A single request larger than the bucket waits for a full bucket
+        shortfall = min(amount, capacity) - level
+        if shortfall > 0:
+            wait = max(wait, shortfall / rate)
+
+    for name, (amount, rate, capacity) in amounts.items():
+        level = refilled[name] - (amount if wait == 0 else 0)
+        levels[name] = (level, now)
+    return wait
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute budgets with priority queueing
+
+    Callers queue in (priority, arrival) order; only the head of the queue
+    may take from the buckets, so interactive requests overtake queued bulk
+    ones. Buckets hold BURST_SECONDS worth of budget, which bounds bursts
+    after idle periods.
+    """
+
+    BURST_SECONDS = 10
+    OUTPUT_TOKEN_ESTIMATE = 256
+    ASYNC_POLL_SECONDS = 0.05  # How often queued coroutines re-check for their turn
+
+    def __init__(self, rpm, tpm, max_concurrency, store=None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.store = store or LocalBucketStore()
+        self._cond = threading.Condition()
+        self._waiters = []  # heap of (priority, seq)
+        self._seq = itertools.count()
+        self._in_flight = 0
+
+    def _budgets(self, tokens):
+        amounts = {}
+        if self.rpm > 0:
+            rate = self.rpm / 60
+            amounts['requests'] = (1, rate, max(1.0, rate * self.BURST_SECONDS))
+        if self.tpm > 0:
+            rate = self.tpm / 60
+            amounts['tokens'] = (tokens, rate, max(1.0, rate * self.BURST_SECONDS))
+        return amounts
+
+    def _try_take(self, ticket, amounts):
+        """
+        With the lock held: whether ticket may go now, and if not how long
+        to wait (None = until another caller moves)
+        """
+        if self._waiters[0] != ticket or (self.max_concurrency > 0 and self._in_flight >= self.max_concurrency):
+            return False, None
+        wait = self.store.take(amounts) if amounts else 0
+        return wait <= 0, wait
+
+    def _leave_queue(self, ticket):
+        """With the lock held: drop ticket from the queue and wake the others"""
+        self._waiters.remove(ticket)
+        heapq.heapify(self._waiters)
+        self._cond.notify_all()
+
+    def _log_wait(self, priority, started):
+        waited = time.monotonic() - started
+        if waited > 1:
+            label = 'interactive' if priority == INTERACTIVE else 'bulk'
+            print(f"⏳ Gemini rate limiter held a request ({label}) for {waited:.1f}s")
+
+    def acquire(self, tokens, priority=None):
+        """
+        Wait for a slot for one Gemini call (blocking) and return its Permit;
+        call release() when the call ends. Coroutines use acquire_async.
+
+        Args:
+            tokens: Estimated tokens for the call (see estimate_tokens)
+            priority: INTERACTIVE or BULK (defaults to the request_priority in effect)
+        """
+        if priority is None:
+            priority = _priority.get()
+        amounts = self._budgets(tokens)
+        ticket = (priority, next(self._seq))
+        started = time.monotonic()
+
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    ready, wait = self._try_take(ticket, amounts)
+                    if ready:
+                        break
+                    self._cond.wait(wait)
+            finally:
+                self._leave_queue(ticket)
+            self._in_flight += 1
+
+        self._log_wait(priority, started)
+        return Permit(self, tokens)
+
+    async def acquire_async(self, tokens, priority=None):
+        """
+        acquire for coroutines: queues in the same order, but waits with
+        asyncio.sleep instead of holding a thread, so queued bulk calls
+        cannot fill the event loop's default executor (shared with page
+        renders) and hold up interactive requests
+
+        Args:
+            tokens: Estimated tokens for the call (see estimate_tokens)
+            priority: INTERACTIVE or BULK (defaults to the request_priority in effect)
+        """
+        if priority is None:
+            priority = _priority.get()
+        amounts = self._budgets(tokens)
+        ticket = (priority, next(self._seq))
+        started = time.monotonic()
+
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+        try:
+            while True:
+                with self._cond:
+                    ready, wait = self._try_take(ticket, amounts)
+                    if ready:
+                        self._in_flight += 1
+                        break
+                await asyncio.sleep(wait or self.ASYNC_POLL_SECONDS)
+        finally:
+            with self._cond:
+                self._leave_queue(ticket)
+
+        self._log_wait(priority, started)
+        return Permit(self, tokens)
+
+    def release(self):
+        """Give back the in-flight slot taken by acquire"""
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def limit(self, tokens, priority=None):
+        """
+        Hold a slot for one Gemini call
+
+        Yields:
+            Permit; call permit.record(response) to settle the token budget
+            against the actual usage
+        """
+        permit = self.acquire(tokens, priority)
+        try:
+            yield permit
+        finally:
+            self.release()
+
+    def backoff(self):
+        """Empty the buckets after a 429 so every caller slows down, not just the one that hit it"""
+        names = list(self._budgets(0))
+        if names:
+            self.store.drain(names)
+
+
+class Permit:
+    """A held rate limiter slot"""
+
+    def __init__(self, limiter, tokens):
+        self.limiter = limiter
+        self.tokens = tokens
+
+    def record(self, response):
+        """Credit or debit the tokens bucket by the difference from the estimate"""
+        usage = getattr(response, 'usage_metadata', None)
+        actual = getattr(usage, 'total_token_count', None) if usage else None
+        if not actual or self.limiter.tpm <= 0:
+            return
+        _, _, capacity = self.limiter._budgets(actual)['tokens']
+        self.limiter.store.adjust('tokens', self.tokens - actual, capacity)
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Return the process-wide Gemini rate limiter, or None when disabled"""
+    global _rate_limiter
+    if not Config.GEMINI_RATE_LIMIT_ENABLED:
+        return None
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            store = SQLiteBucketStore(Config.GEMINI_RATE_LIMIT_PATH) if Config.GEMINI_RATE_LIMIT_PATH else None
+            _rate_limiter = RateLimiter(
+                rpm=Config.GEMINI_RPM,
+                tpm=Config.GEMINI_TPM,
+                max_concurrency=Config.GEMINI_MAX_CONCURRENCY,
+                store=store
+            )
+    return _rate_limiter
@@ -0,0 +1,173 @@
+"""
+Page Render Cache
+Keeps rendered PDF page images in memory (LRU bounded in bytes) with an
+optional raw-pixel disk tier, so evaluators flipping between pages and
+zooming repeatedly do not re-rasterize with MuPDF
+"""
+
+from collections import OrderedDict
+from PIL import Image
+import hashlib
+import os
+import threading
+from config import Config
+
+
+def image_nbytes(image):
+    """Approximate decoded size of a PIL Image in bytes"""
+    return image.width * image.height * len(image.getbands())
+
+
+class RenderCache:
+    """
+    LRU cache of rendered page images
+
+    Keys are (file_hash, page_number, zoom, clip) where clip is None for a
+    full page or a pixel box tuple for a region. Images handed out are
+    copies, so callers may modify them (e.g. Image.thumbnail) freely.
+    """
+
+    def __init__(self, max_bytes, disk_dir=None, disk_max_bytes=0):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()  # key -> PIL Image
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, key, box=None):
+        """
+        Return a copy of the cached image for key, or None
+
+        Args:
+            key: Cache key
+            box: Optional (left, upper, right, lower) to return only a crop
+        """
+        with self._lock:
+            image = self._entries.get(key)
+            if image is not None:
+                self._entries.move_to_end(key)
+                return image.crop(box) if box else image.copy()
+
+        image = self._disk_get(key)
+        if image is not None:
+            self._memory_put(key, image)
+            return image.crop(box) if box else image.copy()
+        return None
+
+    def put(self, key, image):
+        """Store image under key (the cache keeps this instance; do not modify it afterwards)"""
+        self._memory_put(key, image)
+        self._disk_put(key, image)
+
+    def closest_higher_zoom(self, file_hash, page_number, zoom):
+        """
+        Find the lowest-zoom full-page render above zoom held in memory
+
+        Returns:
+            Tuple (zoom, image copy) or None
+        """
+        with self._lock:
+            candidates = [
+                (key[2], key) for key in self._entries
+                if key[0] == file_hash and key[1] == page_number and key[3] is None and key[2] > zoom
+            ]
+            if not candidates:
+                return None
+            source_zoom, key = min(candidates)
+            self._entries.move_to_end(key)
+            return source_zoom, self._entries[key].copy()
+
+    # ── Memory tier ──────────────────────────────────────────────────────
+
+    def _memory_put(self, key, image):
+        size = image_nbytes(image)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= image_nbytes(old)
+            self._entries[key] = image
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= image_nbytes(evicted)
+
+    # ── Disk tier (raw pixels, no PNG encode/decode) ─────────────────────
+
+    def _disk_path(self, key):
+        digest = hashlib.sha256(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.disk_dir, f"{digest}.raw")
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                mode, width, height = f.readline().decode('ascii').split()
+                data = f.read()
+            os.utime(path)  # Keep recently used files out of pruning
+            return Image.frombytes(mode, (int(width), int(height)), data)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"⚠️ Render cache disk read failed: {e}")
+            return None
+
+    def _disk_put(self, key, image):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(f"{image.mode} {image.width} {image.height}\n".encode('ascii'))
+                f.write(image.tobytes())
+            os.replace(tmp_path, path)
+            self._disk_prune()
+        except Exception as e:
+            print(f"⚠️ Render cache disk write failed: {e}")
+
+    def _disk_prune(self):
+        """Delete least recently used files once the disk tier exceeds its budget"""
+        if not self.disk_max_bytes:
+            return
+        files = []
+        total = 0
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith('.raw'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+_render_cache = None
+_render_cache_lock = threading.Lock()
+
+
+def get_render_cache():
+    """Return the process-wide render cache, or None when disabled"""
+    global _render_cache
+    if Config.RENDER_CACHE_MAX_MB <= 0:
+        return None
+    with _render_cache_lock:
+        if _render_cache is None:
+            disk_dir = os.path.join(Config.UPLOAD_FOLDER, 'render_cache') if Config.RENDER_CACHE_DISK_MAX_MB > 0 else None
+            _render_cache = RenderCache(
+                max_bytes=Config.RENDER_CACHE_MAX_MB * 1024 * 1024,
+                disk_dir=disk_dir,
+                disk_max_bytes=Config.RENDER_CACHE_DISK_MAX_MB * 1024 * 1024
+            )
+    return _render_cache
@@ -0,0 +1,203 @@
+"""
+Scan Jobs
+Scans every page of a question paper or rubric in the background. Typed
+pages are read from the text layer; scanned pages are analysed by Gemini,
+a bounded number concurrently on the shared event loop. Answer sheet jobs
+fill the PageAnalysis store for later /auto-scan requests instead.
+"""
+
+import asyncio
+from datetime import datetime
+from flask import current_app
+import json
+from config import Config
+from models import db, ScanJob, QuestionPaper, EvaluationRubric, AnswerSheet
+from services.async_runner import fan_out
+from services.content_store import upsert_questions, upsert_rubric_criteria, count_questions
+from services.job_queue import submit_job, stale_jobs
+from services.page_analysis import analyze_answer_sheet_pages, get_blank_pages
+from services.pdf_processor import PDFProcessor
+from services.question_parser import analyze_text_layer
+from services.rate_limiter import request_priority, BULK, INTERACTIVE
+
+
+def start_scan_job(doc_type, doc_id, ocr_service, force=False, pages=None):
+    """
+    Create a ScanJob row and queue it on the background worker pool
+
+    Args:
+        doc_type: 'question_paper', 'rubric' or 'answer_sheet'
+        doc_id: ID of the document to scan
+        ocr_service: AsyncGeminiOCRService used for the page analyses
+        force: Scan pages detected as blank too
+        pages: Answer sheet pages to analyse (0-indexed); None = every page
+
+    Returns:
+        The queued ScanJob
+    """
+    job = ScanJob(doc_type=doc_type, doc_id=doc_id, status='QUEUED',
+                  pages=json.dumps(pages) if pages is not None else None)
+    db.session.add(job)
+    db.session.commit()
+
+    submit_job(current_app._get_current_object(), run_scan_job, job.id, ocr_service, force, heartbeat=job)
+    print(f"📥 Queued scan job {job.id}: type={doc_type}, id={doc_id}")
+    return job
+
+
+def fail_stale_scan_jobs():
+    """
+    Mark scan jobs orphaned by a stopped or crashed server as FAILED
+
+    Returns:
+        Number of jobs failed
+    """
+    jobs = stale_jobs(ScanJob)
+    for job in jobs:
+        job.status = 'FAILED'
+        job.errors = json.dumps([{'page': None, 'error': 'Interrupted: the server stopped before the scan finished'}])
+        job.finished_at = datetime.utcnow()
+    if jobs:
+        db.session.commit()
+        print(f"⚠️ Failed {len(jobs)} interrupted scan job(s): {[job.id for job in jobs]}")
+    return len(jobs)
+
+
+async def _analyze_page(file_path, page_number, ocr_service):
+    """Analyse one page from its text layer, or render it for Gemini if scanned (runs on the shared event loop)"""
+    result = await asyncio.to_thread(analyze_text_layer, file_path, page_number)
+    if result is not None:
+        return result
+
+    image = await asyncio.to_thread(PDFProcessor.pdf_page_to_image, file_path, page_number, 2.0)
+    with request_priority(BULK):
+        return await ocr_service.auto_analyze_page_async(image)
+
+
+def run_scan_job(job_id, ocr_service, force=False):
+    """Process a queued ScanJob; called inside an app context by the job queue"""
+    job = db.session.get(ScanJob, job_id)
+    if not job:
+        return
+
+    try:
+        if job.doc_type == 'answer_sheet':
+            _run_answer_sheet_scan(job, ocr_service, force)
+            return
+
+        if job.doc_type == 'question_paper':
+            doc = db.session.get(QuestionPaper, job.doc_id)
+        else:
+            doc = db.session.get(EvaluationRubric, job.doc_id)
+        if not doc:
+            raise ValueError(f"{job.doc_type} {job.doc_id} not found")
+
+        file_path = doc.file_path
+        job.total_pages = getattr(doc, 'page_count', None) or PDFProcessor.get_page_count(file_path)
+        blank = set() if force else {p for p in get_blank_pages(doc) if p < job.total_pages}
+        job.pages_skipped = len(blank)
+        job.pages_done = len(blank)
+        job.status = 'RUNNING'
+        db.session.commit()
+        print(f"📖 Scan job {job.id}: {job.total_pages} pages ({job.pages_done} blank), concurrency={Config.SCAN_JOB_CONCURRENCY}")
+
+        page_results = {}
+        errors = []
+
+        pages = fan_out(
+            lambda page_number: _analyze_page(file_path, page_number, ocr_service),
+            [p for p in range(job.total_pages) if p not in blank],
+            Config.SCAN_JOB_CONCURRENCY
+        )
+        for page_number, result, error in pages:
+            if error is not None:
+                errors.append({'page': page_number, 'error': str(error)})
+                print(f"⚠️ Failed to analyze page {page_number + 1}: {error}")
+            elif result.get('success'):
+                page_results[page_number] = result.get('questions', [])
+            else:
+                errors.append({'page': page_number, 'error': result.get('error') or 'Analysis failed'})
+                print(f"⚠️ Failed to analyze page {page_number + 1}")
+
+            # Progress is written from this thread only; the coroutines never touch the DB
+            job.pages_done += 1
+            db.session.commit()
+
+        # Upsert everything in one transaction
+        job.items_stored = _store_scan_results(job.doc_type, doc, page_results)
+        job.errors = json.dumps(sorted(errors, key=lambda e: e['page'])) if errors else None
+        job.status = 'DONE'
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+        print(f"✅ Scan job {job.id} complete. Stored {job.items_stored} items across {job.total_pages} pages.")
+
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(ScanJob, job_id)
+        job.status = 'FAILED'
+        job.errors = json.dumps([{'page': None, 'error': str(e)}])
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        print(f"❌ Scan job {job_id} failed: {str(e)}")
+
+
+def _run_answer_sheet_scan(job, ocr_service, force):
+    """Analyse the job's answer sheet pages into the PageAnalysis store"""
+    answer_sheet = db.session.get(AnswerSheet, job.doc_id)
+    if not answer_sheet:
+        raise ValueError(f"answer_sheet {job.doc_id} not found")
+
+    if job.pages is not None:
+        page_numbers = json.loads(job.pages)
+    else:
+        page_numbers = list(range(answer_sheet.page_count or PDFProcessor.get_page_count(answer_sheet.file_path)))
+    job.total_pages = len(page_numbers)
+    job.status = 'RUNNING'
+    db.session.commit()
+    print(f"📖 Scan job {job.id}: answer sheet {answer_sheet.id}, {job.total_pages} pages")
+
+    errors = []
+
+    def progress(page_number, result, cached):
+        if not result.get('success'):
+            errors.append({'page': page_number, 'error': result.get('error') or 'Analysis failed'})
+        elif result.get('blank'):
+            job.pages_skipped += 1
+        else:
+            job.items_stored += 1
+        job.pages_done += 1
+        db.session.commit()
+
+    # Someone asked for these pages, so they go ahead of eager analysis
+    analyze_answer_sheet_pages(answer_sheet, ocr_service, page_numbers, priority=INTERACTIVE,
+                               force=force, progress=progress)
+
+    job.errors = json.dumps(sorted(errors, key=lambda e: e['page'])) if errors else None
+    job.status = 'DONE'
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+    print(f"✅ Scan job {job.id} complete. {job.items_stored} of {job.total_pages} pages analysed.")
+
+
+def _store_scan_results(doc_type, doc, page_results):
+    """
+    Upsert extracted questions/criteria for all pages (caller commits)
+
+    One INSERT ... ON CONFLICT per page, applied in page order so a question
+    repeated on a later page overwrites the earlier one, as the old serial
+    scan did.
+    """
+    total_stored = 0
+
+    for page_number in sorted(page_results):
+        if doc_type == 'question_paper':
+            total_stored += upsert_questions(doc.id, page_results[page_number], page_number)
+        else:
+            total_stored += upsert_rubric_criteria(doc.id, page_results[page_number])
+
+    # Update total_questions on QuestionPaper if applicable
+    if doc_type == 'question_paper':
+        doc.total_questions = count_questions(doc.id)
+
+    return total_stored
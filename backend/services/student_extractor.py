@@ -3,28 +3,39 @@ Student Information Extraction Service
 Uses Gemini OCR to extract student details from answer sheet headers
 """
 
-from services.gemini_ocr import GeminiOCRService
+from services.gemini_ocr import AsyncGeminiOCRService
+from services.pdf_processor import PDFProcessor
+from config import Config
 from PIL import Image
+import asyncio
 import json
 import re
 
-class StudentExtractor:
-    def __init__(self):
-        self.ocr_service = GeminiOCRService()
-    
-    def extract_student_info(self, image):
-        """
-        Extract student information from answer sheet first page
-        
-        Args:
-            image: PIL Image or path to image
-            
-        Returns:
-            dict with keys: name, roll_number, class_name
-        """
-        try:
-            # Gemini prompt specifically for header extraction
-            prompt = """Extract student information from this answer sheet header.
+# Header labels for the text-layer pre-pass (typed / born-digital cover sheets)
+ROLL_PATTERN = re.compile(
+    r'\b(?:roll|reg(?:istration)?|register|enrol(?:l?ment)?|admission|student\s*id)'
+    r'\.?\s*(?:no|number|num|#)?\.?\s*[:\-–]?\s*([A-Za-z0-9][A-Za-z0-9/\-]*)',
+    re.IGNORECASE
+)
+# Name and class labels only count where a field starts (see _starts_field),
+# so "School Name:", "Father's Name:" or "Subject Name:" are not read as the student's
+NAME_PATTERN = re.compile(
+    r'\b(?:student\'?s?\s*name|name\s*of\s*(?:the\s*)?(?:student|candidate)|candidate\'?s?\s*name|name)'
+    r'\s*[:\-–]\s*([A-Za-z][A-Za-z .\']*)',
+    re.IGNORECASE
+)
+# A whole word ("Classical Mechanics" is not a class) followed by a separator,
+# or directly by a number-like value ("Class 10A", "Std XII")
+CLASS_PATTERN = re.compile(
+    r'\b(?:class|std|standard|grade)\b\.?'
+    r'(?:\s*[:\-–]\s*|\s+(?=\d|[IVXivx]+\b))([A-Za-z0-9][A-Za-z0-9 \-]*)',
+    re.IGNORECASE
+)
+# Where a captured value runs into the next label on the same line
+FIELD_END = re.compile(r'\s{2,}|\t|\b(?:roll|reg|register|class|std|section|date|subject|id)\b', re.IGNORECASE)
+
+# Gemini prompt specifically for header extraction
+HEADER_PROMPT = """Extract student information from this answer sheet header.
 
 Look for:
 1. Student Name (usually after "Name:", "Student:", or similar)
@@ -41,46 +52,178 @@ Return ONLY a JSON object with this structure:
 
 If any field is not found, use null. Return ONLY the JSON, no other text."""
 
-            # Call Gemini
-            if isinstance(image, str):
-                # It's a path
-                result = self.ocr_service.model.generate_content([prompt, Image.open(image)])
-            else:
-                # It's already a PIL Image
-                result = self.ocr_service.model.generate_content([prompt, image])
+class StudentExtractor:
+    def __init__(self):
+        self.ocr_service = AsyncGeminiOCRService()
+    
+    def extract_from_pdf(self, pdf_path, header_box=None):
+        """
+        Extract student information from page 0 of an answer sheet PDF
+        
+        Tries the PDF text layer first, which costs no API call for typed
+        cover sheets; otherwise only the header region is sent to Gemini.
+        
+        Args:
+            pdf_path: Path to answer sheet PDF
+            header_box: Optional normalized {x, y, width, height} of the header
+                        (defaults to the top STUDENT_HEADER_RATIO of the page)
             
-            # Parse response
-            text = result.text.strip()
+        Returns:
+            dict with keys: name, roll_number, class_name
+        """
+        header_box, local_info = self._text_layer_pass(pdf_path, header_box)
+        if local_info['name'] and local_info['roll_number']:
+            return local_info
+        
+        info = self.extract_student_info(self._header_image(pdf_path, header_box))
+        
+        # Keep whatever the text layer did find if the model missed it
+        return {key: info.get(key) or local_info.get(key) for key in local_info}
+    
+    async def extract_from_pdf_async(self, pdf_path, header_box=None):
+        """Async extract_from_pdf; PDF work runs in a thread off the event loop"""
+        header_box, local_info = await asyncio.to_thread(self._text_layer_pass, pdf_path, header_box)
+        if local_info['name'] and local_info['roll_number']:
+            return local_info
+        
+        image = await asyncio.to_thread(self._header_image, pdf_path, header_box)
+        info = await self.extract_student_info_async(image)
+        return {key: info.get(key) or local_info.get(key) for key in local_info}
+    
+    def _text_layer_pass(self, pdf_path, header_box):
+        """Resolve the header box and read what the text layer offers there"""
+        if not header_box and 0 < Config.STUDENT_HEADER_RATIO < 1:
+            header_box = {'x': 0, 'y': 0, 'width': 1, 'height': Config.STUDENT_HEADER_RATIO}
+        
+        local_info = {'name': None, 'roll_number': None, 'class_name': None}
+        try:
+            text = PDFProcessor.get_page_text(pdf_path, 0, header_box)
+            local_info = self.parse_header_text(text)
+            if local_info['name'] and local_info['roll_number']:
+                print(f"⚡ Student info from text layer: {local_info}")
+        except Exception as e:
+            print(f"⚠️ Text layer pre-pass failed: {str(e)}")
+        return header_box, local_info
+    
+    def _header_image(self, pdf_path, header_box):
+        if header_box:
+            return PDFProcessor.extract_region(pdf_path, 0, header_box, zoom=2.0)
+        return PDFProcessor.pdf_page_to_image(pdf_path, 0, zoom=2.0)
+    
+    def parse_header_text(self, text):
+        """
+        Find name, roll number and class in header text with label patterns
+        
+        Args:
+            text: Text of the header region
             
-            # Clean up response to extract JSON
-            # Sometimes Gemini wraps JSON in markdown code blocks
-            if '```json' in text:
-                text = text.split('```json')[1].split('```')[0].strip()
-            elif '```' in text:
-                text = text.split('```')[1].split('```')[0].strip()
+        Returns:
+            dict with keys: name, roll_number, class_name (None when not found)
+        """
+        found = {'name': None, 'roll_number': None, 'class_name': None}
+        for line in (text or '').splitlines():
+            for key, pattern in (('roll_number', ROLL_PATTERN), ('name', NAME_PATTERN), ('class_name', CLASS_PATTERN)):
+                if found[key]:
+                    continue
+                match = next(
+                    (m for m in pattern.finditer(line) if key == 'roll_number' or self._starts_field(line, m.start())),
+                    None
+                )
+                if not match:
+                    continue
+                value = match.group(1)
+                if key != 'roll_number':
+                    value = FIELD_END.split(value, maxsplit=1)[0]
+                value = value.strip(' .-')
+                if key == 'roll_number' and not any(c.isdigit() for c in value):
+                    continue
+                if value:
+                    found[key] = value
+        
+        return {
+            'name': self._clean_name(found['name']),
+            'roll_number': self._clean_roll_number(found['roll_number']),
+            'class_name': self._clean_class_name(found['class_name'])
+        }
+    
+    @staticmethod
+    def _starts_field(line, start):
+        """
+        Whether a label at this position begins a field: at the start of the
+        line, after a wide gap or a | , ; separator, or right after the
+        value of a numeric field ("Roll No: 12 Name: ...")
+        """
+        before = line[:start]
+        if not before.strip() or re.search(r'(?:\s{2,}|\t|[|,;]\s*)$', before):
+            return True
+        return any(c.isdigit() for c in before.split()[-1])
+    
+    def extract_student_info(self, image):
+        """
+        Extract student information from answer sheet first page
+        
+        Args:
+            image: PIL Image or path to image
             
-            # Parse JSON
-            info = json.loads(text)
+        Returns:
+            dict with keys: name, roll_number, class_name
+        """
+        try:
+            # Call Gemini (through the shared response cache)
+            if isinstance(image, str):
+                # It's a path
+                image = Image.open(image)
+            result = self.ocr_service.generate_content([HEADER_PROMPT, self.ocr_service.prepare_image(image)[0]])
+            return self._parse_student_info(result.text)
             
-            # Clean up extracted data
-            student_info = {
-                'name': self._clean_name(info.get('name')),
-                'roll_number': self._clean_roll_number(info.get('roll_number')),
-                'class_name': self._clean_class_name(info.get('class'))
+        except Exception as e:
+            print(f"⚠️ Error extracting student info: {str(e)}")
+            # Return empty info on error
+            return {
+                'name': None,
+                'roll_number': None,
+                'class_name': None
             }
-            
-            print(f"✅ Extracted student info: {student_info}")
-            return student_info
+    
+    async def extract_student_info_async(self, image):
+        """Async extract_student_info for a PIL Image"""
+        try:
+            part, _ = await asyncio.to_thread(self.ocr_service.prepare_image, image)
+            result = await self.ocr_service.generate_content_async([HEADER_PROMPT, part])
+            return self._parse_student_info(result.text)
             
         except Exception as e:
             print(f"⚠️ Error extracting student info: {str(e)}")
-            # Return empty info on error
             return {
                 'name': None,
                 'roll_number': None,
                 'class_name': None
             }
     
+    def _parse_student_info(self, text):
+        """Parse and clean the JSON returned for HEADER_PROMPT"""
+        text = text.strip()
+        
+        # Clean up response to extract JSON
+        # Sometimes Gemini wraps JSON in markdown code blocks
+        if '```json' in text:
+            text = text.split('```json')[1].split('```')[0].strip()
+        elif '```' in text:
+            text = text.split('```')[1].split('```')[0].strip()
+        
+        # Parse JSON
+        info = json.loads(text)
+        
+        # Clean up extracted data
+        student_info = {
+            'name': self._clean_name(info.get('name')),
+            'roll_number': self._clean_roll_number(info.get('roll_number')),
+            'class_name': self._clean_class_name(info.get('class'))
+        }
+        
+        print(f"✅ Extracted student info: {student_info}")
+        return student_info
+    
     def _clean_name(self, name):
         """Clean and standardize student name"""
         if not name or name == 'null':
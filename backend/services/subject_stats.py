@@ -0,0 +1,56 @@
+"""
+Subject Stats
+Dashboard listings of subjects with their answer sheet counts, computed in
+the database with GROUP BY instead of loading every sheet per subject
+"""
+
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from models import db, Subject, AnswerSheet, QuestionPaper
+
+
+def load_subjects_with_counts(*criteria):
+    """
+    Subjects matching criteria, newest first, with the counts Subject.to_dict needs
+
+    Evaluators are joined in and question totals come from a correlated
+    subquery, so this is one query however many subjects match.
+
+    Returns:
+        List of (Subject, counts dict for Subject.to_dict)
+    """
+    total_questions = (
+        db.select(func.coalesce(func.sum(QuestionPaper.total_questions), 0))
+        .where(QuestionPaper.subject_id == Subject.id)
+        .correlate(Subject)
+        .scalar_subquery()
+    )
+    rows = (
+        db.session.query(Subject, total_questions)
+        .options(joinedload(Subject.first_evaluator), joinedload(Subject.second_evaluator))
+        .filter(*criteria)
+        .order_by(Subject.created_at.desc())
+        .all()
+    )
+    return [(subject, {'total_questions': questions}) for subject, questions in rows]
+
+
+def status_counts(subject_ids):
+    """
+    Answer sheets per status for each subject, in one GROUP BY query
+
+    Returns:
+        Dict subject_id -> {status: count}; subjects without sheets map to {}
+    """
+    counts = {subject_id: {} for subject_id in subject_ids}
+    if not counts:
+        return counts
+
+    rows = (
+        db.session.query(AnswerSheet.subject_id, AnswerSheet.status, func.count(AnswerSheet.id))
+        .filter(AnswerSheet.subject_id.in_(counts))
+        .group_by(AnswerSheet.subject_id, AnswerSheet.status)
+    )
+    for subject_id, status, count in rows:
+        counts[subject_id][status] = count
+    return counts
@@ -0,0 +1,171 @@
+"""
+Blank page detection checks.
+
+Blank pages skip Gemini entirely, so a page with only a little writing (a
+lone question number, a one-line answer, faint pencil) must never be taken
+for blank, while empty, ruled-only and plain scanned paper must be. Also
+checks that blank pages are not reported as stored analyses, that force
+analyses them anyway, and that a rubric's blank pages are only detected
+once.
+
+Usage:
+    python test_blank_pages.py
+"""
+
+import os
+import tempfile
+
+TMP_DIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(TMP_DIR, 'blank_pages.db')
+os.environ['BLANK_PAGE_DETECTION'] = 'true'  # off by default
+# Blank pages make no API calls; the service only needs a key to construct
+os.environ.setdefault('GEMINI_API_KEY', 'test-key')
+
+import random
+
+import fitz
+import numpy as np
+from PIL import Image
+
+from app import create_app
+from models import db, AnswerSheet, EvaluationRubric
+from services.gemini_ocr import GeminiOCRService
+from services.page_analysis import analyze_answer_sheet_page, get_blank_pages
+from services.pdf_processor import PDFProcessor
+
+EMPTY, RULED, SCANNED_PAPER, SPARSE_TYPED, TYPED, PENCIL = range(6)
+# Full pages of text in gray tones from dark pen to light pencil
+TEXT_TONES = {6 + i: tone for i, tone in enumerate((0.5, 0.55, 0.6, 0.7))}
+
+app = create_app()
+ocr_service = GeminiOCRService()
+
+
+def make_pdf():
+    """A4 PDF with one page per case above"""
+    path = os.path.join(TMP_DIR, 'pages.pdf')
+    rng = random.Random(1)
+    doc = fitz.open()
+    doc.new_page(width=595, height=842)
+
+    ruled = doc.new_page(width=595, height=842)
+    for y in range(80, 800, 24):
+        ruled.draw_line((40, y), (555, y), color=(0.6, 0.6, 0.6), width=0.5)
+    ruled.draw_line((70, 40), (70, 810), color=(0.8, 0.3, 0.3), width=0.5)
+
+    # Off-white, slightly noisy paper as it comes out of a scanner
+    noise = np.random.default_rng(1).normal(225, 6, (1170, 827)).clip(0, 255).astype(np.uint8)
+    scan_path = os.path.join(TMP_DIR, 'scan.png')
+    Image.fromarray(noise, 'L').save(scan_path)
+    scanned = doc.new_page(width=595, height=842)
+    scanned.insert_image(scanned.rect, filename=scan_path)
+
+    sparse = doc.new_page(width=595, height=842)
+    sparse.insert_text((72, 90), "Q3. 42 N", fontsize=11)
+
+    typed = doc.new_page(width=595, height=842)
+    for i in range(40):
+        typed.insert_text((72, 72 + i * 18), f"Line {i}: the quick brown fox jumps over the lazy dog", fontsize=11)
+
+    # A few wavy lines of thin, light strokes
+    pencil = doc.new_page(width=595, height=842)
+    for i in range(4):
+        points = [(80 + j * 12, 120 + i * 30 + rng.uniform(-5, 5)) for j in range(30)]
+        pencil.draw_polyline(points, color=(0.65, 0.65, 0.65), width=0.6)
+
+    for tone in TEXT_TONES.values():
+        page = doc.new_page(width=595, height=842)
+        for i in range(12):
+            page.insert_text((72, 90 + i * 20), "The quick brown fox jumps over the lazy dog", fontsize=12, color=(tone,) * 3)
+
+    doc.save(path)
+    doc.close()
+    return path
+
+
+PDF_PATH = make_pdf()
+
+
+def test_empty_ruled_and_scanned_paper_are_blank():
+    blank = PDFProcessor.find_blank_pages(PDF_PATH)
+    assert {EMPTY, RULED, SCANNED_PAPER} <= set(blank), blank
+
+
+def test_sparse_typed_page_is_not_blank():
+    blank = PDFProcessor.find_blank_pages(PDF_PATH)
+    assert SPARSE_TYPED not in blank, blank
+    assert TYPED not in blank, blank
+
+
+def test_gray_and_pencil_pages_are_not_blank():
+    blank = PDFProcessor.find_blank_pages(PDF_PATH)
+    for page_number, tone in TEXT_TONES.items():
+        assert page_number not in blank, (tone, blank)
+    assert PENCIL not in blank, blank
+
+
+def test_blank_page_is_not_reported_as_stored():
+    with app.app_context():
+        db.create_all()
+        sheet = AnswerSheet(student_name='Asha', roll_number='1', file_path=PDF_PATH)
+        db.session.add(sheet)
+        db.session.commit()
+
+        result, cached = analyze_answer_sheet_page(sheet, EMPTY, ocr_service)
+        assert result['blank'] and result['success'], result
+        assert cached is False
+
+
+def test_force_analyses_blank_pages():
+    calls = []
+
+    def auto_analyze_page(image, is_path=False):
+        calls.append(image.size)
+        return {'transcription': 'faint answer', 'questions': [], 'diagrams': [], 'success': True}
+
+    with app.app_context():
+        db.create_all()
+        sheet = AnswerSheet(student_name='Ravi', roll_number='2', file_path=PDF_PATH)
+        db.session.add(sheet)
+        db.session.commit()
+
+        ocr_service.auto_analyze_page = auto_analyze_page
+        try:
+            result, cached = analyze_answer_sheet_page(sheet, EMPTY, ocr_service, force=True)
+        finally:
+            del ocr_service.auto_analyze_page
+
+        assert not result.get('blank') and result['transcription'] == 'faint answer', result
+        assert len(calls) == 1 and cached is False
+
+
+def test_rubric_blank_pages_are_detected_once():
+    calls = []
+    find_blank_pages = PDFProcessor.find_blank_pages
+
+    def counting(pdf_path):
+        calls.append(pdf_path)
+        return find_blank_pages(pdf_path)
+
+    with app.app_context():
+        db.create_all()
+        rubric = EvaluationRubric(title='Rubric', file_path=PDF_PATH)
+        db.session.add(rubric)
+        db.session.commit()
+
+        PDFProcessor.find_blank_pages = staticmethod(counting)
+        try:
+            first = get_blank_pages(rubric)
+            second = get_blank_pages(db.session.get(EvaluationRubric, rubric.id))
+        finally:
+            PDFProcessor.find_blank_pages = staticmethod(find_blank_pages)
+
+        assert first == second == {EMPTY, RULED, SCANNED_PAPER}, (first, second)
+        assert len(calls) == 1, calls
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,120 @@
+"""
+Stored answer sheet totals checks.
+
+Results pages and exports read AnswerSheet.total_awarded, total_max and
+marks_count instead of summing the Mark table, so every way marks change
+(saved one at a time, in a batch, edited, or deleted along with their
+question paper) must leave those columns equal to the sums of the marks.
+
+Usage:
+    python test_mark_totals.py
+"""
+
+import os
+import tempfile
+
+TMP_DIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(TMP_DIR, 'mark_totals.db')
+os.environ['EXPORT_CACHE_DIR'] = os.path.join(TMP_DIR, 'exports')
+os.environ['UPLOAD_FOLDER'] = os.path.join(TMP_DIR, 'uploads')
+# No Gemini calls are made; the services only need a key to construct
+os.environ.setdefault('GEMINI_API_KEY', 'test-key')
+
+from app import create_app
+from models import db, AnswerSheet, Mark, QuestionPaper, Subject
+
+app = create_app()
+client = app.test_client()
+
+
+def seed():
+    """A subject with a question paper and two answer sheets; returns their IDs"""
+    with app.app_context():
+        db.create_all()
+        subject = Subject(name='Physics')
+        db.session.add(subject)
+        db.session.flush()
+        paper = QuestionPaper(subject_id=subject.id, title='Paper', file_path=os.path.join(TMP_DIR, 'qp.pdf'))
+        sheets = [
+            AnswerSheet(subject_id=subject.id, student_name=f"Student {i}", roll_number=str(i), file_path=f"sheet_{i}.pdf")
+            for i in range(2)
+        ]
+        db.session.add(paper)
+        db.session.add_all(sheets)
+        db.session.commit()
+        return paper.id, [sheet.id for sheet in sheets]
+
+
+def total(sheet_id):
+    data = client.get(f'/api/evaluate/marks/{sheet_id}/total').get_json()
+    return data['total_awarded'], data['total_max']
+
+
+def assert_totals_match_marks(sheet_id):
+    with app.app_context():
+        sheet = db.session.get(AnswerSheet, sheet_id)
+        marks = Mark.query.filter_by(answer_sheet_id=sheet_id).all()
+        expected = (sum(m.marks_awarded for m in marks), sum(m.max_marks for m in marks), len(marks))
+        assert (sheet.total_awarded, sheet.total_max, sheet.marks_count) == expected, (sheet.to_dict(), expected)
+
+
+def save_mark(sheet_id, paper_id, question_number, awarded, max_marks):
+    response = client.post('/api/evaluate/marks', json={
+        'answersheetId': sheet_id, 'questionPaperId': paper_id,
+        'questionNumber': question_number, 'marksAwarded': awarded, 'maxMarks': max_marks
+    })
+    assert response.status_code == 200, response.get_json()
+
+
+def test_single_and_batch_saves_update_totals():
+    paper_id, (sheet_id, _) = seed()
+    save_mark(sheet_id, paper_id, 1, 3, 5)
+    save_mark(sheet_id, paper_id, 2, 3, 5)
+    assert total(sheet_id) == (6, 10)
+
+    save_mark(sheet_id, paper_id, 2, 4, 5)  # edit
+    response = client.post('/api/evaluate/marks/batch', json={
+        'answersheetId': sheet_id, 'questionPaperId': paper_id,
+        'marks': [{'questionNumber': 3, 'marksAwarded': 1, 'maxMarks': 2}]
+    })
+    assert response.status_code == 200, response.get_json()
+    assert total(sheet_id) == (8, 12)
+    assert_totals_match_marks(sheet_id)
+
+
+def test_deleting_question_paper_resets_totals():
+    paper_id, sheet_ids = seed()
+    for sheet_id in sheet_ids:
+        save_mark(sheet_id, paper_id, 1, 3, 5)
+        save_mark(sheet_id, paper_id, 2, 3, 5)
+        assert total(sheet_id) == (6, 10)
+
+    response = client.delete(f'/api/upload/files/{paper_id}?type=question')
+    assert response.status_code == 200, response.get_json()
+
+    for sheet_id in sheet_ids:
+        assert total(sheet_id) == (0, 0)
+        assert_totals_match_marks(sheet_id)
+
+
+def test_deleting_a_mark_through_the_orm_updates_totals():
+    paper_id, (sheet_id, _) = seed()
+    save_mark(sheet_id, paper_id, 1, 3, 5)
+    save_mark(sheet_id, paper_id, 2, 2, 5)
+
+    with app.app_context():
+        sheet = db.session.get(AnswerSheet, sheet_id)
+        assert sheet.total_awarded == 5
+        db.session.delete(Mark.query.filter_by(answer_sheet_id=sheet_id, question_number=1).one())
+        db.session.commit()
+        # The loaded sheet is refreshed too, not only the database row
+        assert (sheet.total_awarded, sheet.total_max, sheet.marks_count) == (2, 5, 1)
+
+    assert_totals_match_marks(sheet_id)
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✅ {name}")
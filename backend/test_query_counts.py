@@ -0,0 +1,131 @@
+"""
+Query-count regression check for the per-subject endpoints.
+
+Seeds a throwaway SQLite database with subjects of different class sizes
+and evaluators with different numbers of subjects, and asserts each
+endpoint issues the same number of SQL statements either way.
+
+Usage:
+    python test_query_counts.py
+"""
+
+import os
+import tempfile
+
+TMP_DIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(TMP_DIR, 'query_counts.db')
+os.environ['EXPORT_CACHE_DIR'] = os.path.join(TMP_DIR, 'exports')
+
+from contextlib import contextmanager
+from sqlalchemy import event
+
+from app import create_app
+from models import db, Subject, AnswerSheet, Mark, User, QuestionPaper
+from services.mark_store import backfill_sheet_totals
+
+CLASS_SIZES = (5, 50)
+QUESTIONS = 10
+SUBJECTS_PER_EVALUATOR = (2, 12)
+STATUSES = ('UPLOADED', 'FIRST_DONE', 'SECOND_DONE')
+
+app = create_app()
+client = app.test_client()
+
+
+@contextmanager
+def count_queries():
+    counter = {'queries': 0}
+
+    def before_cursor_execute(*args):
+        counter['queries'] += 1
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def seed_subject(students):
+    subject = Subject(name=f"Physics {students}", class_name='10A', academic_year='2025-26')
+    db.session.add(subject)
+    db.session.flush()
+    for i in range(students):
+        sheet = AnswerSheet(
+            subject_id=subject.id,
+            student_name=f"Student {i}",
+            roll_number=f"R{i:04d}",
+            file_path=f"uploads/sheet_{subject.id}_{i}.pdf",
+            status='evaluated'
+        )
+        db.session.add(sheet)
+        db.session.flush()
+        db.session.add_all(
+            Mark(answer_sheet_id=sheet.id, question_number=q, marks_awarded=q % 4, max_marks=5)
+            for q in range(1, QUESTIONS + 1)
+        )
+    backfill_sheet_totals()
+    return subject.id
+
+
+def query_counts(path_template, subject_ids):
+    counts = []
+    for subject_id in subject_ids:
+        with app.app_context(), count_queries() as counter:
+            resp = client.get(path_template.format(subject_id=subject_id))
+        assert resp.status_code == 200, resp.get_data(as_text=True)
+        resp.close()
+        counts.append(counter['queries'])
+    return counts
+
+
+def test_subject_endpoints_query_count():
+    with app.app_context():
+        db.create_all()
+        subject_ids = [seed_subject(size) for size in CLASS_SIZES]
+
+    for path in ('/api/subjects/{subject_id}/results', '/api/subjects/{subject_id}/export-marks',
+                 '/api/evaluate/results/export?subject_id={subject_id}'):
+        counts = query_counts(path, subject_ids)
+        print(f"📊 {path}: {dict(zip(CLASS_SIZES, counts))} queries")
+        assert len(set(counts)) == 1, f"{path} query count grows with class size: {counts}"
+
+
+def seed_evaluators(subjects):
+    teacher = User(name=f"Teacher {subjects}", email=f"teacher{subjects}@example.com", password_hash='-')
+    external = User(name=f"External {subjects}", email=f"external{subjects}@example.com", password_hash='-')
+    db.session.add_all([teacher, external])
+    db.session.flush()
+    for i in range(subjects):
+        subject = Subject(
+            name=f"Chemistry {subjects}.{i}",
+            first_evaluator_id=teacher.id,
+            second_evaluator_id=external.id
+        )
+        db.session.add(subject)
+        db.session.flush()
+        db.session.add(QuestionPaper(subject_id=subject.id, title='Paper', file_path='uploads/qp.pdf', total_questions=QUESTIONS))
+        db.session.add_all(
+            AnswerSheet(subject_id=subject.id, student_name=f"Student {j}", file_path='uploads/s.pdf', status=STATUSES[j % 3])
+            for j in range(6)
+        )
+    db.session.commit()
+    return teacher.id, external.id
+
+
+def test_dashboard_query_count():
+    with app.app_context():
+        db.create_all()
+        evaluators = [seed_evaluators(size) for size in SUBJECTS_PER_EVALUATOR]
+
+    for path, index in (('/api/teacher/subjects?user_id={subject_id}', 0), ('/api/external/subjects?user_id={subject_id}', 1)):
+        counts = query_counts(path, [users[index] for users in evaluators])
+        print(f"📊 {path.split('?')[0]}: {dict(zip(SUBJECTS_PER_EVALUATOR, counts))} queries")
+        assert len(set(counts)) == 1, f"{path} query count grows with subjects: {counts}"
+
+
+if __name__ == "__main__":
+    test_subject_endpoints_query_count()
+    test_dashboard_query_count()
+    print("✅ Query counts are constant")
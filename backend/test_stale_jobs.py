@@ -0,0 +1,168 @@
+"""
+Interrupted background job checks.
+
+Scan jobs and upload batches run on an in-process worker pool, so a server
+restart or crash leaves their rows QUEUED or RUNNING forever and the
+frontend polling them never finishes. Jobs nothing has touched for
+JOB_STALE_SECONDS are failed at startup and when polled, while jobs still
+queued or running in this process are kept alive by the heartbeat. A
+failed batch keeps the answer sheets it created and deletes the saved
+files that never got one.
+
+Usage:
+    python test_stale_jobs.py
+"""
+
+import os
+import tempfile
+
+TMP_DIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(TMP_DIR, 'stale_jobs.db')
+os.environ['UPLOAD_FOLDER'] = os.path.join(TMP_DIR, 'uploads')
+os.environ['JOB_HEARTBEAT_SECONDS'] = '1'
+os.environ['JOB_STALE_SECONDS'] = '3'
+# No Gemini calls are made; the services only need a key to construct
+os.environ.setdefault('GEMINI_API_KEY', 'test-key')
+
+from datetime import datetime, timedelta
+import json
+import time
+
+import fitz
+
+from app import create_app
+from models import db, AnswerSheet, ScanJob, UploadBatch
+from services.batch_upload import run_batch_upload
+from services.job_queue import submit_job
+from services.scan_jobs import fail_stale_scan_jobs
+
+app = create_app()
+client = app.test_client()
+
+
+def add_job(status, age_seconds):
+    """A scan job last touched age_seconds ago; returns its ID"""
+    with app.app_context():
+        job = ScanJob(doc_type='question_paper', doc_id=1, status=status,
+                      updated_at=datetime.utcnow() - timedelta(seconds=age_seconds))
+        db.session.add(job)
+        db.session.commit()
+        return job.id
+
+
+def status(job_id):
+    with app.app_context():
+        return db.session.get(ScanJob, job_id).status
+
+
+def test_startup_fails_interrupted_jobs():
+    running = add_job('RUNNING', 600)
+    queued = add_job('QUEUED', 600)
+    recent = add_job('RUNNING', 0)
+    done = add_job('DONE', 600)
+
+    create_app()  # a restarted server
+
+    assert status(running) == status(queued) == 'FAILED'
+    assert status(recent) == 'RUNNING'
+    assert status(done) == 'DONE'
+    with app.app_context():
+        job = db.session.get(ScanJob, running)
+        assert job.finished_at and 'Interrupted' in job.to_dict()['errors'][0]['error']
+
+
+def test_polling_fails_a_job_whose_worker_died():
+    job_id = add_job('RUNNING', 600)
+    data = client.get(f'/api/evaluate/scan-jobs/{job_id}').get_json()
+    assert data['job']['status'] == 'FAILED', data
+
+
+def test_heartbeat_keeps_waiting_jobs_alive():
+    job_id = add_job('QUEUED', 0)
+    with app.app_context():
+        job = db.session.get(ScanJob, job_id)
+        future = submit_job(app, time.sleep, 5, heartbeat=job)
+
+    time.sleep(4)  # longer than JOB_STALE_SECONDS
+    with app.app_context():
+        fail_stale_scan_jobs()
+    assert status(job_id) == 'QUEUED'
+
+    future.result()
+    time.sleep(4)  # no heartbeat once the job function has returned
+    with app.app_context():
+        fail_stale_scan_jobs()
+    assert status(job_id) == 'FAILED'
+
+
+def save_pdf(name, valid=True):
+    path = os.path.join(TMP_DIR, name)
+    if valid:
+        doc = fitz.open()
+        doc.new_page(width=595, height=842).insert_text((72, 72), f"Name: {name}", fontsize=12)
+        doc.save(path)
+        doc.close()
+    else:
+        with open(path, 'wb') as f:
+            f.write(b'not a pdf')
+    return path
+
+
+def add_batch(results, status='QUEUED', age_seconds=0):
+    with app.app_context():
+        batch = UploadBatch(status=status, total_files=len(results), results=json.dumps(results),
+                            files_done=len([r for r in results if r['status'] != 'pending']),
+                            updated_at=datetime.utcnow() - timedelta(seconds=age_seconds))
+        db.session.add(batch)
+        db.session.commit()
+        return batch.id
+
+
+def test_interrupted_batch_keeps_created_sheets_and_deletes_waiting_files():
+    done_path, waiting_path = save_pdf('done.pdf'), save_pdf('waiting.pdf')
+    with app.app_context():
+        sheet = AnswerSheet(student_name='Done', file_path=done_path)
+        db.session.add(sheet)
+        db.session.commit()
+        sheet_id = sheet.id
+    batch_id = add_batch([
+        {'filename': 'done.pdf', 'status': 'success', 'id': sheet_id, 'file_path': done_path},
+        {'filename': 'waiting.pdf', 'status': 'pending', 'file_path': waiting_path}
+    ], status='RUNNING', age_seconds=600)
+
+    data = client.get(f'/api/upload/answer-sheets-batch/{batch_id}').get_json()['batch']
+
+    assert data['status'] == 'FAILED', data
+    assert [r['status'] for r in data['results']] == ['success', 'error'], data
+    assert os.path.exists(done_path) and not os.path.exists(waiting_path)
+    with app.app_context():
+        assert db.session.get(AnswerSheet, sheet_id) is not None
+
+
+class FakeExtractor:
+    ocr_service = None
+
+    async def extract_from_pdf_async(self, file_path, header_box=None):
+        return {'name': os.path.basename(file_path).split('.')[0], 'roll_number': None, 'class_name': None}
+
+
+def test_each_file_gets_its_sheet_as_it_is_processed():
+    paths = [save_pdf('a.pdf'), save_pdf('broken.pdf', valid=False), save_pdf('b.pdf')]
+    batch_id = add_batch([{'filename': os.path.basename(p), 'status': 'pending', 'file_path': p} for p in paths])
+
+    with app.app_context():
+        run_batch_upload(batch_id, FakeExtractor())
+        batch = db.session.get(UploadBatch, batch_id).to_dict()
+        names = sorted(sheet.student_name for sheet in AnswerSheet.query.filter(AnswerSheet.file_path.in_(paths)))
+
+    assert batch['status'] == 'DONE', batch
+    assert [r['status'] for r in batch['results']] == ['success', 'error', 'success'], batch
+    assert names == ['a', 'b']
+    assert not os.path.exists(paths[1])  # no answer sheet points at it
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,72 @@
+"""
+Header parsing checks for the text-layer pre-pass of StudentExtractor.
+
+Typed cover sheets are read without Gemini, so a label matched in the
+wrong place (a school or parent's name, a subject title) would silently
+become the student's details. Each case is a header as it comes out of
+the PDF text layer.
+
+Usage:
+    python test_student_extractor.py
+"""
+
+import os
+
+# Parsing makes no API calls; the service only needs a key to construct
+os.environ.setdefault('GEMINI_API_KEY', 'test-key')
+
+from services.student_extractor import StudentExtractor
+
+extractor = StudentExtractor()
+
+
+def parse(*lines):
+    return extractor.parse_header_text('\n'.join(lines))
+
+
+def test_other_names_are_not_the_student():
+    info = parse(
+        "School Name: Green Valley High",
+        "Father's Name: Ravi Kumar",
+        "Subject Name: Physics",
+        "Name: Asha Verma",
+        "Roll No: 2301",
+    )
+    assert info['name'] == 'Asha Verma', info
+    assert info['roll_number'] == '2301', info
+
+
+def test_only_other_names_gives_no_name():
+    info = parse("School Name: Green Valley High", "Father's Name: Ravi Kumar", "Roll No: 17")
+    assert info['name'] is None, info
+
+
+def test_classical_is_not_a_class():
+    info = parse("Classical Mechanics Paper", "Name: Asha Verma", "Roll No: 2301")
+    assert info['class_name'] is None, info
+
+    info = parse("Classical Mechanics Paper", "Class: 12A")
+    assert info['class_name'] == '12A', info
+
+
+def test_class_without_separator_needs_a_value():
+    assert parse("Class 10B")['class_name'] == '10B'
+    assert parse("Std XII")['class_name'] == 'XII'
+    assert parse("Class Test - Physics")['class_name'] is None
+
+
+def test_fields_on_one_line():
+    info = parse("Roll No: 2301 Name: Asha Verma    Class: 10A")
+    assert info['name'] == 'Asha Verma', info
+    assert info['roll_number'] == '2301', info
+    assert info['class_name'] == '10A', info
+
+    info = parse("Student Name: Asha Verma | School Name: Green Valley High")
+    assert info['name'] == 'Asha Verma', info
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✅ {name}")
@@ -1,6 +1,11 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { FileText, BookOpen, ChevronLeft, ChevronRight, Save, TrendingUp, CheckCircle, Plus, Loader, Search, AlertCircle } from 'lucide-react';
-import { saveMarks, getMarks, getTotalMarks, saveReport, getQuestionContents, getRubricContents, scanAllPages } from '../services/api';
+import { saveMarksBatch, getMarks, getTotalMarks, getQuestionContents, getRubricContents, scanAllPages } from '../services/api';
+
+// Marks whose save failed when their sheet was left, by answer sheet id. Kept
+// outside the component so they survive it unmounting; they are pending
+// again when that sheet is reopened, and can be retried from any sheet.
+const unsavedSheets = new Map();
 
 const GradingPanel = ({ answersheetId, answerSheet, questionPapers, rubrics, onViewQuestionPaper, onViewRubric, onGradingProgress }) => {
     const [currentQuestionIdx, setCurrentQuestionIdx] = useState(0);
@@ -10,12 +15,21 @@ const GradingPanel = ({ answersheetId, answerSheet, questionPapers, rubrics, onV
     const [totalScore, setTotalScore] = useState(null);
     const [saving, setSaving] = useState(false);
 
+    // Marks entered but not sent yet, by question number; Save All and
+    // Finalize send them in one batch request
+    const [pendingMarks, setPendingMarks] = useState({});
+    const pendingRef = useRef({ pendingMarks, questionPaperId: null });
+    const [unsavedSheetCount, setUnsavedSheetCount] = useState(unsavedSheets.size);
+    const [unsavedError, setUnsavedError] = useState('');
+    const [retryingUnsaved, setRetryingUnsaved] = useState(false);
+
     // Question/Rubric content
     const [questionContents, setQuestionContents] = useState([]);
     const [rubricContents, setRubricContents] = useState([]);
     const [detectedQuestions, setDetectedQuestions] = useState([]); // merged list of question numbers
     const [scanning, setScanning] = useState(false);
     const [scanStatus, setScanStatus] = useState('');
+    const [blankPagesSkipped, setBlankPagesSkipped] = useState(0);
 
     // Existing state
     const [activeQuestionPaper, setActiveQuestionPaper] = useState(null);
@@ -24,6 +38,24 @@ const GradingPanel = ({ answersheetId, answerSheet, questionPapers, rubrics, onV
     const [evaluationComplete, setEvaluationComplete] = useState(false);
     const [submittingReport, setSubmittingReport] = useState(false);
 
+    pendingRef.current = { pendingMarks, questionPaperId: activeQuestionPaper?.id };
+
+    // Saved marks with the pending ones laid over them
+    const displayMarks = [
+        ...allMarks.filter(m => !pendingMarks[m.question_number]),
+        ...Object.values(pendingMarks).map(m => ({
+            question_number: m.questionNumber,
+            marks_awarded: m.marksAwarded,
+            max_marks: m.maxMarks
+        }))
+    ];
+    const pendingCount = Object.keys(pendingMarks).length;
+    const displayTotal = pendingCount === 0 ? totalScore : (() => {
+        const total_awarded = displayMarks.reduce((sum, m) => sum + m.marks_awarded, 0);
+        const total_max = displayMarks.reduce((sum, m) => sum + m.max_marks, 0);
+        return { total_awarded, total_max, percentage: total_max ? total_awarded / total_max * 100 : 0 };
+    })();
+
     // Auto-select first QP and rubric
     useEffect(() => {
         if (questionPapers.length > 0 && !activeQuestionPaper) {
@@ -68,21 +100,49 @@ const GradingPanel = ({ answersheetId, answerSheet, questionPapers, rubrics, onV
 
         // Report progress to parent
         if (onGradingProgress) {
-            const gradedNums = new Set(allMarks.map(m => String(m.question_number)));
+            const gradedNums = new Set(displayMarks.map(m => String(m.question_number)));
             const graded = sorted.filter(q => {
                 const numOnly = q.replace(/[^0-9]/g, '');
                 return gradedNums.has(q) || gradedNums.has(numOnly);
             }).length;
             onGradingProgress({ total: sorted.length, graded });
         }
-    }, [questionContents, rubricContents, allMarks]);
+    }, [questionContents, rubricContents, allMarks, pendingMarks]);
 
-    // Load marks
+    // Load marks; marks still pending for the previous sheet are sent first,
+    // and kept in unsavedSheets (with an error and a retry) if that fails
     useEffect(() => {
+        const restored = unsavedSheets.get(answersheetId);
+        unsavedSheets.delete(answersheetId);
+        setUnsavedSheetCount(unsavedSheets.size);
+        setPendingMarks(restored?.pendingMarks || {});
         loadMarks();
         loadTotal();
+
+        return () => {
+            const { pendingMarks: pending, questionPaperId } = pendingRef.current;
+            if (Object.keys(pending).length === 0) return;
+            saveMarksBatch(answersheetId, questionPaperId, Object.values(pending))
+                .catch(error => {
+                    console.error('Failed to save pending marks:', error);
+                    unsavedSheets.set(answersheetId, { questionPaperId, pendingMarks: pending });
+                    setUnsavedSheetCount(unsavedSheets.size);
+                    setUnsavedError(error.response?.data?.error || error.message);
+                });
+        };
     }, [answersheetId]);
 
+    // Warn before closing the tab with unsaved marks
+    useEffect(() => {
+        if (pendingCount === 0 && unsavedSheetCount === 0) return;
+        const warn = (e) => {
+            e.preventDefault();
+            e.returnValue = '';
+        };
+        window.addEventListener('beforeunload', warn);
+        return () => window.removeEventListener('beforeunload', warn);
+    }, [pendingCount, unsavedSheetCount]);
+
     // Update marks input when question changes
     useEffect(() => {
         if (detectedQuestions.length === 0) return;
@@ -90,8 +150,8 @@ const GradingPanel = ({ answersheetId, answerSheet, questionPapers, rubrics, onV
         if (!qNum) return;
 
         // Find saved marks for this question number (try exact match, then numeric)
-        const questionMarks = allMarks.find(m => String(m.question_number) === qNum)
-            || allMarks.find(m => String(m.question_number) === qNum.replace(/[^0-9]/g, ''));
+        const questionMarks = displayMarks.find(m => String(m.question_number) === qNum)
+            || displayMarks.find(m => String(m.question_number) === qNum.replace(/[^0-9]/g, ''));
 
         if (questionMarks) {
             setMarksAwarded(questionMarks.marks_awarded.toString());
@@ -106,7 +166,7 @@ const GradingPanel = ({ answersheetId, answerSheet, questionPapers, rubrics, onV
                 setMaxMarks('');
             }
         }
-    }, [currentQuestionIdx, detectedQuestions, allMarks, rubricContents]);
+    }, [currentQuestionIdx, detectedQuestions, allMarks, pendingMarks, rubricContents]);
 
     const loadQuestionContents = async (qpId) => {
         try {
@@ -130,25 +190,31 @@ const GradingPanel = ({ answersheetId, answerSheet, questionPapers, rubrics, onV
         }
     };
 
-    const handleScanAll = async () => {
+    // force: also scan pages detected as blank
+    const handleScanAll = async (force = false) => {
         setScanning(true);
         setScanStatus('Scanning question paper...');
+        let skipped = 0;
         try {
             if (activeQuestionPaper) {
-                const qpResult = await scanAllPages('question_paper', activeQuestionPaper.id);
+                const qpResult = await scanAllPages('question_paper', activeQuestionPaper.id, null, force);
                 if (qpResult.success) {
                     setQuestionContents(qpResult.items || []);
                 }
+                skipped += qpResult.job?.pages_skipped || 0;
             }
 
             if (activeRubric) {
                 setScanStatus('Scanning rubric...');
-                const rubricResult = await scanAllPages('rubric', activeRubric.id);
+                const rubricResult = await scanAllPages('rubric', activeRubric.id, null, force);
                 if (rubricResult.success) {
                     setRubricContents(rubricResult.items || []);
                 }
+                skipped += rubricResult.job?.pages_skipped || 0;
             }
 
+            setBlankPagesSkipped(skipped);
+
             setScanStatus('');
         } catch (err) {
             console.error('Scan failed:', err);
@@ -176,7 +242,7 @@ const GradingPanel = ({ answersheetId, answerSheet, questionPapers, rubrics, onV
         }
     };
 
-    const handleSaveMarks = async () => {
+    const handleRecordMarks = () => {
         if (!marksAwarded || !maxMarks) {
             alert('Please enter both awarded marks and max marks');
             return;
@@ -186,23 +252,39 @@ const GradingPanel = ({ answersheetId, answerSheet, questionPapers, rubrics, onV
         // Convert question number to integer for storage if possible
         const qNumInt = parseInt(String(qNum).replace(/[^0-9]/g, '')) || (currentQuestionIdx + 1);
 
+        setPendingMarks(prev => ({
+            ...prev,
+            [qNumInt]: {
+                questionNumber: qNumInt,
+                marksAwarded: parseFloat(marksAwarded),
+                maxMarks: parseFloat(maxMarks)
+            }
+        }));
+
+        // Auto-advance
+        if (currentQuestionIdx < detectedQuestions.length - 1) {
+            handleQuestionNav('next');
+        }
+    };
+
+    const savePendingMarks = async (options = {}) => {
+        const sent = pendingMarks;
+        // The response carries the sheet's marks and total, so no reload is needed
+        const result = await saveMarksBatch(answersheetId, activeQuestionPaper?.id, Object.values(sent), options);
+
+        setAllMarks(result.marks || []);
+        setTotalScore(result.total);
+        // Keep anything entered while the request was in flight
+        setPendingMarks(prev => Object.fromEntries(
+            Object.entries(prev).filter(([qNum, mark]) => sent[qNum] !== mark)
+        ));
+        return result;
+    };
+
+    const handleSaveAll = async () => {
         setSaving(true);
         try {
-            await saveMarks(
-                answersheetId,
-                activeQuestionPaper?.id,
-                qNumInt,
-                parseFloat(marksAwarded),
-                parseFloat(maxMarks)
-            );
-
-            await loadMarks();
-            await loadTotal();
-
-            // Auto-advance
-            if (currentQuestionIdx < detectedQuestions.length - 1) {
-                handleQuestionNav('next');
-            }
+            await savePendingMarks();
         } catch (error) {
             console.error('Failed to save marks:', error);
             alert('Failed to save marks');
@@ -211,6 +293,23 @@ const GradingPanel = ({ answersheetId, answerSheet, questionPapers, rubrics, onV
         }
     };
 
+    const retryUnsavedSheets = async () => {
+        setRetryingUnsaved(true);
+        let lastError = '';
+        for (const [sheetId, { questionPaperId, pendingMarks: marks }] of [...unsavedSheets]) {
+            try {
+                await saveMarksBatch(sheetId, questionPaperId, Object.values(marks));
+                unsavedSheets.delete(sheetId);
+            } catch (error) {
+                console.error('Failed to save pending marks:', error);
+                lastError = error.response?.data?.error || error.message;
+            }
+        }
+        setUnsavedSheetCount(unsavedSheets.size);
+        setUnsavedError(lastError);
+        setRetryingUnsaved(false);
+    };
+
     const handleQuestionNav = (direction) => {
         if (direction === 'next' && currentQuestionIdx < detectedQuestions.length - 1) {
             setCurrentQuestionIdx(prev => prev + 1);
@@ -235,7 +334,8 @@ const GradingPanel = ({ answersheetId, answerSheet, questionPapers, rubrics, onV
     const handleFinalize = async () => {
         setSubmittingReport(true);
         try {
-            await saveReport(answersheetId, remarks);
+            // Pending marks, remarks and the report go in one request
+            await savePendingMarks({ remarks, finalize: true });
             alert('Evaluation Report Saved Successfully!');
             setEvaluationComplete(true);
         } catch (error) {
@@ -270,8 +370,8 @@ const GradingPanel = ({ answersheetId, answerSheet, questionPapers, rubrics, onV
                             </tr>
                         </thead>
                         <tbody>
-                            {allMarks.sort((a, b) => a.question_number - b.question_number).map(mark => (
-                                <tr key={mark.id} className="border-b border-white border-opacity-5">
+                            {[...displayMarks].sort((a, b) => a.question_number - b.question_number).map(mark => (
+                                <tr key={mark.question_number} className="border-b border-white border-opacity-5">
                                     <td className="p-2 font-mono">{mark.question_number}</td>
                                     <td className="p-2 text-right font-bold text-accent-300">{mark.marks_awarded}</td>
                                     <td className="p-2 text-right text-gray-400">{mark.max_marks}</td>
@@ -279,8 +379,8 @@ const GradingPanel = ({ answersheetId, answerSheet, questionPapers, rubrics, onV
                             ))}
                             <tr className="border-t-2 border-white border-opacity-20 text-lg font-bold bg-white bg-opacity-5">
                                 <td className="p-3">TOTAL</td>
-                                <td className="p-3 text-right text-accent-400">{totalScore?.total_awarded}</td>
-                                <td className="p-3 text-right">{totalScore?.total_max}</td>
+                                <td className="p-3 text-right text-accent-400">{displayTotal?.total_awarded}</td>
+                                <td className="p-3 text-right">{displayTotal?.total_max}</td>
                             </tr>
                         </tbody>
                     </table>
@@ -355,7 +455,7 @@ const GradingPanel = ({ answersheetId, answerSheet, questionPapers, rubrics, onV
                 {/* Scan Button */}
                 {detectedQuestions.length === 0 && !scanning && (
                     <button
-                        onClick={handleScanAll}
+                        onClick={() => handleScanAll()}
                         disabled={!activeQuestionPaper && !activeRubric}
                         className="w-full btn btn-primary flex items-center justify-center gap-2 text-sm py-2"
                     >
@@ -375,13 +475,26 @@ const GradingPanel = ({ answersheetId, answerSheet, questionPapers, rubrics, onV
                             {detectedQuestions.length} questions detected
                         </span>
                         <button
-                            onClick={handleScanAll}
+                            onClick={() => handleScanAll()}
                             className="text-[10px] text-primary-400 hover:text-primary-300 underline"
                         >
                             Re-scan
                         </button>
                     </div>
                 )}
+                {blankPagesSkipped > 0 && !scanning && (
+                    <div className="flex items-center justify-between text-[10px] text-yellow-300">
+                        <span>
+                            {blankPagesSkipped} blank {blankPagesSkipped === 1 ? 'page' : 'pages'} skipped
+                        </span>
+                        <button
+                            onClick={() => handleScanAll(true)}
+                            className="underline hover:text-yellow-200"
+                        >
+                            Scan them too
+                        </button>
+                    </div>
+                )}
             </div>
 
             {/* Content */}
@@ -511,18 +624,44 @@ const GradingPanel = ({ answersheetId, answerSheet, questionPapers, rubrics, onV
                         </div>
 
                         <button
-                            onClick={handleSaveMarks}
-                            disabled={saving || !marksAwarded || !maxMarks}
+                            onClick={handleRecordMarks}
+                            disabled={!marksAwarded || !maxMarks}
                             className="w-full btn btn-primary flex items-center justify-center gap-2 py-3.5 md:py-3 text-base md:text-sm font-bold"
                         >
-                            <Save className="w-5 h-5" />
-                            {saving ? 'Saving...' : 'Save Marks'}
+                            <CheckCircle className="w-5 h-5" />
+                            Record Marks
+                        </button>
+
+                        <button
+                            onClick={handleSaveAll}
+                            disabled={saving || pendingCount === 0}
+                            className="w-full btn btn-ghost flex items-center justify-center gap-2 py-2 text-sm"
+                        >
+                            <Save className="w-4 h-4" />
+                            {saving ? 'Saving...' : pendingCount > 0 ? `Save All (${pendingCount} unsaved)` : 'All marks saved'}
                         </button>
+
+                        {unsavedSheetCount > 0 && (
+                            <div className="flex items-start gap-2 p-3 rounded-lg bg-red-500 bg-opacity-10 border border-red-500 border-opacity-30 text-xs text-red-300">
+                                <AlertCircle className="w-4 h-4 flex-shrink-0 mt-0.5" />
+                                <div className="flex-1">
+                                    Marks for {unsavedSheetCount} previous {unsavedSheetCount === 1 ? 'sheet were' : 'sheets were'} not saved
+                                    {unsavedError && `: ${unsavedError}`}. They are kept as pending on {unsavedSheetCount === 1 ? 'that sheet' : 'those sheets'}.
+                                </div>
+                                <button
+                                    onClick={retryUnsavedSheets}
+                                    disabled={retryingUnsaved}
+                                    className="underline hover:text-red-200 whitespace-nowrap"
+                                >
+                                    {retryingUnsaved ? 'Retrying...' : 'Retry'}
+                                </button>
+                            </div>
+                        )}
                     </div>
                 </div>
 
                 {/* Total Score */}
-                {totalScore && (
+                {displayTotal && (
                     <div className="border-t border-white border-opacity-10 pt-4">
                         <div className="glass p-4 rounded-lg">
                             <div className="flex items-center gap-2 mb-3">
@@ -531,10 +670,10 @@ const GradingPanel = ({ answersheetId, answerSheet, questionPapers, rubrics, onV
                             </div>
                             <div className="text-center">
                                 <div className="text-4xl font-bold gradient-text mb-2">
-                                    {totalScore.total_awarded.toFixed(1)} / {totalScore.total_max.toFixed(1)}
+                                    {displayTotal.total_awarded.toFixed(1)} / {displayTotal.total_max.toFixed(1)}
                                 </div>
                                 <div className="text-xl text-gray-400">
-                                    {totalScore.percentage.toFixed(1)}%
+                                    {displayTotal.percentage.toFixed(1)}%
                                 </div>
                             </div>
                         </div>
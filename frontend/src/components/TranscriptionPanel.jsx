@@ -1,5 +1,5 @@
 import React, { useState, useEffect, useRef } from 'react';
-import { Sparkles, FileImage, Loader, CheckCircle, FileText, ClipboardList } from 'lucide-react';
+import { Sparkles, FileImage, Loader, CheckCircle, FileText, ClipboardList, AlertCircle } from 'lucide-react';
 import { autoScanPage, getMatchedContent, analyzeBlooms } from '../services/api';
 
 
@@ -10,6 +10,7 @@ const TranscriptionPanel = ({ answersheetId, page, onTranscriptionComplete }) =>
     const [matchedContent, setMatchedContent] = useState({});
     const [loading, setLoading] = useState(false);
     const [error, setError] = useState(null);
+    const [blank, setBlank] = useState(false); // page detected as blank and not sent to AI
     const panelRef = useRef(null);
 
     // Blooms Taxonomy State
@@ -83,17 +84,19 @@ const TranscriptionPanel = ({ answersheetId, page, onTranscriptionComplete }) =>
     };
 
 
-    const performAutoScan = async () => {
+    const performAutoScan = async (force = false) => {
         setLoading(true);
         setError(null);
+        setBlank(false);
         setTranscription('');
         setQuestions([]);
         setDiagrams([]);
 
         try {
-            const result = await autoScanPage(answersheetId, page);
+            const result = await autoScanPage(answersheetId, page, force);
 
             if (result.success) {
+                setBlank(Boolean(result.blank));
                 setTranscription(result.transcription);
                 setQuestions(result.questions || []);
                 setDiagrams(result.diagrams || []);
@@ -153,7 +156,7 @@ const TranscriptionPanel = ({ answersheetId, page, onTranscriptionComplete }) =>
                     <div className="bg-red-500 bg-opacity-10 border border-red-500 rounded-lg p-4">
                         <p className="text-red-400">{error}</p>
                         <button
-                            onClick={performAutoScan}
+                            onClick={() => performAutoScan()}
                             className="mt-2 text-xs text-red-300 underline hover:text-red-200"
                         >
                             Try Again
@@ -161,6 +164,21 @@ const TranscriptionPanel = ({ answersheetId, page, onTranscriptionComplete }) =>
                     </div>
                 )}
 
+                {!loading && !error && blank && (
+                    <div className="mb-4 bg-yellow-500 bg-opacity-10 border border-yellow-500 border-opacity-40 rounded-lg p-4">
+                        <p className="text-yellow-300 text-sm flex items-center gap-2">
+                            <AlertCircle className="w-4 h-4 shrink-0" />
+                            This page looks blank, so it was not sent for AI review.
+                        </p>
+                        <button
+                            onClick={() => performAutoScan(true)}
+                            className="mt-2 text-xs text-yellow-200 underline hover:text-yellow-100"
+                        >
+                            Scan anyway
+                        </button>
+                    </div>
+                )}
+
                 {!loading && !error && (
                     <div className="space-y-6">
                         {/* Question Blocks */}
@@ -120,10 +120,12 @@ export const getThumbnailUrl = (fileId, type) => {
 };
 
 // Evaluation services
-export const autoScanPage = async (answersheetId, page) => {
+// force: analyse the page even if it was detected as blank
+export const autoScanPage = async (answersheetId, page, force = false) => {
     const response = await api.post('evaluate/auto-scan', {
         answersheetId,
-        page
+        page,
+        force
     });
     return response.data;
 };
@@ -157,6 +159,17 @@ export const saveMarks = async (answersheetId, questionPaperId, questionNumber,
     return response.data;
 };
 
+// marks: [{ questionNumber, marksAwarded, maxMarks }]; options: { remarks, finalize }
+export const saveMarksBatch = async (answersheetId, questionPaperId, marks, options = {}) => {
+    const response = await api.post('evaluate/marks/batch', {
+        answersheetId,
+        questionPaperId,
+        marks,
+        ...options
+    });
+    return response.data;
+};
+
 export const getMarks = async (answersheetId) => {
     const response = await api.get(`evaluate/marks/${answersheetId}`);
     return response.data;
@@ -265,6 +278,25 @@ export const exportSubjectMarks = (subjectId) => {
 };
 
 // Batch upload service
+const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+// Background jobs are polled every 1.5s; the server fails jobs whose worker
+// died, and the client stops waiting after POLL_TIMEOUT_MS regardless
+const POLL_INTERVAL_MS = 1500;
+const POLL_TIMEOUT_MS = 30 * 60 * 1000;
+
+const pollJob = async (fetchStatus, isFinished) => {
+    const deadline = Date.now() + POLL_TIMEOUT_MS;
+    while (Date.now() < deadline) {
+        const data = await fetchStatus();
+        if (isFinished(data)) {
+            return data;
+        }
+        await sleep(POLL_INTERVAL_MS);
+    }
+    throw new Error('Timed out waiting for the server to finish. Refresh to check its progress.');
+};
+
 export const uploadAnswerSheetsBatch = async (files, subjectId, questionPaperId, onProgress) => {
     const formData = new FormData();
     files.forEach(file => {
@@ -276,13 +308,45 @@ export const uploadAnswerSheetsBatch = async (files, subjectId, questionPaperId,
     const response = await api.post('upload/answer-sheets-batch', formData, {
         onUploadProgress: onProgress
     });
+    const batchId = response.data.batch_id;
+
+    // Extraction runs in the background; poll until every file is processed
+    const { batch } = await pollJob(
+        () => getUploadBatch(batchId),
+        ({ batch }) => batch.status === 'DONE' || batch.status === 'FAILED'
+    );
+    return batch;
+};
+
+export const getUploadBatch = async (batchId) => {
+    const response = await api.get(`upload/answer-sheets-batch/${batchId}`);
     return response.data;
 };
 
 // Question/Rubric content scanning services
-export const scanAllPages = async (type, id) => {
-    const response = await api.post('evaluate/scan-all-pages', { type, id });
-    return response.data;
+export const getScanJob = async (jobId) => {
+    const response = await api.get(`evaluate/scan-jobs/${jobId}`);
+    return response.data;
+};
+
+// Queues a background scan and polls it until done; resolves with the same
+// { success, items, total_pages_scanned, total_items_stored } shape as before
+export const scanAllPages = async (type, id, onProgress, force = false) => {
+    const response = await api.post('evaluate/scan-all-pages', { type, id, force });
+    const jobId = response.data.job_id;
+
+    const data = await pollJob(
+        async () => {
+            const status = await getScanJob(jobId);
+            onProgress?.(status.job);
+            return status;
+        },
+        ({ job }) => job.status === 'DONE' || job.status === 'FAILED'
+    );
+    if (data.job.status === 'FAILED') {
+        return { success: false, job: data.job, items: [] };
+    }
+    return data;
 };
 
 export const getQuestionContents = async (questionPaperId) => {
@@ -343,6 +407,20 @@ export const assignEvaluators = async (subjectId, firstEvaluatorId, secondEvalua
     return response.data;
 };
 
+// Analyse every page of new answer sheets in the background right after upload
+export const setSubjectEagerAnalysis = async (subjectId, enabled) => {
+    const response = await api.put(`subjects/${subjectId}/eager-analysis`, { enabled });
+    return response.data;
+};
+
+// header_box: { x, y, width, height } as page fractions, or null for the default top strip
+export const setSubjectHeaderBox = async (subjectId, headerBox) => {
+    const response = await api.put(`subjects/${subjectId}/header-box`, {
+        header_box: headerBox,
+    });
+    return response.data;
+};
+
 // ── NEW: Teacher (First Evaluator) API functions ──────────────────────────────
 
 export const getTeacherSubjects = async (userId) => {